@@ -9,6 +9,10 @@ const Patient = require('../models/Patient');
 
 // localhost 대신 127.0.0.1 사용 (Windows IPv6 DNS 지연 문제 해결)
 const FASTAPI_URL = process.env.FASTAPI_URL || 'http://127.0.0.1:8000';
+const FASTAPI_TIMEOUT_MS = 60000;
+
+// 요청 본문의 priority 또는 클라이언트가 보낸 X-Priority 헤더를 FastAPI로 전달
+const aiPriority = (req) => (req.body && req.body.priority) || req.headers['x-priority'];
 
 // HTTP Agent 설정: keepAlive 비활성화로 즉시 연결 종료
 const httpAgent = new http.Agent({
@@ -149,6 +153,10 @@ exports.analyzeOnly = async (req, res) => {
       if (req.body.notes) {
         formData.append('notes', req.body.notes);
       }
+      // CAM 생성 방식 (예: 'gradcam,layercam', 'none'). 생략 시 FastAPI 서버 정책 적용
+      if (req.body.cam_methods) {
+        formData.append('cam_methods', req.body.cam_methods);
+      }
 
       console.log(`✓ FormData 생성 완료: ${(Date.now() - formDataStartTime) / 1000}초\n`);
 
@@ -166,10 +174,15 @@ exports.analyzeOnly = async (req, res) => {
         `${FASTAPI_URL}/api/ai/diagnose`,
         formData,
         {
-          timeout: 60000,               // 60초 타임아웃
+          timeout: FASTAPI_TIMEOUT_MS,  // 60초 타임아웃
           headers: {
             ...formData.getHeaders(),
-            'Connection': 'close'
+            'Connection': 'close',
+            // 이 시간(ms)이 지나면 FastAPI가 대기/진행 중인 추론을 중단 (axios 타임아웃과 동일)
+            // 절대 시각(X-Request-Deadline)이 아닌 남은 시간을 보내므로 두 서버의 시계가 달라도 동작
+            'X-Request-Timeout-Ms': String(FASTAPI_TIMEOUT_MS),
+            // 추론 우선순위 (urgent / routine / bulk). 생략 시 FastAPI 기본값(routine)
+            ...(aiPriority(req) && { 'X-Priority': aiPriority(req) })
           },
           maxContentLength: Infinity,
           maxBodyLength: Infinity,
@@ -292,6 +305,10 @@ exports.createDiagnosis = async (req, res) => {
       if (req.body.notes) {
         formData.append('notes', req.body.notes);
       }
+      // CAM 생성 방식 (예: 'gradcam,layercam', 'none'). 생략 시 FastAPI 서버 정책 적용
+      if (req.body.cam_methods) {
+        formData.append('cam_methods', req.body.cam_methods);
+      }
 
       console.log(`✓ FormData 생성 완료: ${(Date.now() - formDataStartTime) / 1000}초\n`);
 
@@ -310,10 +327,15 @@ exports.createDiagnosis = async (req, res) => {
         `${FASTAPI_URL}/api/ai/diagnose`,
         formData,
         {
-          timeout: 60000,               // 60초 타임아웃
+          timeout: FASTAPI_TIMEOUT_MS,  // 60초 타임아웃
           headers: {
             ...formData.getHeaders(),
-            'Connection': 'close'
+            'Connection': 'close',
+            // 이 시간(ms)이 지나면 FastAPI가 대기/진행 중인 추론을 중단 (axios 타임아웃과 동일)
+            // 절대 시각(X-Request-Deadline)이 아닌 남은 시간을 보내므로 두 서버의 시계가 달라도 동작
+            'X-Request-Timeout-Ms': String(FASTAPI_TIMEOUT_MS),
+            // 추론 우선순위 (urgent / routine / bulk). 생략 시 FastAPI 기본값(routine)
+            ...(aiPriority(req) && { 'X-Priority': aiPriority(req) })
           },
           maxContentLength: Infinity,
           maxBodyLength: Infinity,
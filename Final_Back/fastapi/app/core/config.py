@@ -18,6 +18,134 @@ class Settings(BaseModel):
     model_path: Path = Path(
         os.getenv('MODEL_PATH', BASE_DIR.parent.parent.parent / 'best_model.pth')
     )
+    # 추론 기록 write-behind 저장 (ai_diagnoses 컬렉션)
+    diagnosis_write_batch_size: int = int(os.getenv('DIAGNOSIS_WRITE_BATCH_SIZE', '50'))
+    diagnosis_write_interval: float = float(os.getenv('DIAGNOSIS_WRITE_INTERVAL_SECONDS', '1.0'))
+    diagnosis_write_queue_size: int = int(os.getenv('DIAGNOSIS_WRITE_QUEUE_SIZE', '10000'))
+    # 모델 버전 (미지정 시 체크포인트 파일 정보로부터 계산)
+    model_version: str | None = os.getenv('MODEL_VERSION') or None
+    # random 이면 체크포인트 대신 랜덤 가중치 모델 사용 (부하 테스트용)
+    model_standin: str | None = os.getenv('MODEL_STANDIN') or None
+    # 분류 모델 체크포인트 (기본: AI_MODEL_DIR/clf_best_model.pth) 와 backbone
+    # backbone 은 체크포인트 메타데이터가 우선이고, 메타데이터가 없는 체크포인트에만 이 값을 쓴다 (기본 resnet50)
+    classifier_checkpoint: str | None = os.getenv('CLASSIFIER_CHECKPOINT') or None
+    classifier_backbone: str | None = (os.getenv('CLASSIFIER_BACKBONE') or '').lower() or None
+    # 추론 정밀도: fp32 / bf16 (bf16 은 AVX512-BF16·AMX CPU 또는 지원 GPU 에서만 적용, 아니면 fp32)
+    inference_precision: str = os.getenv('INFERENCE_PRECISION', 'fp32').lower()
+    # 추론 스레드별 전처리 버퍼 재사용 (224x224 입력 tensor / 작업 배열), CUDA 에서는 pinned memory
+    tensor_buffer_pool: bool = os.getenv('TENSOR_BUFFER_POOL', 'true').lower() == 'true'
+    tensor_buffer_pin_memory: bool = os.getenv('TENSOR_BUFFER_PIN_MEMORY', 'true').lower() == 'true'
+
+    # CAM 이미지 저장소 (/static 으로 서비스됨)
+    static_dir: Path = Path(os.getenv('GRADCAM_STORAGE_PATH', BASE_DIR / 'static'))
+    cam_store_max_bytes: int = int(os.getenv('CAM_STORE_MAX_BYTES', str(512 * 1024 * 1024)))
+    cam_store_max_age: float = float(os.getenv('CAM_STORE_MAX_AGE_SECONDS', str(7 * 24 * 3600)))
+    # 0 이면 개수 제한 없음 (용량/TTL 만)
+    cam_store_max_entries: int = int(os.getenv('CAM_STORE_MAX_ENTRIES', '0'))
+    # disk: 디스크 저장 후 /static 마운트로 서비스, memory: 메모리에만 보관 (ETag로 직접 서비스)
+    cam_store_backend: str = os.getenv('CAM_STORE_BACKEND', 'disk').lower()
+    # CAM 오버레이 인코딩: png(최적화) / webp / jpeg
+    cam_image_format: str = os.getenv('CAM_IMAGE_FORMAT', 'webp').lower()
+    cam_image_quality: int = int(os.getenv('CAM_IMAGE_QUALITY', '80'))
+    # true면 폐 마스크 영역에만 히트맵을 입히고 나머지는 원본 유지
+    cam_mask_blend: bool = os.getenv('CAM_MASK_BLEND', 'false').lower() == 'true'
+    # true면 CAM 이미지를 data URI로 응답에 포함 (프론트엔드 추가 요청 없음)
+    cam_inline: bool = os.getenv('CAM_INLINE', 'false').lower() == 'true'
+    # CAM 생성 정책 (요청에 cam_methods 가 없을 때 적용)
+    enable_gradcam: bool = os.getenv('ENABLE_GRADCAM', 'true').lower() == 'true'
+    cam_methods: str = os.getenv('CAM_METHODS', 'all')
+    # 이 클래스로 판정되면 CAM 생략 (쉼표 구분, 예: Normal)
+    cam_skip_classes: str = os.getenv('CAM_SKIP_CLASSES', '')
+    # 최고 확률이 이 범위 안일 때만 CAM 생성
+    cam_min_confidence: float = float(os.getenv('CAM_MIN_CONFIDENCE', '0'))
+    cam_max_confidence: float = float(os.getenv('CAM_MAX_CONFIDENCE', '1'))
+
+    # 업로드 이미지 최대 크기 (multipart / raw 공통, 초과 시 413)
+    max_upload_bytes: int = int(os.getenv('MAX_UPLOAD_BYTES', str(32 * 1024 * 1024)))
+
+    # 분류 전 영상 품질 검사 (app/services/quality_gate.py). 랜덤 가중치 모델은 마스크가 무의미하므로 기본 꺼짐
+    quality_gate: bool = os.getenv('QUALITY_GATE', 'false' if os.getenv('MODEL_STANDIN') else 'true').lower() == 'true'
+    quality_min_contrast: float = float(os.getenv('QUALITY_MIN_CONTRAST', '8'))  # 흑백 표준편차 (0~255)
+    quality_min_brightness: float = float(os.getenv('QUALITY_MIN_BRIGHTNESS', '10'))
+    quality_max_brightness: float = float(os.getenv('QUALITY_MAX_BRIGHTNESS', '245'))
+    # 폐 마스크 면적 / 연결 요소 기준 (이미지 면적 대비 비율)
+    quality_min_mask_area: float = float(os.getenv('QUALITY_MIN_MASK_AREA', '0.05'))
+    quality_max_mask_area: float = float(os.getenv('QUALITY_MAX_MASK_AREA', '0.8'))
+    quality_min_component_area: float = float(os.getenv('QUALITY_MIN_COMPONENT_AREA', '0.005'))
+    quality_max_components: int = int(os.getenv('QUALITY_MAX_COMPONENTS', '4'))
+    # 가장 큰 두 연결 요소(좌/우 폐)가 마스크에서 차지해야 하는 최소 비율
+    quality_min_main_fraction: float = float(os.getenv('QUALITY_MIN_MAIN_FRACTION', '0.8'))
+
+    # ai_diagnoses 내보내기 (app/services/export.py) 한 번에 읽고 인코딩하는 건수
+    export_batch_size: int = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))
+
+    # 유사 증례 검색 색인 (진단 임베딩, 현재 모델 버전 기준 최근 N건을 메모리에 유지)
+    similarity_index: bool = os.getenv('SIMILARITY_INDEX', 'true').lower() == 'true'
+    similarity_index_max_items: int = int(os.getenv('SIMILARITY_INDEX_MAX_ITEMS', '50000'))
+    similarity_rebuild_seconds: float = float(os.getenv('SIMILARITY_REBUILD_SECONDS', '600'))
+
+    # 재업로드(지각 해시 근접 중복) 감지 시 이전 추론 재사용
+    near_duplicate_reuse: bool = os.getenv('NEAR_DUPLICATE_REUSE', 'true').lower() == 'true'
+    near_duplicate_threshold: int = int(os.getenv('NEAR_DUPLICATE_THRESHOLD', '4'))  # 64비트 dHash 해밍 거리
+    near_duplicate_window_seconds: float = float(os.getenv('NEAR_DUPLICATE_WINDOW_SECONDS', '86400'))
+    near_duplicate_scope: str = os.getenv('NEAR_DUPLICATE_SCOPE', 'patient').lower()  # patient | window
+    near_duplicate_max_entries: int = int(os.getenv('NEAR_DUPLICATE_MAX_ENTRIES', '5000'))
+
+    # 추론 스케줄러 (우선순위 클래스: urgent / routine / bulk)
+    inference_concurrency: int = int(os.getenv('INFERENCE_CONCURRENCY', '1'))
+    inference_queue_size: int = int(os.getenv('INFERENCE_QUEUE_SIZE', '100'))
+    default_priority: str = os.getenv('DEFAULT_PRIORITY', 'routine').lower()
+    priority_weights: str = os.getenv('PRIORITY_WEIGHTS', 'urgent:6,routine:3,bulk:1')
+    priority_slo_seconds: str = os.getenv('PRIORITY_SLO_SECONDS', 'urgent:10,routine:30,bulk:300')
+    # 대기 시간이 SLO 의 이 비율에 도달하면 해당 클래스 우선 처리 + 하위 클래스 강등
+    scheduler_demote_ratio: float = float(os.getenv('SCHEDULER_DEMOTE_RATIO', '0.8'))
+
+    # 추론 실행 위치: local (요청을 받은 API 프로세스) / queue (MongoDB inference_jobs + 별도 워커 프로세스)
+    inference_mode: str = os.getenv('INFERENCE_MODE', 'local').lower()
+    # 워커가 작업을 가져간 뒤 갱신하지 않으면 다른 워커가 다시 가져갈 수 있게 되는 시간
+    job_lease_seconds: float = float(os.getenv('JOB_LEASE_SECONDS', '60'))
+    job_max_attempts: int = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+    # 미설정이면 스레드 튜닝(python -m app.services.tuning tune) 결과의 배치 크기, 그것도 없으면 4
+    job_batch_size: int | None = int(os.getenv('JOB_BATCH_SIZE', '0')) or None
+    job_poll_interval: float = float(os.getenv('JOB_POLL_INTERVAL', '0.2'))
+    # 마감 시각이 없는 요청이 결과를 기다리는 최대 시간 (초과 시 504)
+    job_wait_timeout: float = float(os.getenv('JOB_WAIT_TIMEOUT', '300'))
+    # 끝난 작업 문서 보관 기간 (TTL 인덱스)
+    job_retention_seconds: int = int(os.getenv('JOB_RETENTION_SECONDS', '86400'))
+    # API 프로세스 안에서 돌릴 워커 수 (MONGODB_URI=memory:// 로 queue 모드를 시험할 때)
+    job_local_workers: int = int(os.getenv('JOB_LOCAL_WORKERS', '0'))
+
+    # 적응형 동시 처리 한도 (진단 엔드포인트, 초과 요청은 바로 503)
+    admission_control: bool = os.getenv('ADMISSION_CONTROL', 'true').lower() == 'true'
+    # 0 이면 INFERENCE_CONCURRENCY x 4
+    admission_initial_limit: int = int(os.getenv('ADMISSION_INITIAL_LIMIT', '0'))
+    admission_min_limit: int = int(os.getenv('ADMISSION_MIN_LIMIT', '1'))
+    admission_max_limit: int = int(os.getenv('ADMISSION_MAX_LIMIT', '64'))
+    admission_backoff: float = float(os.getenv('ADMISSION_BACKOFF', '0.9'))
+    # 요청 지연 / predict() 실행 시간 이 이 값을 넘으면 대기열이 쌓인 것으로 보고 한도를 줄임
+    admission_queue_tolerance: float = float(os.getenv('ADMISSION_QUEUE_TOLERANCE', '3'))
+    # 0 이면 사용 안 함 (초 단위 절대 지연 상한)
+    admission_target_latency: float = float(os.getenv('ADMISSION_TARGET_LATENCY', '0'))
+
+    # 관리용 /debug 엔드포인트 토큰 (X-Admin-Token 헤더, 미설정 시 /debug 비활성화)
+    admin_token: str | None = os.getenv('ADMIN_TOKEN') or None
+    # true면 요청별 RSS/tensor 계측과 autograd 누수 탐지 (/debug/memory)
+    memory_accounting: bool = os.getenv('MEMORY_ACCOUNTING', 'false').lower() == 'true'
+    # /debug/profiler 로 캡처한 torch.profiler trace 저장 위치
+    profile_dir: Path = Path(os.getenv('PROFILE_DIR', BASE_DIR.parent / 'profiles'))
+
+    # PyTorch 스레드 설정 (지정 시 튜닝 결과보다 우선)
+    torch_num_threads: int | None = int(os.getenv('TORCH_NUM_THREADS', '0')) or None
+    torch_interop_threads: int | None = int(os.getenv('TORCH_INTEROP_THREADS', '0')) or None
+    # `python -m app.services.tuning tune` 결과 파일
+    thread_config_path: Path = Path(os.getenv('THREAD_CONFIG_PATH', BASE_DIR.parent / 'thread_config.json'))
+    # true면 서버 시작 시 튜닝 결과가 없거나 CPU 수가 바뀌었을 때 intra-op 스레드 수를 측정
+    autotune_threads: bool = os.getenv('AUTOTUNE_THREADS', 'false').lower() == 'true'
+    # off / pin (pin: 워커마다 겹치지 않는 CPU 묶음에 고정)
+    cpu_affinity: str = os.getenv('CPU_AFFINITY', 'off').lower()
+    # 같은 호스트에서 실행되는 워커 수와 현재 워커 번호 (미지정 시 파일 잠금으로 슬롯 선택)
+    worker_count: int = int(os.getenv('WORKER_COUNT', os.getenv('WEB_CONCURRENCY', '1')))
+    worker_index: int | None = int(os.environ['WORKER_INDEX']) if os.getenv('WORKER_INDEX') else None
 
 
 @lru_cache
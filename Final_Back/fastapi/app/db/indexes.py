@@ -0,0 +1,179 @@
+"""ai_diagnoses / inference_jobs 컬렉션 인덱스 정의 및 explain 기반 점검.
+
+서버 시작 시 `ensure_indexes()`가 호출되며 (같은 정의의 create_index는 멱등),
+실제 mongod 에서 조회 쿼리가 인덱스를 타는지는 아래 명령으로 확인한다.
+
+    python -m app.db.indexes --check
+    MONGODB_URI=mongodb://localhost:27017/medical-ai python -m pytest tests/test_indexes.py
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+
+from .session import MongoSession
+
+# (키 목록, 인덱스 이름) - 목록 조회는 항상 created_at desc, _id desc 로 정렬한다
+AI_DIAGNOSIS_INDEXES: List[Tuple[List[Tuple[str, int]], str]] = [
+    ([('patient_id', 1), ('created_at', -1), ('_id', -1)], 'patient_created_desc'),
+    ([('predicted_class', 1), ('created_at', -1), ('_id', -1)], 'class_created_desc'),
+    ([('created_at', -1), ('_id', -1)], 'created_desc'),
+    # 유사 증례 색인 재구성 (현재 모델 버전의 최근 기록)
+    ([('model_version', 1), ('created_at', -1), ('_id', -1)], 'model_created_desc'),
+]
+
+
+# 추론 작업 큐 (app/services/jobs.py): 대기 작업 가져가기, lease 만료 작업 다시 가져가기/실패 처리
+INFERENCE_JOB_INDEXES: List[Tuple[List[Tuple[str, int]], str]] = [
+    ([('status', 1), ('priority', 1), ('created_at', 1)], 'status_priority_created'),
+    ([('status', 1), ('lease_until', 1)], 'status_lease'),
+]
+
+
+async def create_ai_diagnosis_indexes(collection: Any) -> None:
+    for keys, name in AI_DIAGNOSIS_INDEXES:
+        await collection.create_index(keys, name=name)
+
+
+async def create_inference_job_indexes(collection: Any, retention_seconds: int) -> None:
+    for keys, name in INFERENCE_JOB_INDEXES:
+        await collection.create_index(keys, name=name)
+    # 끝난 작업은 finished_at 기준으로 자동 삭제 (대기/실행 중인 작업에는 finished_at 이 없음)
+    await collection.create_index([('finished_at', 1)], name='finished_ttl', expireAfterSeconds=retention_seconds)
+
+
+async def ensure_indexes(session: MongoSession) -> None:
+    """필요한 인덱스를 생성한다 (이미 있으면 아무 일도 하지 않음)."""
+    from app.core.config import get_settings
+
+    await create_ai_diagnosis_indexes(session.ai_diagnoses)
+    await create_inference_job_indexes(session.inference_jobs, get_settings().job_retention_seconds)
+
+
+def _index_names(plan: Any) -> List[str]:
+    """explain의 winningPlan 트리에서 사용된 인덱스 이름과 COLLSCAN 여부를 모은다."""
+    names: List[str] = []
+    if isinstance(plan, dict):
+        if plan.get('stage') == 'COLLSCAN':
+            names.append('COLLSCAN')
+        if 'indexName' in plan:
+            names.append(plan['indexName'])
+        for value in plan.values():
+            names.extend(_index_names(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            names.extend(_index_names(value))
+    return names
+
+
+async def explain_index_usage(
+    collection: Any,
+    query: Dict[str, Any],
+    limit: int = 20,
+    sort: List[Tuple[str, int]] | None = None,
+    projection: Dict[str, int] | None = None,
+) -> List[str]:
+    """목록 조회(기본값) 또는 sort/projection 을 지정한 쿼리를 explain 해서 사용된 인덱스를 반환한다."""
+    from app.services.history import HISTORY_SORT, LIST_PROJECTION
+
+    cursor = collection.find(query, projection or LIST_PROJECTION).sort(sort or HISTORY_SORT).limit(limit)
+    explain = await cursor.explain()
+    return _index_names(explain.get('queryPlanner', {}).get('winningPlan', {}))
+
+
+def _sample_documents(count: int, now: datetime) -> List[Dict[str, Any]]:
+    classes = ['COVID', 'Lung_Opacity', 'Normal', 'Viral Pneumonia']
+    return [
+        {
+            'patient_id': f'p-{i % 200}',
+            'predicted_class': classes[i % len(classes)],
+            'confidence': (i % 100) / 100,
+            'model_version': f'explain-check-{i % 3}',
+            'created_at': now - timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+
+
+def index_check_cases(now: datetime) -> List[Tuple[str, Dict[str, Any], Dict[str, Any], str]]:
+    """(이름, 쿼리, explain_index_usage 추가 인자, 기대 인덱스) - 목록 조회, keyset cursor, 내보내기."""
+    from bson import ObjectId
+
+    from app.services.export import EXPORT_PROJECTION, EXPORT_SORT, build_export_query
+    from app.services.history import build_history_query, encode_cursor
+
+    # 중간 어딘가에서 끊긴 페이지의 마지막 문서
+    cursor = encode_cursor({'created_at': now - timedelta(hours=1), '_id': ObjectId.from_datetime(now - timedelta(hours=1))})
+    export = {'sort': EXPORT_SORT, 'projection': EXPORT_PROJECTION}
+    return [
+        ('patient', build_history_query(patient_id='p-1'), {}, 'patient_created_desc'),
+        ('patient+confidence', build_history_query(patient_id='p-1', min_confidence=0.5), {}, 'patient_created_desc'),
+        ('class', build_history_query(predicted_class='COVID'), {}, 'class_created_desc'),
+        ('time window', build_history_query(date_from=now - timedelta(days=7), date_to=now), {}, 'created_desc'),
+        ('all', build_history_query(), {}, 'created_desc'),
+        ('cursor', build_history_query(cursor=cursor), {}, 'created_desc'),
+        ('patient+cursor', build_history_query(patient_id='p-1', cursor=cursor), {}, 'patient_created_desc'),
+        ('class+cursor', build_history_query(predicted_class='COVID', cursor=cursor), {}, 'class_created_desc'),
+        ('export', build_export_query(), export, 'created_desc'),
+        ('export window', build_export_query(date_from=now - timedelta(days=7), date_to=now), export, 'created_desc'),
+        ('export class', build_export_query(predicted_class='COVID', date_from=now - timedelta(days=7)), export,
+         'class_created_desc'),
+        ('export model', build_export_query(model_version='explain-check-1'), export, 'model_created_desc'),
+    ]
+
+
+async def create_index_check_collection(session: MongoSession, now: datetime, sample_size: int = 5000) -> Any:
+    """같은 인덱스와 샘플 문서를 가진 임시 컬렉션 (빈 컬렉션에서는 플래너 선택이 불안정하다). 쓰고 나서 drop 한다."""
+    scratch = session.db.get_collection('ai_diagnoses_index_check')
+    await scratch.drop()
+    await create_ai_diagnosis_indexes(scratch)
+    await scratch.insert_many(_sample_documents(sample_size, now))
+    return scratch
+
+
+async def check_index_usage(session: MongoSession, sample_size: int = 5000) -> bool:
+    """대표 쿼리들이 기대한 인덱스를 사용하는지 확인한다 (임시 컬렉션에 샘플 문서를 넣고 explain)."""
+    now = datetime.now(timezone.utc)
+    scratch = await create_index_check_collection(session, now, sample_size)
+    try:
+        ok = True
+        for label, query, options, expected in index_check_cases(now):
+            used = await explain_index_usage(scratch, query, **options)
+            passed = expected in used and 'COLLSCAN' not in used
+            ok = ok and passed
+            print(f'{"✅" if passed else "❌"} {label}: 기대 {expected}, 실제 {used}')
+        return ok
+    finally:
+        await scratch.drop()
+
+
+async def _main() -> int:
+    parser = argparse.ArgumentParser(description='ai_diagnoses 인덱스 생성/점검')
+    parser.add_argument('--check', action='store_true', help='explain 으로 인덱스 사용 여부 확인')
+    args = parser.parse_args()
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from app.core.config import get_settings
+
+    settings = get_settings()
+    if settings.mongo_uri.startswith('memory://'):
+        print('❌ explain 점검은 실제 mongod 가 필요합니다 (MONGODB_URI 확인).')
+        return 2
+
+    client = AsyncIOMotorClient(settings.mongo_uri)
+    try:
+        session = MongoSession(client[settings.mongo_db])
+        await ensure_indexes(session)
+        print('✅ ai_diagnoses / inference_jobs 인덱스 확인 완료')
+        if not args.check:
+            return 0
+        return 0 if await check_index_usage(session) else 1
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(_main()))
@@ -0,0 +1,257 @@
+"""motor 인터페이스 일부를 흉내내는 프로세스 내 MongoDB 대용품.
+
+`MONGODB_URI=memory://` 로 실행하면 실제 mongod 없이 서비스를 띄울 수 있다.
+(로컬 개발, 부하 테스트, write-behind 큐 검증용)
+지원 범위: 동등 비교와 $gt/$gte/$lt/$lte/$ne/$in/$exists/$or/$and 필터, 정렬/skip/limit/projection,
+$set/$unset/$inc 갱신 (update_one/update_many/find_one_and_update).
+프로세스 안에만 있으므로 작업 큐(app/services/jobs.py)는 같은 프로세스의 워커(JOB_LOCAL_WORKERS)로만 쓸 수 있다.
+"""
+from __future__ import annotations
+
+import asyncio
+import copy
+from typing import Any, Dict, Iterable, List, Tuple
+
+from bson import ObjectId
+
+_MISSING = object()
+
+
+def _get_path(doc: Dict[str, Any], path: str) -> Any:
+    value: Any = doc
+    for part in path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _match_condition(value: Any, condition: Any) -> bool:
+    if isinstance(condition, dict) and condition and all(k.startswith('$') for k in condition):
+        for op, operand in condition.items():
+            if op == '$exists':
+                if (value is not _MISSING) != bool(operand):
+                    return False
+                continue
+            if op == '$ne':
+                if value is not _MISSING and value == operand:
+                    return False
+                continue
+            if op == '$in':
+                if value is _MISSING or value not in operand:
+                    return False
+                continue
+            if value is _MISSING or value is None:
+                return False
+            try:
+                if op == '$gt' and not value > operand:
+                    return False
+                if op == '$gte' and not value >= operand:
+                    return False
+                if op == '$lt' and not value < operand:
+                    return False
+                if op == '$lte' and not value <= operand:
+                    return False
+            except TypeError:
+                return False
+        return True
+    if value is _MISSING:
+        return condition is None
+    return value == condition
+
+
+def matches(doc: Dict[str, Any], query: Dict[str, Any] | None) -> bool:
+    """문서가 필터 조건을 만족하는지 확인한다."""
+    for key, condition in (query or {}).items():
+        if key == '$or':
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == '$and':
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif not _match_condition(_get_path(doc, key), condition):
+            return False
+    return True
+
+
+def _project(doc: Dict[str, Any], projection: Dict[str, Any] | None) -> Dict[str, Any]:
+    if not projection:
+        return copy.deepcopy(doc)
+    include = {k for k, v in projection.items() if v and k != '_id'}
+    if include:
+        result = {k: copy.deepcopy(doc[k]) for k in include if k in doc}
+        if projection.get('_id', 1) and '_id' in doc:
+            result['_id'] = doc['_id']
+        return result
+    return {k: copy.deepcopy(v) for k, v in doc.items() if projection.get(k, 1)}
+
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    return (0, None) if value is _MISSING or value is None else (1, value)
+
+
+def _sorted(docs: List[Dict[str, Any]], sort: List[Tuple[str, int]]) -> List[Dict[str, Any]]:
+    for key, direction in reversed(sort):
+        docs.sort(key=lambda d: _sort_key(_get_path(d, key)), reverse=direction < 0)
+    return docs
+
+
+def _apply_update(doc: Dict[str, Any], update: Dict[str, Any]) -> None:
+    for op, fields in update.items():
+        for key, value in fields.items():
+            if op == '$set':
+                doc[key] = copy.deepcopy(value)
+            elif op == '$unset':
+                doc.pop(key, None)
+            elif op == '$inc':
+                doc[key] = doc.get(key, 0) + value
+            else:
+                raise NotImplementedError(f'인메모리 MongoDB 가 지원하지 않는 갱신 연산자: {op}')
+
+
+class InMemoryCursor:
+    def __init__(self, collection: 'InMemoryCollection', query: Dict[str, Any] | None, projection: Dict[str, Any] | None):
+        self._collection = collection
+        self._query = query or {}
+        self._projection = projection
+        self._sort: List[Tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+        self._results: List[Dict[str, Any]] | None = None
+
+    def sort(self, key_or_list: str | Iterable[Tuple[str, int]], direction: int = 1) -> 'InMemoryCursor':
+        self._sort = [(key_or_list, direction)] if isinstance(key_or_list, str) else list(key_or_list)
+        return self
+
+    def skip(self, count: int) -> 'InMemoryCursor':
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> 'InMemoryCursor':
+        self._limit = count
+        return self
+
+    def batch_size(self, size: int) -> 'InMemoryCursor':
+        return self
+
+    def _evaluate(self) -> List[Dict[str, Any]]:
+        if self._results is None:
+            docs = _sorted([doc for doc in self._collection._docs if matches(doc, self._query)], self._sort)
+            docs = docs[self._skip:]
+            if self._limit:
+                docs = docs[:self._limit]
+            self._results = [_project(doc, self._projection) for doc in docs]
+        return self._results
+
+    async def to_list(self, length: int | None = None) -> List[Dict[str, Any]]:
+        docs = self._evaluate()
+        return list(docs if length is None else docs[:length])
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._evaluate():
+            yield doc
+
+
+class InMemoryCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self._docs: List[Dict[str, Any]] = []
+        self._indexes: Dict[str, Dict[str, Any]] = {'_id_': {'key': [('_id', 1)]}}
+
+    def _insert(self, doc: Dict[str, Any]) -> ObjectId:
+        doc = copy.deepcopy(doc)
+        doc.setdefault('_id', ObjectId())
+        self._docs.append(doc)
+        return doc['_id']
+
+    async def insert_one(self, document: Dict[str, Any]):
+        inserted_id = self._insert(document)
+        document.setdefault('_id', inserted_id)
+        return _Result(inserted_id=inserted_id)
+
+    async def insert_many(self, documents: List[Dict[str, Any]], ordered: bool = True):
+        ids = []
+        for document in documents:
+            inserted_id = self._insert(document)
+            document.setdefault('_id', inserted_id)
+            ids.append(inserted_id)
+        await asyncio.sleep(0)
+        return _Result(inserted_ids=ids)
+
+    def find(self, filter: Dict[str, Any] | None = None, projection: Dict[str, Any] | None = None) -> InMemoryCursor:
+        return InMemoryCursor(self, filter, projection)
+
+    async def find_one(self, filter: Dict[str, Any] | None = None, projection: Dict[str, Any] | None = None):
+        docs = await self.find(filter, projection).limit(1).to_list(1)
+        return docs[0] if docs else None
+
+    async def count_documents(self, filter: Dict[str, Any] | None = None) -> int:
+        return sum(1 for doc in self._docs if matches(doc, filter))
+
+    async def update_one(self, filter: Dict[str, Any], update: Dict[str, Any]):
+        for doc in self._docs:
+            if matches(doc, filter):
+                _apply_update(doc, update)
+                return _Result(matched_count=1, modified_count=1)
+        return _Result(matched_count=0, modified_count=0)
+
+    async def update_many(self, filter: Dict[str, Any], update: Dict[str, Any]):
+        count = 0
+        for doc in self._docs:
+            if matches(doc, filter):
+                _apply_update(doc, update)
+                count += 1
+        return _Result(matched_count=count, modified_count=count)
+
+    async def find_one_and_update(
+        self,
+        filter: Dict[str, Any],
+        update: Dict[str, Any],
+        projection: Dict[str, Any] | None = None,
+        sort: List[Tuple[str, int]] | None = None,
+        return_document: bool = False,
+    ):
+        """return_document=True 는 pymongo ReturnDocument.AFTER 와 같다 (단일 스레드 이벤트 루프라 원자적)."""
+        docs = _sorted([doc for doc in self._docs if matches(doc, filter)], list(sort or []))
+        if not docs:
+            return None
+        doc = docs[0]
+        before = _project(doc, projection)
+        _apply_update(doc, update)
+        return _project(doc, projection) if return_document else before
+
+    async def delete_many(self, filter: Dict[str, Any] | None = None):
+        before = len(self._docs)
+        self._docs = [doc for doc in self._docs if not matches(doc, filter)]
+        return _Result(deleted_count=before - len(self._docs))
+
+    async def create_index(self, keys: str | List[Tuple[str, int]], name: str | None = None, **kwargs: Any) -> str:
+        key_list = [(keys, 1)] if isinstance(keys, str) else list(keys)
+        index_name = name or '_'.join(f'{k}_{v}' for k, v in key_list)
+        self._indexes[index_name] = {'key': key_list, **kwargs}
+        return index_name
+
+    async def index_information(self) -> Dict[str, Dict[str, Any]]:
+        return copy.deepcopy(self._indexes)
+
+
+class _Result:
+    def __init__(self, **fields: Any):
+        self.__dict__.update(fields)
+
+
+class InMemoryDatabase:
+    def __init__(self, name: str = 'medical-ai'):
+        self.name = name
+        self._collections: Dict[str, InMemoryCollection] = {}
+
+    def get_collection(self, name: str) -> InMemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = InMemoryCollection(name)
+        return self._collections[name]
+
+    def __getitem__(self, name: str) -> InMemoryCollection:
+        return self.get_collection(name)
@@ -1,5 +1,7 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 
+from .indexes import ensure_indexes
+from .memory import InMemoryDatabase
 from .session import MongoSession
 from app.core.config import get_settings
 
@@ -10,9 +12,20 @@ session: MongoSession | None = None
 async def connect_to_mongo() -> None:
     global client, session
     settings = get_settings()
-    client = AsyncIOMotorClient(settings.mongo_uri)
-    session = MongoSession(client[settings.mongo_db])
-    print('✅ FastAPI MongoDB 연결 성공')
+    if settings.mongo_uri.startswith('memory://'):
+        # 실제 mongod 없이 실행 (로컬 개발/부하 테스트용)
+        session = MongoSession(InMemoryDatabase(settings.mongo_db))
+        print('✅ FastAPI 인메모리 MongoDB 대용품 사용')
+    else:
+        client = AsyncIOMotorClient(settings.mongo_uri)
+        session = MongoSession(client[settings.mongo_db])
+        print('✅ FastAPI MongoDB 연결 성공')
+
+    # 조회용 인덱스 생성 (이미 있으면 무시됨). 인덱스 생성 실패로 서버가 멈추지는 않게 한다.
+    try:
+        await ensure_indexes(session)
+    except Exception as e:
+        print(f'⚠️ 인덱스 생성 실패: {e}')
 
 
 async def close_mongo_connection() -> None:
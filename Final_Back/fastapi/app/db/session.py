@@ -17,6 +17,16 @@ class MongoSession:
     def diagnoses(self):
         return self._database.get_collection('diagnoses')
 
+    @property
+    def ai_diagnoses(self):
+        # FastAPI가 직접 남기는 추론 기록 (Express가 관리하는 diagnoses와 분리)
+        return self._database.get_collection('ai_diagnoses')
+
+    @property
+    def inference_jobs(self):
+        # INFERENCE_MODE=queue 에서 API 가 넣고 워커 프로세스가 가져가는 추론 작업 (app/services/jobs.py)
+        return self._database.get_collection('inference_jobs')
+
     @property
     def users(self):
         return self._database.get_collection('users')
@@ -1,38 +1,88 @@
 from collections.abc import AsyncGenerator
-from pathlib import Path
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.staticfiles import StaticFiles
 
+from app.core.config import get_settings
+import app.db.mongo as mongo
 from app.db.mongo import connect_to_mongo, close_mongo_connection
-from app.routers import ai
-from app.services.model import load_model, unload_model
+from app.routers import ai, debug
+from app.services.admission import start_admission_control, stop_admission_control
+from app.services.cam_store import MemoryCamStore, get_cam_store, media_type_for
+import app.services as services
+from app.services.jobs import queue_enabled, start_job_queue, stop_job_queue
+from app.services.persistence import start_diagnosis_writer, stop_diagnosis_writer
+from app.services.scheduler import start_scheduler, stop_scheduler
+from app.services.similarity import start_similarity_index, stop_similarity_index
+from app.services.tuning import autotune_at_startup
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """content-addressed 파일용 StaticFiles (파일 이름이 바뀌지 않으면 내용도 바뀌지 않음)"""
+
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code == 200:
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
 
 
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     await connect_to_mongo()
+    start_diagnosis_writer(mongo.session.ai_diagnoses)
 
-    # 서버 시작 시 모델 로딩 (동기)
-    print("🔄 AI 모델 로딩 시작...")
-    load_model()
-    print("✅ AI 모델 로딩 완료!")
+    # 서버 시작 시 모델 로딩 (동기). 작업 큐 모드의 API 프로세스는 모델 없이 작업만 넣는다.
+    queue_mode = queue_enabled()
+    models_loaded = not queue_mode or get_settings().job_local_workers > 0
+    if models_loaded:
+        print("🔄 AI 모델 로딩 시작...")
+        services.load_model()
+        print("✅ AI 모델 로딩 완료!")
+        autotune_at_startup()
+    start_scheduler()
+    start_admission_control()
+    if queue_mode:
+        start_job_queue(mongo.session.inference_jobs)
+    start_similarity_index(mongo.session.ai_diagnoses)
 
     try:
         yield
     finally:
-        unload_model()
+        await stop_similarity_index()
+        await stop_job_queue()
+        stop_admission_control()
+        await stop_scheduler()
+        if models_loaded:
+            services.unload_model()
+        await stop_diagnosis_writer()
         await close_mongo_connection()
 
 
 app = FastAPI(title='Medical AI FastAPI', lifespan=lifespan)
 app.include_router(ai.router)
+app.include_router(debug.router)
+
+# Static files for Grad-CAM images (CAM 저장소 디렉토리를 /static/gradcam 으로 서비스)
+static_dir = get_settings().static_dir
+cam_store = get_cam_store()  # 저장소 디렉토리 생성 및 기존 파일 인덱싱
+
+if isinstance(cam_store, MemoryCamStore):
+    # 메모리 저장소: /static 마운트보다 먼저 등록해서 CAM 이미지를 직접 서비스
+    @app.get('/static/gradcam/{key}', include_in_schema=False)
+    async def serve_cam_image(key: str, request: Request):
+        item = cam_store.get(key)
+        if item is None:
+            raise HTTPException(status_code=404, detail='CAM 이미지를 찾을 수 없습니다.')
+        data, etag = item
+        headers = {'ETag': etag, 'Cache-Control': IMMUTABLE_CACHE_CONTROL}
+        if request.headers.get('if-none-match') == etag:
+            return Response(status_code=304, headers=headers)
+        return Response(content=data, media_type=media_type_for(key), headers=headers)
 
-# Static files for Grad-CAM images
-static_dir = Path(__file__).parent / 'static'  # app/static 경로로 수정
-static_dir.mkdir(exist_ok=True)
-gradcam_dir = static_dir / 'gradcam'
-gradcam_dir.mkdir(exist_ok=True)
-app.mount('/static', StaticFiles(directory=str(static_dir)), name='static')
+static_dir.mkdir(parents=True, exist_ok=True)
+app.mount('/static', ImmutableStaticFiles(directory=str(static_dir)), name='static')
 
 
 @app.get('/')
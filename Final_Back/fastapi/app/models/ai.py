@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 
 
@@ -14,8 +14,15 @@ class Finding(BaseModel):
     description: str | None = None
 
 
+class QualityCheck(BaseModel):
+    stage: str  # image (분할 전) | mask (분할 후)
+    reasons: List[str]
+    stats: Dict[str, float] = {}
+
+
 class DiagnosisResponse(BaseModel):
     patient_id: str
+    inference_id: Optional[str] = None
     confidence: float
     findings: List[Finding]
     recommendations: List[str]
@@ -23,3 +30,35 @@ class DiagnosisResponse(BaseModel):
     gradcam_path: Optional[str] = None
     gradcam_plus_path: Optional[str] = None
     layercam_path: Optional[str] = None
+    cam_methods: List[str] = []
+    # 최근 거의 같은 이미지의 진단 결과를 재사용한 경우 (duplicate_of: 원래 진단의 inference_id)
+    near_duplicate: bool = False
+    duplicate_of: Optional[str] = None
+    # 영상 품질 검사에서 거절되어 분류/CAM 을 생략한 경우 (findings 비어 있음, quality 에 사유와 측정값)
+    unsuitable: bool = False
+    quality: Optional[QualityCheck] = None
+
+
+class DiagnosisHistoryItem(BaseModel):
+    id: str
+    patient_id: Optional[str] = None
+    predicted_class: Optional[str] = None
+    confidence: Optional[float] = None
+    model_version: Optional[str] = None
+    cam_paths: Dict[str, str] = {}
+    created_at: str
+
+
+class DiagnosisHistoryPage(BaseModel):
+    items: List[DiagnosisHistoryItem]
+    next_cursor: Optional[str] = None
+
+
+class SimilarCase(DiagnosisHistoryItem):
+    similarity: float
+
+
+class SimilarCasesResponse(BaseModel):
+    diagnosis_id: str
+    model_version: Optional[str] = None
+    items: List[SimilarCase]
@@ -1,3 +1,3 @@
-from . import ai
+from . import ai, debug
 
-__all__ = ['ai']
+__all__ = ['ai', 'debug']
@@ -1,17 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, Header, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime, timezone
 from pathlib import Path
-import tempfile
-import os
+import asyncio
 import json
+import time
+import traceback
 
 import app.db.mongo as mongo
-from app.models.ai import DiagnosisResponse, Finding
-from app.services import model as model_service
+from app.models.ai import DiagnosisHistoryPage, DiagnosisResponse, Finding, SimilarCasesResponse
+from app.core.config import get_settings
+import app.services as services
+from app.services import (
+    admission, export, history, jobs, memory_accounting, metrics, near_duplicate, persistence, profiling, scheduler, similarity,
+)
+from app.services.cam_policy import parse_cam_methods
+from app.services.pipeline import InvalidImage, PipelineCancelled, PipelineContext, parse_deadline
 
 router = APIRouter(prefix='/api/ai', tags=['AI'])
 
+# 추론 대기/실행 중 클라이언트 연결 종료 확인 주기 (초)
+DISCONNECT_POLL_SECONDS = 0.5
+# 취소 사유별 응답 코드 (499: 클라이언트가 먼저 연결을 끊음)
+CANCEL_STATUS = {'client_disconnected': 499}
+
 
 def get_mongo_session():
     if mongo.session is None:
@@ -24,65 +38,253 @@ async def health_check(mongo_session=Depends(get_mongo_session)):
     return {'status': 'ok'}
 
 
-@router.post('/diagnose')
-async def diagnose(
-    image: UploadFile = File(...),
-    patient_id: str = Form(default=''),
-    notes: str = Form(default=None)
+@router.get('/metrics')
+async def get_metrics():
+    return metrics.snapshot()
+
+
+@router.get('/diagnoses', response_model=DiagnosisHistoryPage)
+async def list_diagnoses(
+    patient_id: str | None = None,
+    predicted_class: str | None = None,
+    min_confidence: float | None = Query(default=None, ge=0, le=1),
+    max_confidence: float | None = Query(default=None, ge=0, le=1),
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    cursor: str | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    mongo_session=Depends(get_mongo_session),
 ):
-    # MongoDB 쿼리 제거 - 속도 최적화 (환자 정보는 Express에서 관리)
-    patient = None
+    try:
+        return await history.list_diagnoses(
+            mongo_session.ai_diagnoses,
+            limit=limit,
+            patient_id=patient_id,
+            predicted_class=predicted_class,
+            min_confidence=min_confidence,
+            max_confidence=max_confidence,
+            date_from=date_from,
+            date_to=date_to,
+            cursor=cursor,
+        )
+    except history.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    # 업로드된 파일을 임시로 저장
-    temp_path = None
+
+@router.get('/diagnoses/export')
+async def export_diagnoses(
+    export_format: str = Query(default='csv', alias='format', pattern='^(csv|parquet)$'),
+    predicted_class: str | None = None,
+    model_version: str | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    mongo_session=Depends(get_mongo_session),
+):
+    """조건에 맞는 진단 기록 전체를 CSV / Parquet 파일로 스트리밍한다 (app/services/export.py)."""
     try:
-        # 임시 파일 생성
-        suffix = os.path.splitext(image.filename)[1] if image.filename else '.png'
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
-            content = await image.read()
-            tmp_file.write(content)
-            temp_path = tmp_file.name
-        
-        image_path = Path(temp_path)
+        encoder = export.make_encoder(export_format)
+    except export.ExportUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    filename = f'diagnoses-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.{encoder.extension}'
+    return StreamingResponse(
+        export.stream_export(
+            mongo_session.ai_diagnoses,
+            encoder,
+            predicted_class=predicted_class,
+            model_version=model_version,
+            date_from=date_from,
+            date_to=date_to,
+        ),
+        media_type=encoder.media_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get('/diagnoses/{diagnosis_id}/similar', response_model=SimilarCasesResponse)
+async def similar_diagnoses(
+    diagnosis_id: str,
+    k: int = Query(default=5, ge=1, le=50),
+    mongo_session=Depends(get_mongo_session),
+):
+    """진단 임베딩이 가장 비슷한 이전 증례 k 건 (모델 추론 없이 메모리 색인에서 검색)."""
+    index = similarity.index
+    if index is None:
+        raise HTTPException(status_code=503, detail='유사 증례 색인이 비활성화되어 있습니다 (SIMILARITY_INDEX).')
+    try:
+        object_id = ObjectId(diagnosis_id)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail=f'잘못된 진단 id 입니다: {diagnosis_id}')
+
+    collection = mongo_session.ai_diagnoses
+    vector = index.vector(object_id)
+    if vector is None:
+        # 색인에 없으면 (다른 워커에서 방금 저장 등) 저장된 임베딩으로 검색
+        document = await collection.find_one({'_id': object_id}, similarity.SIMILARITY_PROJECTION)
+        if document is None:
+            raise HTTPException(status_code=404, detail='진단 기록을 찾을 수 없습니다.')
+        if not document.get('embedding'):
+            raise HTTPException(status_code=409, detail='임베딩이 저장되지 않은 진단입니다.')
+        if document.get('model_version') != index.model_version:
+            raise HTTPException(status_code=409, detail=f'다른 모델 버전({document.get("model_version")})의 진단은 비교할 수 없습니다.')
+        vector = similarity.decode_embedding(document['embedding'])
+
+    hits = index.search(vector, k, exclude=[object_id])
+    documents = await collection.find({'_id': {'$in': [doc_id for doc_id, _ in hits]}}, history.LIST_PROJECTION).to_list(len(hits))
+    by_id = {document['_id']: document for document in documents}
+    # write-behind 큐에서 아직 저장되지 않은 기록은 건너뛴다
+    items = [
+        {**history.serialize_history_item(by_id[doc_id]), 'similarity': score}
+        for doc_id, score in hits
+        if doc_id in by_id
+    ]
+    return {'diagnosis_id': diagnosis_id, 'model_version': index.model_version, 'items': items}
+
+
+async def _watch_disconnect(request: Request, ctx: PipelineContext) -> None:
+    while True:
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+        if await request.is_disconnected():
+            ctx.cancel('client_disconnected')
+            return
+
+
+async def _run_until_deadline(request: Request, ctx: PipelineContext, inference) -> dict:
+    """마감 시각까지만 결과를 기다리고, 연결이 끊기거나 마감되면 파이프라인에 취소를 알린다."""
+    watcher = asyncio.create_task(_watch_disconnect(request, ctx))
+    try:
+        timeout = None if ctx.deadline is None else max(0.0, ctx.deadline - time.monotonic())
+        return await asyncio.wait_for(inference, timeout)
+    except asyncio.TimeoutError:
+        ctx.cancel('deadline_exceeded')
+        raise PipelineCancelled('deadline_exceeded')
+    finally:
+        watcher.cancel()
+
+
+def _check_upload_size(size: int) -> None:
+    limit = get_settings().max_upload_bytes
+    if size > limit:
+        raise HTTPException(status_code=413, detail=f'이미지가 너무 큽니다 ({size:,} bytes, 최대 {limit:,} bytes)')
+
 
+async def _read_raw_body(request: Request) -> bytearray:
+    """요청 본문을 미리 할당한 버퍼로 바로 읽는다 (Content-Length 가 없으면 한도까지 늘려가며 읽음)."""
+    declared = request.headers.get('content-length')
+    if declared is None:
+        buffer = bytearray()
+        async for chunk in request.stream():
+            _check_upload_size(len(buffer) + len(chunk))
+            buffer += chunk
+        return buffer
+
+    try:
+        size = int(declared)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f'잘못된 Content-Length: {declared}')
+    _check_upload_size(size)
+
+    buffer = bytearray(size)
+    received = 0
+    with memoryview(buffer) as view:
+        async for chunk in request.stream():
+            end = received + len(chunk)
+            if end > size:
+                raise HTTPException(status_code=400, detail='본문이 Content-Length 보다 깁니다.')
+            view[received:end] = chunk
+            received = end
+    if received != size:
+        raise HTTPException(status_code=400, detail=f'본문이 잘렸습니다 ({received:,}/{size:,} bytes)')
+    return buffer
+
+
+async def _diagnose(
+    request: Request,
+    image_data: bytes | bytearray,
+    patient_id: str,
+    notes: str | None,
+    requested_cam_methods: list[str] | None,
+    priority_class: str,
+    deadline: float | None,
+) -> dict:
+    """업로드 방식(multipart / raw)과 무관한 추론 실행, 기록 저장, 응답 생성."""
+    if not image_data:
+        raise HTTPException(status_code=400, detail='이미지 데이터가 비어 있습니다.')
+
+    # 적응형 동시 처리 한도를 넘으면 대기열에 넣지 않고 바로 503
+    try:
+        ticket = admission.acquire(priority_class)
+    except admission.Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={'Retry-After': '1'})
+
+    queued = jobs.client is not None
+    if queued and deadline is None:
+        # 작업 큐 모드에서는 마감이 없어도 JOB_WAIT_TIMEOUT 까지만 기다린다
+        deadline = time.monotonic() + get_settings().job_wait_timeout
+
+    # 실제 AI 모델을 사용한 예측 (시간 측정)
+    start_time = time.time()
+    ctx = PipelineContext(deadline=deadline)
+    try:
+        print(f'🚀 진단 요청 시작 - 이미지 {len(image_data):,} bytes (우선순위: {priority_class})')
+        if queued:
+            # 별도 워커 프로세스가 처리 (app/services/jobs.py)
+            inference = jobs.client.run(image_data, priority_class, ctx, patient_id, requested_cam_methods)
+        else:
+            predict = services.predict
+            if get_settings().memory_accounting:
+                predict = memory_accounting.tracker.wrap(predict, ctx)
+            if profiling.controller.armed:
+                predict = profiling.controller.wrap(predict, ctx)
+            inference = scheduler.run_inference(
+                priority_class,
+                predict,
+                image_data,
+                context=ctx,
+                cam_methods=requested_cam_methods,
+                patient_id=patient_id,
+                deadline=deadline,
+            )
+        inference_result = await _run_until_deadline(request, ctx, inference)
+        elapsed_time = time.time() - start_time
+        # 재사용(근접 중복) 결과는 실행 시간이 0 에 가까워 한도 조정에 쓰지 않는다
+        ticket.release(service_seconds=ctx.timings.get('total'), sample=inference_result.get('duplicate_of') is None)
+        print(f'⏱️ AI 모델 예측 완료: {elapsed_time:.2f}초 소요')
         
-        if not image_path.exists():
-                raise HTTPException(status_code=400, detail=f'이미지 파일을 저장할 수 없습니다: {image_path}')
-            
-        print(f'📥 업로드된 이미지 파일 저장 완료: {image_path}')
-
-        # 실제 AI 모델을 사용한 예측 (시간 측정)
-        import time
-        import traceback
-        start_time = time.time()
-        try:
-            print(f'🚀 진단 요청 시작 - 이미지: {image_path}')
-            inference_result = model_service.predict(image_path)
-            elapsed_time = time.time() - start_time
-            print(f'⏱️ AI 모델 예측 완료: {elapsed_time:.2f}초 소요')
-            
-            # 예측 시간 확인 (CPU 사용 시 더 짧을 수 있음)
-            if elapsed_time < 0.5:
-                print(f'⚠️ 경고: 예측 시간이 너무 짧습니다 ({elapsed_time:.2f}초). 모델이 제대로 실행되지 않았을 수 있습니다.')
-            elif elapsed_time < 2:
-                print(f'ℹ️ 정보: 예측 시간이 {elapsed_time:.2f}초입니다. (CPU 사용 시 정상 범위)')
-            else:
-                print(f'✅ 예측 시간: {elapsed_time:.2f}초 (정상)')
-            
-        except Exception as e:
-            elapsed_time = time.time() - start_time
-            print(f'❌ AI 모델 예측 실패 ({elapsed_time:.2f}초): {str(e)}')
-            print(f'❌ 상세 에러:\n{traceback.format_exc()}')
-            raise HTTPException(status_code=500, detail=f'AI 모델 예측 중 오류가 발생했습니다: {str(e)}')
+        # 예측 시간 확인 (CPU 사용 시 더 짧을 수 있음)
+        if elapsed_time < 0.5:
+            print(f'⚠️ 경고: 예측 시간이 너무 짧습니다 ({elapsed_time:.2f}초). 모델이 제대로 실행되지 않았을 수 있습니다.')
+        elif elapsed_time < 2:
+            print(f'ℹ️ 정보: 예측 시간이 {elapsed_time:.2f}초입니다. (CPU 사용 시 정상 범위)')
+        else:
+            print(f'✅ 예측 시간: {elapsed_time:.2f}초 (정상)')
         
+    except InvalidImage as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except scheduler.QueueFull as e:
+        ticket.release(dropped=True)
+        raise HTTPException(status_code=503, detail=str(e))
+    except PipelineCancelled as e:
+        ticket.release(dropped=True, sample=e.reason != 'client_disconnected')
+        metrics.inc(f'inference.cancelled.{e.reason}')
+        print(f'🛑 추론 중단 ({e.reason}, {time.time() - start_time:.2f}초)')
+        raise HTTPException(status_code=CANCEL_STATUS.get(e.reason, 504), detail=str(e))
+    except Exception as e:
+        elapsed_time = time.time() - start_time
+        print(f'❌ AI 모델 예측 실패 ({elapsed_time:.2f}초): {str(e)}')
+        print(f'❌ 상세 에러:\n{traceback.format_exc()}')
+        raise HTTPException(status_code=500, detail=f'AI 모델 예측 중 오류가 발생했습니다: {str(e)}')
     finally:
-        # 임시 파일 삭제
-        if temp_path and os.path.exists(temp_path):
-            try:
-                os.remove(temp_path)
-                print(f'🗑️ 임시 파일 삭제 완료: {temp_path}')
-            except Exception as e:
-                print(f'⚠️ 임시 파일 삭제 실패: {e}')
+        ticket.release(sample=False)
+
+    # 추론 기록 저장 (write-behind 큐에 넣기만 하므로 응답 지연 없음)
+    record = persistence.build_inference_record(inference_result, patient_id, notes)
+    persistence.record_inference(record)
+    if record.get('duplicate_of') is None and not record.get('unsuitable'):
+        similarity.add(record)
+        # 작업 큐 모드에서는 결과를 만든 워커가 자기 색인에 추가한다
+        index = None if queued else near_duplicate.get_near_duplicate_index()
+        if index is not None and 'perceptual_hash' in inference_result:
+            index.add(str(record['_id']), inference_result['perceptual_hash'], patient_id, inference_result)
 
     findings = [
         Finding(
@@ -93,10 +295,10 @@ async def diagnose(
         for item in inference_result['findings']
     ]
 
-    import time
     response_build_start = time.time()
     response = DiagnosisResponse(
-            patient_id=patient_id or '',
+        patient_id=patient_id or '',
+        inference_id=str(record['_id']),
         confidence=inference_result['confidence'],
         findings=findings,
         recommendations=inference_result['recommendations'],
@@ -104,6 +306,11 @@ async def diagnose(
         gradcam_path=inference_result.get('gradcam_path'),
         gradcam_plus_path=inference_result.get('gradcam_plus_path'),
         layercam_path=inference_result.get('layercam_path'),
+        cam_methods=inference_result.get('cam_methods', []),
+        near_duplicate=inference_result.get('duplicate_of') is not None,
+        duplicate_of=inference_result.get('duplicate_of'),
+        unsuitable=inference_result.get('unsuitable', False),
+        quality=inference_result.get('quality'),
     )
     response_build_time = time.time() - response_build_start
     print(f'📦 응답 객체 생성 완료: {response_build_time:.4f}초')
@@ -112,6 +319,7 @@ async def diagnose(
     serialization_start = time.time()
     response_dict = {
         'patient_id': response.patient_id,
+        'inference_id': response.inference_id,
         'confidence': response.confidence,
         'findings': [
             {
@@ -124,7 +332,12 @@ async def diagnose(
         'ai_notes': response.ai_notes,
         'gradcam_path': response.gradcam_path,
         'gradcam_plus_path': response.gradcam_plus_path,
-        'layercam_path': response.layercam_path
+        'layercam_path': response.layercam_path,
+        'cam_methods': response.cam_methods,
+        'near_duplicate': response.near_duplicate,
+        'duplicate_of': response.duplicate_of,
+        'unsuitable': response.unsuitable,
+        'quality': response.quality.model_dump() if response.quality is not None else None,
     }
     serialization_time = time.time() - serialization_start
     print(f'✅ 응답 dict 생성 완료: {serialization_time:.4f}초')
@@ -132,3 +345,74 @@ async def diagnose(
 
     # MongoDB Depends가 cleanup되기 전에 return
     return response_dict
+
+
+@router.post('/diagnose')
+async def diagnose(
+    request: Request,
+    image: UploadFile = File(...),
+    patient_id: str = Form(default=''),
+    notes: str = Form(default=None),
+    cam_methods: str | None = Form(default=None),
+    priority: str | None = Form(default=None),
+    deadline_ms: str | None = Form(default=None),
+    x_priority: str | None = Header(default=None),
+    x_request_deadline: str | None = Header(default=None),
+    x_request_timeout_ms: str | None = Header(default=None),
+):
+    # cam_methods: 'gradcam,layercam' / 'all' / 'none' (생략 시 서버 CAM 정책 적용)
+    # priority: urgent / routine / bulk (폼 필드 우선, 없으면 X-Priority 헤더, 둘 다 없으면 DEFAULT_PRIORITY)
+    # deadline_ms / X-Request-Deadline: 절대 마감 시각 (epoch ms), X-Request-Timeout-Ms: 남은 시간 (ms)
+    try:
+        requested_cam_methods = parse_cam_methods(cam_methods)
+        priority_class = scheduler.normalize_priority(priority or x_priority)
+        deadline = parse_deadline(deadline_ms or x_request_deadline, x_request_timeout_ms)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # MongoDB 쿼리 제거 - 속도 최적화 (환자 정보는 Express에서 관리)
+    # 업로드 파일은 임시 파일로 다시 쓰지 않고 메모리에서 바로 디코딩
+    if image.size is not None:
+        _check_upload_size(image.size)
+    content = await image.read()
+    _check_upload_size(len(content))
+    print(f'📥 업로드된 이미지 수신: {image.filename} ({len(content):,} bytes)')
+
+    return await _diagnose(request, content, patient_id, notes, requested_cam_methods, priority_class, deadline)
+
+
+@router.post('/diagnose/raw')
+async def diagnose_raw(
+    request: Request,
+    patient_id: str | None = Query(default=None),
+    notes: str | None = Query(default=None),
+    cam_methods: str | None = Query(default=None),
+    priority: str | None = Query(default=None),
+    deadline_ms: str | None = Query(default=None),
+    x_patient_id: str | None = Header(default=None),
+    x_cam_methods: str | None = Header(default=None),
+    x_priority: str | None = Header(default=None),
+    x_request_deadline: str | None = Header(default=None),
+    x_request_timeout_ms: str | None = Header(default=None),
+):
+    # 본문: 이미지 바이트 그대로 (Content-Type: application/octet-stream 또는 image/*)
+    # 메타데이터: 쿼리 파라미터 우선, 없으면 X-Patient-Id / X-Cam-Methods / X-Priority / X-Request-* 헤더
+    # notes 는 헤더로 보낼 수 없는 문자가 많으므로 쿼리 파라미터로만 받는다
+    content_type = request.headers.get('content-type', 'application/octet-stream').split(';')[0].strip().lower()
+    if content_type != 'application/octet-stream' and not content_type.startswith('image/'):
+        raise HTTPException(status_code=415, detail=f'지원하지 않는 Content-Type: {content_type}')
+
+    try:
+        requested_cam_methods = parse_cam_methods(cam_methods or x_cam_methods)
+        priority_class = scheduler.normalize_priority(priority or x_priority)
+        deadline = parse_deadline(deadline_ms or x_request_deadline, x_request_timeout_ms)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    content = await _read_raw_body(request)
+    print(f'📥 raw 이미지 수신: {len(content):,} bytes')
+
+    return await _diagnose(
+        request, content, patient_id or x_patient_id or '', notes,
+        requested_cam_methods, priority_class, deadline,
+    )
@@ -0,0 +1,61 @@
+"""관리용 진단 엔드포인트 (X-Admin-Token 필요)."""
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse
+
+from app.core.config import get_settings
+from app.services.memory_accounting import tracker
+from app.services.profiling import controller
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)) -> None:
+    admin_token = get_settings().admin_token
+    if not admin_token:
+        raise HTTPException(status_code=404, detail='관리용 엔드포인트가 비활성화되어 있습니다 (ADMIN_TOKEN 미설정).')
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, admin_token):
+        raise HTTPException(status_code=403, detail='관리자 토큰이 올바르지 않습니다.')
+
+
+router = APIRouter(prefix='/debug', tags=['Debug'], dependencies=[Depends(require_admin)])
+
+
+@router.get('/memory')
+async def memory_report(recent: int = Query(default=20, ge=0, le=200)):
+    return tracker.snapshot(recent=recent)
+
+
+@router.get('/profiler')
+async def profiler_status():
+    return controller.status()
+
+
+@router.post('/profiler/arm')
+async def arm_profiler(
+    requests: int | None = Query(default=None, ge=1, le=100),
+    seconds: float | None = Query(default=None, gt=0, le=3600),
+    record_shapes: bool = False,
+    with_stack: bool = False,
+):
+    """다음 N건(requests) 또는 일정 시간(seconds) 동안의 /diagnose 요청을 프로파일링한다."""
+    return controller.arm(requests=requests, seconds=seconds, record_shapes=record_shapes, with_stack=with_stack)
+
+
+@router.post('/profiler/disarm')
+async def disarm_profiler():
+    controller.disarm()
+    return controller.status()
+
+
+@router.get('/profiler/traces')
+async def list_traces():
+    return {'traces': controller.list_traces()}
+
+
+@router.get('/profiler/traces/{name}')
+async def download_trace(name: str):
+    path = controller.trace_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f'trace 를 찾을 수 없습니다: {name}')
+    media_type = 'application/json' if name.endswith('.json') else 'text/plain'
+    return FileResponse(path, media_type=media_type, filename=name)
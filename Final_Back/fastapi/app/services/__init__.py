@@ -1,3 +1,23 @@
-from .model import load_model, unload_model, predict, CLASS_NAMES
+"""서비스 패키지.
+
+model 모듈(torch)은 import 비용이 크므로 `app.services.load_model` 등에 처음 접근할 때 불러온다.
+"""
+from importlib import import_module
+from typing import Any
+
+_LAZY_ATTRIBUTES = {
+    'load_model': 'model',
+    'unload_model': 'model',
+    'predict': 'model',
+    'CLASS_NAMES': 'model',
+}
 
 __all__ = ['load_model', 'unload_model', 'predict', 'CLASS_NAMES']
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(import_module(f'{__name__}.{_LAZY_ATTRIBUTES[name]}'), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
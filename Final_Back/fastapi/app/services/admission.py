@@ -0,0 +1,148 @@
+"""진단 엔드포인트 앞단의 적응형 동시 처리 한도 (AIMD).
+
+고정된 INFERENCE_CONCURRENCY / INFERENCE_QUEUE_SIZE 는 큰 서버에서는 너무 보수적이고
+작은 서버에서는 대기열이 길어져 모든 요청의 지연이 무너진다. 이 모듈은 처리 중(대기 + 실행)인
+요청 수의 한도를 관측된 지연으로 조정하고, 한도를 넘는 요청은 모델을 건드리지 않고 바로 503 으로 돌려보낸다.
+
+  - 신호: 요청 지연 / predict() 실행 시간 (= 1 + 대기 시간 비율). 요청마다 CAM 유무 등으로
+    실행 시간이 달라도 대기열이 쌓였는지만 본다.
+  - 비율이 ADMISSION_QUEUE_TOLERANCE 를 넘거나, 지연이 ADMISSION_TARGET_LATENCY 를 넘거나,
+    요청이 마감/대기열 초과로 실패하면 한도 × ADMISSION_BACKOFF (곱셈 감소)
+  - 그 밖에 한도의 절반 이상을 쓰고 있었으면 한도 + 1 (덧셈 증가)
+"""
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import Any, Deque, Dict
+
+from app.core.config import get_settings
+from app.services import metrics
+
+_SAMPLE_WINDOW = 200
+
+
+class Overloaded(RuntimeError):
+    def __init__(self, limit: int):
+        super().__init__(f'서버가 처리할 수 있는 동시 진단 수({limit}건)를 넘었습니다. 잠시 후 다시 시도하세요.')
+        self.limit = limit
+
+
+class AdaptiveLimiter:
+    """이벤트 루프에서만 호출되므로 잠금이 필요 없다."""
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        backoff: float = 0.9,
+        queue_tolerance: float = 2.0,
+        target_latency: float | None = None,
+    ):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.backoff = backoff
+        self.queue_tolerance = queue_tolerance
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed: Dict[str, int] = {}
+        self.increases = 0
+        self.decreases = 0
+        self._ratios: Deque[float] = deque(maxlen=_SAMPLE_WINDOW)
+
+    def acquire(self, priority: str) -> 'AdmissionTicket':
+        if self.in_flight >= int(self.limit):
+            self.shed[priority] = self.shed.get(priority, 0) + 1
+            metrics.inc(f'admission.shed.{priority}')
+            raise Overloaded(int(self.limit))
+        self.in_flight += 1
+        self.admitted += 1
+        return AdmissionTicket(self, self.in_flight)
+
+    def on_sample(self, latency: float, service: float | None, in_flight: int, dropped: bool) -> None:
+        """요청 하나가 끝날 때 호출된다. in_flight 는 그 요청이 들어올 때의 처리 중 요청 수."""
+        overloaded = dropped
+        if self.target_latency and latency > self.target_latency:
+            overloaded = True
+        if service:
+            ratio = latency / service
+            self._ratios.append(ratio)
+            if ratio > self.queue_tolerance:
+                overloaded = True
+
+        if overloaded:
+            self.limit = max(float(self.min_limit), self.limit * self.backoff)
+            self.decreases += 1
+        elif in_flight * 2 >= self.limit:
+            self.limit = min(float(self.max_limit), self.limit + 1)
+            self.increases += 1
+
+    def stats(self) -> Dict[str, Any]:
+        ratios = sorted(self._ratios)
+        return {
+            'limit': int(self.limit),
+            'in_flight': self.in_flight,
+            'admitted': self.admitted,
+            'shed': dict(self.shed),
+            'increases': self.increases,
+            'decreases': self.decreases,
+            'queue_ratio_p50': ratios[len(ratios) // 2] if ratios else None,
+            'min_limit': self.min_limit,
+            'max_limit': self.max_limit,
+        }
+
+
+class AdmissionTicket:
+    """acquire() 가 돌려주는 표. 요청이 끝나면 반드시 release() (여러 번 불러도 한 번만 반영)."""
+
+    def __init__(self, limiter: AdaptiveLimiter | None, in_flight: int = 0):
+        self._limiter = limiter
+        self._in_flight = in_flight
+        self._started = time.perf_counter()
+        self._released = False
+
+    def release(self, service_seconds: float | None = None, dropped: bool = False, sample: bool = True) -> None:
+        """service_seconds: 이 요청의 predict() 실행 시간. sample=False 면 한도 조정에 쓰지 않는다."""
+        if self._released or self._limiter is None:
+            return
+        self._released = True
+        self._limiter.in_flight -= 1
+        if sample:
+            latency = time.perf_counter() - self._started
+            self._limiter.on_sample(latency, service_seconds, self._in_flight, dropped)
+
+
+limiter: AdaptiveLimiter | None = None
+
+
+def acquire(priority: str) -> AdmissionTicket:
+    """한도를 넘으면 Overloaded. 제어가 꺼져 있으면(스크립트 등) 아무것도 하지 않는 표."""
+    if limiter is None:
+        return AdmissionTicket(None)
+    return limiter.acquire(priority)
+
+
+def start_admission_control() -> AdaptiveLimiter | None:
+    global limiter
+    settings = get_settings()
+    if not settings.admission_control:
+        return None
+    limiter = AdaptiveLimiter(
+        initial_limit=settings.admission_initial_limit or settings.inference_concurrency * 4,
+        min_limit=settings.admission_min_limit,
+        max_limit=settings.admission_max_limit,
+        backoff=settings.admission_backoff,
+        queue_tolerance=settings.admission_queue_tolerance,
+        target_latency=settings.admission_target_latency or None,
+    )
+    metrics.register_collector('admission', limiter.stats)
+    print(f'🚦 적응형 동시 처리 한도: 초기 {int(limiter.limit)}건 ({limiter.min_limit}~{limiter.max_limit})')
+    return limiter
+
+
+def stop_admission_control() -> None:
+    global limiter
+    limiter = None
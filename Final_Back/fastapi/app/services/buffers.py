@@ -0,0 +1,192 @@
+"""고정 크기(224x224) 전처리용 재사용 버퍼.
+
+predict() 는 요청마다 같은 모양의 배열과 tensor(정규화된 분할 입력, 마스크를 곱한 float 이미지,
+8bit 양자화 이미지, 분류 입력)를 새로 할당했다. 장당 600KB 안팎이라 glibc 가 매번 mmap/munmap 하고
+page fault 가 생긴다. 이 모듈은 추론 스레드마다 배치 크기만큼 미리 할당한 버퍼를 두고, 전처리 함수가
+out= 연산으로 그 안을 채우게 한다. CUDA 에서는 입력 버퍼를 pinned memory 로 잡아 non_blocking 으로 복사한다.
+
+버퍼는 스레드별이라 같은 스레드의 다음 요청이 덮어쓴다. predict() 안에서만 쓰고,
+결과 dict 에는 파이썬 값과 새로 만든 numpy 배열만 담는다.
+
+    python -m app.services.buffers bench --requests 300
+    python -m app.services.buffers bench --stage predict --requests 50   # MODEL_STANDIN=random 권장
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import resource
+import statistics
+import sys
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import torch
+
+from app.core.config import get_settings
+
+
+class BufferSet:
+    """한 스레드의 버퍼 묶음 (capacity 장까지의 배치)."""
+
+    def __init__(self, size: Tuple[int, int], capacity: int, pin_memory: bool = False):
+        width, height = size
+        self.capacity = capacity
+        self.pinned = pin_memory
+        shape = (capacity, 3, height, width)
+        self.segmentation_input = torch.empty(shape, dtype=torch.float32, pin_memory=pin_memory)
+        self.classification_input = torch.empty(shape, dtype=torch.float32, pin_memory=pin_memory)
+        # HWC 작업 공간 (정규화, 마스크 적용) 과 분류 입력 직전의 8bit 양자화 이미지
+        self.scratch = np.empty((height, width, 3), dtype=np.float32)
+        self.quantized = np.empty((height, width, 3), dtype=np.uint8)
+
+    @property
+    def nbytes(self) -> int:
+        tensors = (self.segmentation_input, self.classification_input)
+        return sum(t.numel() * t.element_size() for t in tensors) + self.scratch.nbytes + self.quantized.nbytes
+
+
+class TensorBufferPool:
+    def __init__(self, size: Tuple[int, int], pin_memory: bool = False):
+        self.size = size
+        self.pin_memory = pin_memory
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sets: List[BufferSet] = []
+        self.allocations = 0
+
+    def get(self, batch_size: int = 1) -> BufferSet:
+        """현재 스레드의 버퍼 (더 큰 배치가 오면 그 크기로 다시 할당)."""
+        buffers: BufferSet | None = getattr(self._local, 'buffers', None)
+        if buffers is None or buffers.capacity < batch_size:
+            new = BufferSet(self.size, max(batch_size, 1), self.pin_memory)
+            with self._lock:
+                if buffers is not None:
+                    self._sets.remove(buffers)
+                self._sets.append(new)
+                self.allocations += 1
+            self._local.buffers = buffers = new
+        return buffers
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sets = list(self._sets)
+        return {
+            'threads': len(sets),
+            'allocations': self.allocations,
+            'capacity': [buffers.capacity for buffers in sets],
+            'bytes': sum(buffers.nbytes for buffers in sets),
+            'pin_memory': self.pin_memory,
+        }
+
+
+@lru_cache
+def get_buffer_pool(size: Tuple[int, int]) -> TensorBufferPool | None:
+    """TENSOR_BUFFER_POOL=false 이면 None (요청마다 새로 할당)."""
+    settings = get_settings()
+    if not settings.tensor_buffer_pool:
+        return None
+    from app.services import metrics
+
+    pool = TensorBufferPool(size, pin_memory=settings.tensor_buffer_pin_memory and torch.cuda.is_available())
+    metrics.register_collector('tensor_buffers', pool.stats)
+    return pool
+
+
+# ==========================================
+# 벤치마크
+# ==========================================
+
+def _summary(latencies: List[float], faults: int, count: int) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    return {
+        'mean_ms': statistics.fmean(ordered) * 1000,
+        'p50_ms': ordered[len(ordered) // 2] * 1000,
+        'p99_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+        'stdev_ms': statistics.pstdev(ordered) * 1000,
+        'minor_faults_per_request': faults / count,
+    }
+
+
+def benchmark(stage: str, requests: int, size: int, warmup: int = 5) -> Dict[str, Any]:
+    """버퍼 풀 사용/미사용 각각 같은 입력으로 반복 실행한다 (지연 분포 + 요청당 minor page fault)."""
+    from PIL import Image
+
+    from app.services import model as model_service
+
+    rng = np.random.default_rng(0)
+    image = Image.fromarray(rng.integers(0, 255, (size, size, 3), dtype=np.uint8))
+    resized = image.resize(model_service.INPUT_SIZE, Image.BILINEAR)
+    mask = torch.from_numpy((rng.random((1, 1, 224, 224)) > 0.4).astype(np.float32))
+    if stage == 'predict':
+        model_service.load_model()
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG')
+        data = buffer.getvalue()
+
+    def run_once() -> None:
+        if stage == 'predict':
+            model_service.predict(data, cam_methods=[])
+            return
+        buffers = model_service._get_buffers()
+        seg_input = model_service._preprocess_image(resized, buffers)
+        seg_input.sum()  # 분할 모델 대신 입력을 한 번 읽는다
+        model_service._preprocess_for_classification(resized, mask, buffers)
+
+    # python -m 으로 실행하면 이 파일은 __main__ 이므로 model 이 쓰는 모듈의 캐시를 비워야 한다
+    pool_factory = model_service.get_buffer_pool
+    results: Dict[str, Any] = {'stage': stage, 'requests': requests, 'image_size': size}
+    settings = get_settings()
+    original = settings.tensor_buffer_pool
+    try:
+        for label, enabled in (('fresh', False), ('pooled', True)):
+            settings.tensor_buffer_pool = enabled
+            pool_factory.cache_clear()
+            latencies: List[float] = []
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(warmup):
+                    run_once()
+                faults_before = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+                for _ in range(requests):
+                    started = time.perf_counter()
+                    run_once()
+                    latencies.append(time.perf_counter() - started)
+                faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt - faults_before
+            results[label] = _summary(latencies, faults, requests)
+    finally:
+        settings.tensor_buffer_pool = original
+        pool_factory.cache_clear()
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='전처리 버퍼 풀 벤치마크')
+    sub = parser.add_subparsers(dest='command', required=True)
+    bench = sub.add_parser('bench', help='버퍼 풀 사용/미사용 비교')
+    bench.add_argument('--stage', choices=('preprocess', 'predict'), default='preprocess',
+                       help='preprocess: 전처리만 / predict: predict() 전체 (CAM 제외)')
+    bench.add_argument('--requests', type=int, default=300)
+    bench.add_argument('--size', type=int, default=512, help='입력 이미지 한 변 크기')
+    bench.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    report = benchmark(args.stage, args.requests, args.size)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+    print(f"🧪 버퍼 풀 벤치마크 ({report['stage']}, {report['requests']}회, 입력 {report['image_size']}px)")
+    print(f"{'':<8}{'mean':>9}{'p50':>9}{'p99':>9}{'stdev':>9}{'faults/req':>12}")
+    for label in ('fresh', 'pooled'):
+        row = report[label]
+        print(f"{label:<8}{row['mean_ms']:>9.3f}{row['p50_ms']:>9.3f}{row['p99_ms']:>9.3f}"
+              f"{row['stdev_ms']:>9.3f}{row['minor_faults_per_request']:>12.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
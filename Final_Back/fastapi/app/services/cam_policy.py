@@ -0,0 +1,70 @@
+"""요청별 CAM 생성 여부 결정.
+
+요청이 `cam_methods`를 명시하면 그대로 따르고, 명시하지 않으면 서버 정책
+(CAM_METHODS / CAM_SKIP_CLASSES / CAM_MIN_CONFIDENCE / CAM_MAX_CONFIDENCE)을 적용한다.
+예) 정상(Normal) 판정이 대부분이면 CAM_SKIP_CLASSES=Normal 로 CAM 비용 대부분을 아낄 수 있다.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import FrozenSet, List, Tuple
+
+from app.core.config import get_settings
+
+CAM_METHOD_NAMES: Tuple[str, ...] = ('gradcam', 'gradcam_plus', 'layercam')
+
+
+def parse_cam_methods(value: str | None) -> List[str] | None:
+    """'gradcam,layercam' / 'all' / 'none' 형식을 파싱한다. 비어 있으면 None (정책 기본값 사용)."""
+    if value is None or not value.strip():
+        return None
+    value = value.strip().lower()
+    if value == 'all':
+        return list(CAM_METHOD_NAMES)
+    if value == 'none':
+        return []
+    methods = [m.strip() for m in value.split(',') if m.strip()]
+    unknown = [m for m in methods if m not in CAM_METHOD_NAMES]
+    if unknown:
+        raise ValueError(f'알 수 없는 CAM 방식: {", ".join(unknown)} (가능: {", ".join(CAM_METHOD_NAMES)}, all, none)')
+    # 순서는 CAM_METHOD_NAMES 기준으로 정렬하고 중복 제거
+    return [m for m in CAM_METHOD_NAMES if m in methods]
+
+
+@dataclass(frozen=True)
+class CamPolicy:
+    methods: Tuple[str, ...] = CAM_METHOD_NAMES
+    skip_classes: FrozenSet[str] = field(default_factory=frozenset)
+    min_confidence: float = 0.0
+    max_confidence: float = 1.0
+
+    @classmethod
+    def from_settings(cls) -> 'CamPolicy':
+        settings = get_settings()
+        methods = parse_cam_methods(settings.cam_methods)
+        if not settings.enable_gradcam:
+            methods = []
+        return cls(
+            methods=tuple(CAM_METHOD_NAMES if methods is None else methods),
+            skip_classes=frozenset(c.strip() for c in settings.cam_skip_classes.split(',') if c.strip()),
+            min_confidence=settings.cam_min_confidence,
+            max_confidence=settings.cam_max_confidence,
+        )
+
+    def decide(self, requested: List[str] | None, predicted_class: str, confidence: float) -> Tuple[List[str], str | None]:
+        """생성할 CAM 방식 목록과 (생략 시) 사유를 반환한다."""
+        if requested is not None:
+            return list(requested), None if requested else 'not_requested'
+        if not self.methods:
+            return [], 'disabled'
+        if predicted_class in self.skip_classes:
+            return [], 'class_skipped'
+        if not self.min_confidence <= confidence <= self.max_confidence:
+            return [], 'confidence_out_of_range'
+        return list(self.methods), None
+
+
+@lru_cache
+def get_cam_policy() -> CamPolicy:
+    return CamPolicy.from_settings()
@@ -0,0 +1,87 @@
+"""여러 CAM 히트맵을 한 번에 원본 이미지 위에 오버레이하는 렌더러.
+
+원본 이미지 리사이즈와 마스크 변환은 렌더러 생성 시 한 번만 수행하고,
+모든 CAM 맵은 (H, W, N) 스택으로 묶어 리사이즈 → Jet LUT 조회 → 블렌딩을 한 번에 처리한다.
+결과는 cv2.applyColorMap + cv2.addWeighted 로 한 장씩 만들던 이미지와 동일하다.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Dict
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+
+# 렌더링 설정은 CAM 저장 키에도 들어가므로 저장소 모듈에 둔다
+from app.services.cam_store import HEATMAP_ALPHA, HEATMAP_COLORMAP, OVERLAY_SIZE
+
+
+@lru_cache
+def _jet_lut() -> np.ndarray:
+    """0~255 값을 RGB 컬러맵(기본 Jet) 색상으로 매핑하는 (256, 3) 룩업 테이블."""
+    ramp = np.arange(256, dtype=np.uint8).reshape(256, 1)
+    colormap = getattr(cv2, f'COLORMAP_{HEATMAP_COLORMAP.upper()}')
+    bgr = cv2.applyColorMap(ramp, colormap).reshape(256, 3)
+    return np.ascontiguousarray(bgr[:, ::-1])
+
+
+class CamOverlayRenderer:
+    """하나의 원본 이미지/마스크에 대해 여러 CAM 오버레이를 만든다."""
+
+    def __init__(
+        self,
+        original_image: Image.Image,
+        mask: torch.Tensor | np.ndarray | None = None,
+        size: int = OVERLAY_SIZE,
+        alpha: float = HEATMAP_ALPHA,
+        mask_blend: bool = False,
+    ):
+        self.size = size
+        self.alpha = alpha
+
+        base = original_image if original_image.mode == 'RGB' else original_image.convert('RGB')
+        if base.size != (size, size):
+            base = base.resize((size, size))
+        self.base = np.asarray(base, dtype=np.uint8)
+        self._base_weighted = self.base.astype(np.float32) * (1.0 - alpha)
+
+        # mask_blend=True 이면 폐 마스크 영역에만 히트맵을 입히고 나머지는 원본 유지
+        self.mask: np.ndarray | None = None
+        if mask_blend and mask is not None:
+            mask_np = mask.squeeze().cpu().numpy() if isinstance(mask, torch.Tensor) else np.squeeze(mask)
+            mask_np = mask_np.astype(np.float32)
+            if mask_np.shape != (size, size):
+                mask_np = cv2.resize(mask_np, (size, size), interpolation=cv2.INTER_NEAREST)
+            self.mask = mask_np > 0.5
+
+    def _resize_stack(self, maps: list[np.ndarray]) -> np.ndarray:
+        """CAM 맵들을 (N, size, size) float32 로 리사이즈한다."""
+        if len({m.shape for m in maps}) == 1:
+            stack = np.stack(maps, axis=-1).astype(np.float32, copy=False)
+            resized = cv2.resize(stack, (self.size, self.size))
+            if resized.ndim == 2:
+                resized = resized[..., None]
+            return np.moveaxis(resized, -1, 0)
+        return np.stack([cv2.resize(m.astype(np.float32), (self.size, self.size)) for m in maps])
+
+    def render(self, cams: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """{이름: CAM 맵} 을 받아 {이름: RGB uint8 오버레이} 를 반환한다."""
+        if not cams:
+            return {}
+
+        names = list(cams)
+        resized = self._resize_stack([cams[name] for name in names])
+        indices = (255 * np.clip(resized, 0.0, 1.0)).astype(np.uint8)
+
+        # (N, H, W) -> (N, H, W, 3) 컬러맵 조회 후 한 번에 블렌딩
+        heatmaps = _jet_lut()[indices].astype(np.float32)
+        blended = heatmaps * self.alpha
+        blended += self._base_weighted
+        overlays = np.clip(np.rint(blended), 0, 255).astype(np.uint8)
+
+        if self.mask is not None:
+            overlays = np.where(self.mask[None, :, :, None], overlays, self.base[None])
+
+        return {name: overlays[i] for i, name in enumerate(names)}
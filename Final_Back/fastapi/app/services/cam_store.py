@@ -0,0 +1,315 @@
+"""Content-addressed Grad-CAM 이미지 저장소.
+
+파일 이름은 `{이미지 해시}_{CAM 방식}_{모델 버전}_{렌더링 설정 digest}.{확장자}`로 결정되므로
+같은 이미지를 같은 모델·같은 렌더링 설정으로 다시 진단하면 기존 이미지를 그대로 재사용한다.
+(CAM_MASK_BLEND, 인코딩 품질, 컬러맵/투명도 등이 바뀌면 키가 달라져 새로 만든다.)
+용량(max_bytes), 개수(max_entries, 0 이면 무제한)와 마지막 접근 후 경과 시간(max_age)을 기준으로 LRU 축출한다.
+
+- DiskCamStore: 디스크에 저장 (임시 파일 + os.replace 로 원자적 쓰기), /static 마운트로 서비스
+- MemoryCamStore: 프로세스 메모리에만 보관, main.py 의 라우트가 ETag와 함께 직접 서비스
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import get_settings
+from app.services import metrics
+
+_UNSAFE_CHARS = re.compile(r'[^A-Za-z0-9.-]')
+
+# 포맷 이름 -> (PIL 포맷, 확장자, media type)
+IMAGE_FORMATS = {
+    'png': ('PNG', 'png', 'image/png'),
+    'webp': ('WEBP', 'webp', 'image/webp'),
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg'),
+}
+_MEDIA_TYPES = {ext: media_type for _, ext, media_type in IMAGE_FORMATS.values()}
+
+# 오버레이 렌더링 기본값 (app/services/cam_render.py). 저장 키의 렌더링 설정 digest 에 포함된다
+OVERLAY_SIZE = 224
+HEATMAP_ALPHA = 0.4
+HEATMAP_COLORMAP = 'jet'
+
+
+def render_digest(
+    image_format: str,
+    quality: int,
+    mask_blend: bool,
+    alpha: float = HEATMAP_ALPHA,
+    size: int = OVERLAY_SIZE,
+    colormap: str = HEATMAP_COLORMAP,
+) -> str:
+    """CAM 이미지를 만든 렌더링 설정의 짧은 digest (8자리 16진수)."""
+    payload = f'{image_format}|{quality}|{int(mask_blend)}|{alpha:g}|{size}|{colormap}'
+    return hashlib.blake2b(payload.encode(), digest_size=4).hexdigest()
+
+
+def make_key(content_hash: str, method: str, model_version: str, ext: str = 'png', render: str = '') -> str:
+    """CAM 이미지의 저장 키(파일 이름)를 만든다. render 는 render_digest() 값."""
+    version = _UNSAFE_CHARS.sub('-', model_version) or 'unknown'
+    suffix = f'_{render}' if render else ''
+    return f'{content_hash[:32]}_{method}_{version}{suffix}.{ext}'
+
+
+def media_type_for(key: str) -> str:
+    return _MEDIA_TYPES.get(key.rsplit('.', 1)[-1], 'application/octet-stream')
+
+
+def encode_image(image: np.ndarray, image_format: str, quality: int) -> bytes:
+    """RGB uint8 배열을 설정된 포맷으로 인코딩한다."""
+    pil_format = IMAGE_FORMATS[image_format][0]
+    buffer = io.BytesIO()
+    if pil_format == 'PNG':
+        Image.fromarray(image).save(buffer, format='PNG', optimize=True)
+    elif pil_format == 'WEBP':
+        Image.fromarray(image).save(buffer, format='WEBP', quality=quality, method=4)
+    else:
+        Image.fromarray(image).save(buffer, format='JPEG', quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+class CamStore(ABC):
+    """LRU + idle TTL 인덱스를 관리하는 공통 베이스. 실제 바이트 보관은 하위 클래스가 담당한다."""
+
+    def __init__(self, max_bytes: int, max_age: float, url_prefix: str = '/static/gradcam', max_entries: int = 0):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.url_prefix = url_prefix.rstrip('/')
+
+        # key -> (크기, 마지막 접근 시각). 앞쪽일수록 오래전에 접근한 항목
+        self._entries: OrderedDict[str, Tuple[int, float]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    # 하위 클래스 구현 ------------------------------------------------------
+    @abstractmethod
+    def _write(self, key: str, data: bytes) -> None:
+        ...
+
+    @abstractmethod
+    def _delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def _exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def _read(self, key: str) -> bytes | None:
+        ...
+
+    def _touch(self, key: str, now: float) -> None:
+        pass
+
+    # 공통 로직 ------------------------------------------------------------
+    def url_for(self, key: str) -> str:
+        return f'{self.url_prefix}/{key}'
+
+    def get_url(self, key: str) -> str | None:
+        """저장된 이미지가 있으면 URL을 반환하고 LRU 순서를 갱신한다."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] > self.max_age:
+                self._remove_locked(key)
+                self.evictions += 1
+                entry = None
+            if entry is not None and not self._exists(key):
+                # 외부에서 삭제된 경우
+                self._entries.pop(key)
+                self._bytes -= entry[0]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries[key] = (entry[0], now)
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        self._touch(key, now)
+        return self.url_for(key)
+
+    def contains(self, key: str) -> bool:
+        """저장되어 있고 만료되지 않았는지 (get_url 과 달리 hit/miss 통계와 LRU 순서를 바꾸지 않는다)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and time.time() - entry[1] <= self.max_age and self._exists(key)
+
+    def read(self, key: str) -> bytes | None:
+        """저장된 이미지 바이트를 반환한다 (LRU 순서는 갱신하지 않음)."""
+        try:
+            return self._read(key)
+        except OSError:
+            return None
+
+    def put(self, key: str, data: bytes) -> str:
+        """이미지를 저장하고 URL을 반환한다."""
+        self._write(key, data)
+
+        now = time.time()
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[0]
+            self._entries[key] = (len(data), now)
+            self._bytes += len(data)
+            self.writes += 1
+            self._evict_locked(now)
+        return self.url_for(key)
+
+    def _remove_locked(self, key: str) -> None:
+        size, _ = self._entries.pop(key)
+        self._bytes -= size
+        self._delete(key)
+
+    def _evict_locked(self, now: float) -> None:
+        while self._entries:
+            key, (size, accessed) = next(iter(self._entries.items()))
+            over_count = self.max_entries and len(self._entries) > self.max_entries
+            if self._bytes <= self.max_bytes and not over_count and now - accessed <= self.max_age:
+                break
+            self._remove_locked(key)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'backend': type(self).__name__,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'max_entries': self.max_entries,
+                'max_age_seconds': self.max_age,
+                'hits': self.hits,
+                'misses': self.misses,
+                'writes': self.writes,
+                'evictions': self.evictions,
+            }
+
+
+class DiskCamStore(CamStore):
+    """디스크 기반 CAM 이미지 저장소."""
+
+    def __init__(
+        self, root: Path, max_bytes: int, max_age: float, url_prefix: str = '/static/gradcam', max_entries: int = 0,
+    ):
+        super().__init__(max_bytes, max_age, url_prefix, max_entries)
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._scan()
+
+    def _scan(self) -> None:
+        """재시작 시 디스크에 남아있는 파일을 mtime 순으로 인덱스에 올린다."""
+        found = []
+        for path in self.root.iterdir():
+            if not path.is_file():
+                continue
+            if path.name.startswith('.tmp-'):
+                # 이전 프로세스가 남긴 미완성 임시 파일
+                path.unlink(missing_ok=True)
+                continue
+            stat = path.stat()
+            found.append((stat.st_mtime, path.name, stat.st_size))
+
+        with self._lock:
+            for mtime, name, size in sorted(found):
+                self._entries[name] = (size, mtime)
+                self._bytes += size
+            self._evict_locked(time.time())
+
+    def path_for(self, key: str) -> Path:
+        return self.root / key
+
+    def _write(self, key: str, data: bytes) -> None:
+        fd, tmp_name = tempfile.mkstemp(dir=self.root, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(data)
+            os.replace(tmp_name, self.path_for(key))
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def _delete(self, key: str) -> None:
+        self.path_for(key).unlink(missing_ok=True)
+
+    def _exists(self, key: str) -> bool:
+        return self.path_for(key).exists()
+
+    def _read(self, key: str) -> bytes | None:
+        return self.path_for(key).read_bytes()
+
+    def _touch(self, key: str, now: float) -> None:
+        try:
+            os.utime(self.path_for(key), (now, now))
+        except OSError:
+            pass
+
+
+class MemoryCamStore(CamStore):
+    """프로세스 메모리 기반 CAM 이미지 저장소 (디스크 I/O 없음)."""
+
+    def __init__(self, max_bytes: int, max_age: float, url_prefix: str = '/static/gradcam', max_entries: int = 0):
+        super().__init__(max_bytes, max_age, url_prefix, max_entries)
+        self._data: Dict[str, Tuple[bytes, str]] = {}
+
+    def _write(self, key: str, data: bytes) -> None:
+        etag = '"' + hashlib.blake2b(data, digest_size=16).hexdigest() + '"'
+        self._data[key] = (data, etag)
+
+    def _delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def _exists(self, key: str) -> bool:
+        return key in self._data
+
+    def _read(self, key: str) -> bytes | None:
+        item = self._data.get(key)
+        return item[0] if item is not None else None
+
+    def get(self, key: str) -> Tuple[bytes, str] | None:
+        """(이미지 바이트, ETag)를 반환한다."""
+        if self.get_url(key) is None:
+            return None
+        return self._data.get(key)
+
+
+@lru_cache
+def get_cam_store() -> CamStore:
+    """설정 기반 전역 CAM 저장소를 반환한다."""
+    settings = get_settings()
+    if settings.cam_store_backend == 'memory':
+        store: CamStore = MemoryCamStore(
+            max_bytes=settings.cam_store_max_bytes,
+            max_age=settings.cam_store_max_age,
+            max_entries=settings.cam_store_max_entries,
+        )
+    else:
+        store = DiskCamStore(
+            settings.static_dir / 'gradcam',
+            max_bytes=settings.cam_store_max_bytes,
+            max_age=settings.cam_store_max_age,
+            max_entries=settings.cam_store_max_entries,
+        )
+    metrics.register_collector('cam_store', store.stats)
+    return store
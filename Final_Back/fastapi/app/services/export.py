@@ -0,0 +1,303 @@
+"""ai_diagnoses 일괄 내보내기 (CSV / Parquet 스트리밍).
+
+감사/분석용으로 추론 기록을 내려받을 때 모든 문서를 메모리에 모으지 않는다.
+motor 커서를 batch_size 단위로 읽고, 배치마다 pandas DataFrame 하나를 만들어
+CSV 조각 또는 Parquet row group 하나로 인코딩한 바이트를 바로 내보낸다.
+메모리 사용량은 전체 건수와 무관하게 배치 하나 크기로 일정하다.
+
+    GET /api/ai/diagnoses/export?format=parquet&date_from=2026-01-01&predicted_class=COVID
+    python -m app.services.export --output covid.parquet --date-from 2026-01-01 --predicted-class COVID
+
+Parquet 은 pyarrow 가 설치되어 있을 때만 지원한다 (없으면 CSV 만).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from app.core.config import get_settings
+from app.services import metrics
+from app.services.history import build_history_query
+
+EXPORT_FORMATS: Tuple[str, ...] = ('csv', 'parquet')
+
+# model.CLASS_NAMES 와 같은 순서 (model 을 import 하면 torch 가 로드되므로 여기서는 이름만 둔다)
+PROBABILITY_CLASSES: Tuple[str, ...] = ('COVID', 'Lung_Opacity', 'Normal', 'Viral Pneumonia')
+
+# 임베딩 등 큰 필드는 가져오지 않는다
+EXPORT_PROJECTION: Dict[str, int] = {
+    'patient_id': 1,
+    'created_at': 1,
+    'model_version': 1,
+    'precision': 1,
+    'predicted_class': 1,
+    'confidence': 1,
+    'probabilities': 1,
+    'unsuitable': 1,
+    'quality': 1,
+    'duplicate_of': 1,
+    'image_hash': 1,
+    'cam_paths': 1,
+    'timings': 1,
+    'notes': 1,
+}
+
+# 오래된 기록부터 (created_desc 인덱스를 역방향으로 탄다)
+EXPORT_SORT: List[Tuple[str, int]] = [('created_at', 1), ('_id', 1)]
+
+
+def _probability_column(name: str) -> str:
+    return 'probability_' + name.lower().replace(' ', '_')
+
+
+# (열 이름, 종류) - 배치마다 스키마가 같아야 CSV 헤더 / Parquet row group 이 맞는다
+EXPORT_COLUMNS: List[Tuple[str, str]] = [
+    ('id', 'string'),
+    ('created_at', 'timestamp'),
+    ('patient_id', 'string'),
+    ('model_version', 'string'),
+    ('precision', 'string'),
+    ('predicted_class', 'string'),
+    ('confidence', 'float'),
+    *[(_probability_column(name), 'float') for name in PROBABILITY_CLASSES],
+    ('unsuitable', 'bool'),
+    ('quality_reasons', 'string'),
+    ('duplicate_of', 'string'),
+    ('image_hash', 'string'),
+    ('cam_methods', 'string'),
+    ('total_seconds', 'float'),
+    ('notes', 'string'),
+]
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+class ExportUnavailable(RuntimeError):
+    """요청한 형식을 이 환경에서 만들 수 없음 (Parquet 인데 pyarrow 미설치)."""
+
+
+def build_export_query(
+    predicted_class: str | None = None,
+    model_version: str | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+) -> Dict[str, Any]:
+    query = build_history_query(predicted_class=predicted_class, date_from=date_from, date_to=date_to)
+    if model_version:
+        query['model_version'] = model_version
+    return query
+
+
+def export_row(document: Dict[str, Any]) -> Dict[str, Any]:
+    """ai_diagnoses 문서 → 평탄화된 한 행."""
+    probabilities = document.get('probabilities') or {}
+    quality = document.get('quality') or {}
+    return {
+        'id': str(document['_id']),
+        'created_at': _as_utc(document['created_at']),
+        'patient_id': document.get('patient_id'),
+        'model_version': document.get('model_version'),
+        'precision': document.get('precision'),
+        'predicted_class': document.get('predicted_class'),
+        'confidence': document.get('confidence'),
+        **{_probability_column(name): probabilities.get(name) for name in PROBABILITY_CLASSES},
+        'unsuitable': bool(document.get('unsuitable', False)),
+        'quality_reasons': ','.join(quality.get('reasons', [])) or None,
+        'duplicate_of': str(document['duplicate_of']) if document.get('duplicate_of') is not None else None,
+        'image_hash': document.get('image_hash'),
+        # cam_paths 키는 응답 필드 이름 (gradcam_path 등)
+        'cam_methods': ','.join(sorted(field.removesuffix('_path') for field in document.get('cam_paths') or {})) or None,
+        'total_seconds': (document.get('timings') or {}).get('total'),
+        'notes': document.get('notes'),
+    }
+
+
+def _frame(rows: List[Dict[str, Any]]):
+    import pandas as pd
+
+    return pd.DataFrame.from_records(rows, columns=[name for name, _ in EXPORT_COLUMNS])
+
+
+class CsvEncoder:
+    extension = 'csv'
+    media_type = 'text/csv; charset=utf-8'
+
+    def __init__(self):
+        self.rows = 0
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        header = self.rows == 0
+        self.rows += len(rows)
+        return _frame(rows).to_csv(index=False, header=header).encode('utf-8')
+
+    def close(self) -> bytes:
+        # 기록이 없어도 헤더는 내보낸다
+        return b'' if self.rows else self.encode([])
+
+
+class _ChunkSink(io.RawIOBase):
+    """ParquetWriter 가 쓴 바이트를 모아 두었다가 drain() 때 넘겨주는 파일 객체."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ParquetEncoder:
+    """배치 하나 = row group 하나. 파일 footer 는 close() 에서 나온다."""
+
+    extension = 'parquet'
+    media_type = 'application/vnd.apache.parquet'
+
+    def __init__(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ExportUnavailable('Parquet 내보내기에는 pyarrow 가 필요합니다 (pip install pyarrow, 또는 format=csv).') from e
+
+        types = {'string': pa.string(), 'timestamp': pa.timestamp('us', tz='UTC'), 'float': pa.float64(), 'bool': pa.bool_()}
+        self._pa = pa
+        self._schema = pa.schema([(name, types[kind]) for name, kind in EXPORT_COLUMNS])
+        self._sink = _ChunkSink()
+        self._writer = pq.ParquetWriter(self._sink, self._schema)
+        self.rows = 0
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        self.rows += len(rows)
+        table = self._pa.Table.from_pandas(_frame(rows), schema=self._schema, preserve_index=False)
+        self._writer.write_table(table)
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+def make_encoder(export_format: str) -> CsvEncoder | ParquetEncoder:
+    if export_format == 'csv':
+        return CsvEncoder()
+    if export_format == 'parquet':
+        return ParquetEncoder()
+    raise ValueError(f'지원하지 않는 내보내기 형식: {export_format} (가능: {", ".join(EXPORT_FORMATS)})')
+
+
+async def stream_export(
+    collection: Any,
+    encoder: CsvEncoder | ParquetEncoder,
+    batch_size: int | None = None,
+    **filters: Any,
+) -> AsyncIterator[bytes]:
+    """조건에 맞는 기록을 오래된 순으로 읽어 인코딩된 바이트 조각을 내보낸다."""
+    batch_size = batch_size or get_settings().export_batch_size
+    cursor = (
+        collection.find(build_export_query(**filters), EXPORT_PROJECTION)
+        .sort(EXPORT_SORT)
+        .batch_size(batch_size)
+    )
+    rows: List[Dict[str, Any]] = []
+    async for document in cursor:
+        rows.append(export_row(document))
+        if len(rows) >= batch_size:
+            # DataFrame 생성/인코딩은 이벤트 루프 밖에서
+            yield await asyncio.to_thread(encoder.encode, rows)
+            rows = []
+    if rows:
+        yield await asyncio.to_thread(encoder.encode, rows)
+    tail = await asyncio.to_thread(encoder.close)
+    if tail:
+        yield tail
+    metrics.inc(f'export.{encoder.extension}.rows', encoder.rows)
+
+
+# ==========================================
+# CLI
+# ==========================================
+
+def _parse_datetime(value: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f'ISO 8601 날짜/시각이 아닙니다: {value}') from e
+
+
+async def _export_to_file(args: argparse.Namespace) -> int:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    settings = get_settings()
+    if settings.mongo_uri.startswith('memory://'):
+        print('❌ 내보내기는 실제 mongod 가 필요합니다 (MONGODB_URI 확인).')
+        return 2
+    export_format = args.format or ('parquet' if args.output.suffix == '.parquet' else 'csv')
+    try:
+        encoder = make_encoder(export_format)
+    except ExportUnavailable as e:
+        print(f'❌ {e}')
+        return 2
+
+    mongo_client = AsyncIOMotorClient(settings.mongo_uri)
+    written = 0
+    try:
+        collection = mongo_client[settings.mongo_db].get_collection('ai_diagnoses')
+        with args.output.open('wb') as output:
+            async for chunk in stream_export(
+                collection,
+                encoder,
+                batch_size=args.batch_size,
+                predicted_class=args.predicted_class,
+                model_version=args.model_version,
+                date_from=args.date_from,
+                date_to=args.date_to,
+            ):
+                output.write(chunk)
+                written += len(chunk)
+    except BaseException:
+        # 중간에 끊긴 파일을 완전한 내보내기로 착각하지 않도록 지운다
+        args.output.unlink(missing_ok=True)
+        raise
+    finally:
+        mongo_client.close()
+    print(f'📤 {encoder.rows:,}건 → {args.output} ({export_format}, {written:,} bytes)')
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='ai_diagnoses 기록을 CSV / Parquet 로 내보내기')
+    parser.add_argument('--output', type=Path, required=True, help='출력 파일 (.parquet 이면 기본 형식 parquet)')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default=None)
+    parser.add_argument('--date-from', type=_parse_datetime, default=None, help='예: 2026-01-01 (naive 는 UTC)')
+    parser.add_argument('--date-to', type=_parse_datetime, default=None)
+    parser.add_argument('--predicted-class', default=None)
+    parser.add_argument('--model-version', default=None)
+    parser.add_argument('--batch-size', type=int, default=None, help='기본값 EXPORT_BATCH_SIZE')
+    args = parser.parse_args()
+    return asyncio.run(_export_to_file(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
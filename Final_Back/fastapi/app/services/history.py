@@ -0,0 +1,121 @@
+"""ai_diagnoses 목록 조회 (keyset 페이지네이션).
+
+정렬은 항상 (created_at desc, _id desc)이고, 다음 페이지 커서는 마지막 문서의
+(created_at, _id)를 base64 로 인코딩한 값이다. skip 을 쓰지 않으므로 페이지가
+깊어져도 비용이 일정하며, app/db/indexes.py 의 복합 인덱스를 그대로 탄다.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+HISTORY_SORT: List[Tuple[str, int]] = [('created_at', -1), ('_id', -1)]
+
+# 목록 화면에 필요한 필드만 가져온다 (probabilities/timings 등은 제외)
+LIST_PROJECTION: Dict[str, int] = {
+    'patient_id': 1,
+    'predicted_class': 1,
+    'confidence': 1,
+    'model_version': 1,
+    'cam_paths': 1,
+    'created_at': 1,
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _as_utc(value: datetime) -> datetime:
+    """naive datetime 은 UTC 로 간주한다 (motor 는 기본적으로 naive UTC 를 반환)."""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def encode_cursor(document: Dict[str, Any]) -> str:
+    payload = {'t': _as_utc(document['created_at']).isoformat(), 'id': str(document['_id'])}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return _as_utc(datetime.fromisoformat(payload['t'])), ObjectId(payload['id'])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise InvalidCursor(f'잘못된 cursor 입니다: {cursor}') from e
+
+
+def build_history_query(
+    patient_id: str | None = None,
+    predicted_class: str | None = None,
+    min_confidence: float | None = None,
+    max_confidence: float | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    cursor: str | None = None,
+) -> Dict[str, Any]:
+    """목록 조회 필터를 만든다. 동등 조건을 앞에 두어 복합 인덱스의 prefix 로 쓰이게 한다."""
+    query: Dict[str, Any] = {}
+    if patient_id:
+        query['patient_id'] = patient_id
+    if predicted_class:
+        query['predicted_class'] = predicted_class
+
+    created_at: Dict[str, Any] = {}
+    if date_from is not None:
+        created_at['$gte'] = _as_utc(date_from)
+    if date_to is not None:
+        created_at['$lte'] = _as_utc(date_to)
+    if created_at:
+        query['created_at'] = created_at
+
+    confidence: Dict[str, Any] = {}
+    if min_confidence is not None:
+        confidence['$gte'] = min_confidence
+    if max_confidence is not None:
+        confidence['$lte'] = max_confidence
+    if confidence:
+        query['confidence'] = confidence
+
+    if cursor:
+        last_created_at, last_id = decode_cursor(cursor)
+        query['$or'] = [
+            {'created_at': {'$lt': last_created_at}},
+            {'created_at': last_created_at, '_id': {'$lt': last_id}},
+        ]
+    return query
+
+
+def serialize_history_item(document: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'id': str(document['_id']),
+        'patient_id': document.get('patient_id'),
+        'predicted_class': document.get('predicted_class'),
+        'confidence': document.get('confidence'),
+        'model_version': document.get('model_version'),
+        'cam_paths': document.get('cam_paths') or {},
+        'created_at': _as_utc(document['created_at']).isoformat(),
+    }
+
+
+async def list_diagnoses(collection: Any, limit: int = 20, **filters: Any) -> Dict[str, Any]:
+    """한 페이지를 조회한다. 다음 페이지가 있으면 next_cursor 를 함께 반환한다."""
+    query = build_history_query(**filters)
+    documents = await (
+        collection.find(query, LIST_PROJECTION)
+        .sort(HISTORY_SORT)
+        .limit(limit + 1)
+        .to_list(limit + 1)
+    )
+
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+    return {
+        'items': [serialize_history_item(doc) for doc in documents],
+        'next_cursor': encode_cursor(documents[-1]) if has_more and documents else None,
+    }
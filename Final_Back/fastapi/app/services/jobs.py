@@ -0,0 +1,606 @@
+"""MongoDB inference_jobs 컬렉션 기반 추론 작업 큐 (INFERENCE_MODE=queue).
+
+API 프로세스는 업로드 이미지를 작업 문서에 담아 넣고 결과를 기다리기만 하며(모델을 로드하지 않음),
+워커 프로세스는 어느 노드에서든 몇 개든 띄울 수 있다. 워커는 find_one_and_update 로 작업을
+원자적으로 가져가(lease) predict_batch() 로 배치 처리한 뒤 결과를 같은 문서에 쓴다.
+
+    python -m app.services.jobs worker --batch-size 4
+    python -m app.services.jobs stats
+
+  - 상태: queued → running → done / failed (API 가 기다리다 포기한 queued 작업은 cancelled)
+  - 워커는 처리 중 lease 를 주기적으로 연장한다. 워커가 죽으면 lease 만료 후 다른 워커가 다시 가져가고,
+    JOB_MAX_ATTEMPTS 번 가져갔는데도 끝나지 않은 작업은 failed (lease_expired).
+  - 결과 쓰기는 worker_id 가 일치할 때만 반영된다 (lease 를 잃은 워커의 늦은 결과는 버림).
+    lease 연장이 실패해도 배치는 끝까지 처리하고 같은 조건으로 반영 여부를 정한다.
+  - 작업이 끝나면 이미지는 문서에서 지우고, 문서는 TTL 인덱스로 JOB_RETENTION_SECONDS 뒤 삭제된다.
+  - API 쪽은 프로세스당 하나의 폴러가 기다리는 작업들을 $in 쿼리 한 번으로 확인한다.
+  - 워커가 만든 CAM 이미지는 워커 프로세스의 CAM 저장소에만 있으므로, 결과 문서에 바이트(cam_images)를
+    함께 담아 보내고 API 가 자기 저장소에 다시 넣는다. 그래서 CAM_STORE_BACKEND=memory 나
+    노드별 디스크를 써도 API 가 CAM URL 을 서빙할 수 있다.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.core.config import get_settings
+from app.services import metrics
+from app.services.pipeline import InvalidImage, PipelineCancelled, PipelineContext
+from app.services.scheduler import PRIORITY_CLASSES
+from app.services.similarity import decode_embedding, encode_embedding
+from app.services.tuning import tuned_batch_size
+
+INFERENCE_MODES = ('local', 'queue')
+TERMINAL_STATUSES = ('done', 'failed', 'cancelled')
+# BSON 문서 최대 크기(16MB) 안에 이미지와 메타데이터가 들어가야 한다
+MAX_JOB_IMAGE_BYTES = 15 * 1024 * 1024
+# JOB_BATCH_SIZE 도 스레드 튜닝 결과도 없을 때의 워커 배치 크기
+DEFAULT_BATCH_SIZE = 4
+# API 폴러가 읽는 필드 (이미지 제외)
+RESULT_PROJECTION: Dict[str, int] = {'status': 1, 'result': 1, 'error': 1, 'error_type': 1, 'worker_id': 1}
+
+
+class JobFailed(RuntimeError):
+    pass
+
+
+def queue_enabled() -> bool:
+    mode = get_settings().inference_mode
+    if mode not in INFERENCE_MODES:
+        raise ValueError(f'알 수 없는 INFERENCE_MODE: {mode} (가능: {", ".join(INFERENCE_MODES)})')
+    return mode == 'queue'
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    """naive datetime 은 UTC 로 간주한다 (motor 는 기본적으로 naive UTC 를 반환)."""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _wall_deadline(deadline: float | None) -> datetime | None:
+    """time.monotonic() 기준 마감 시각 → 다른 노드의 워커도 쓸 수 있는 UTC 시각."""
+    return None if deadline is None else _now() + timedelta(seconds=deadline - time.monotonic())
+
+
+def _monotonic_deadline(deadline_at: datetime | None) -> float | None:
+    if deadline_at is None:
+        return None
+    return time.monotonic() + (_as_utc(deadline_at) - _now()).total_seconds()
+
+
+def encode_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """predict() 결과를 BSON 으로 저장할 수 있게 바꾼다 (임베딩은 float16 바이트, dHash 는 16진수)."""
+    encoded = dict(result)
+    if encoded.get('embedding') is not None:
+        encoded['embedding'] = encode_embedding(encoded['embedding'])
+    if encoded.get('perceptual_hash') is not None:
+        encoded['perceptual_hash'] = f"{encoded['perceptual_hash']:016x}"
+    return encoded
+
+
+def _cam_key(url: str) -> str:
+    return url.rsplit('/', 1)[-1]
+
+
+def collect_cam_images(result: Dict[str, Any]) -> Dict[str, bytes]:
+    """워커 쪽: 결과가 가리키는 CAM 이미지 바이트 (저장소 키 → 바이트)."""
+    from app.services.cam_store import get_cam_store
+
+    store = get_cam_store()
+    images: Dict[str, bytes] = {}
+    for url in (result.get('cam_urls') or {}).values():
+        data = store.read(_cam_key(url))
+        if data is not None:
+            images[_cam_key(url)] = data
+    return images
+
+
+def store_cam_images(result: Dict[str, Any], images: Dict[str, bytes]) -> None:
+    """API 쪽: 워커가 보낸 CAM 이미지를 이 프로세스의 저장소에 넣고 URL 을 이 저장소 기준으로 바꾼다."""
+    from app.services.cam_store import get_cam_store
+
+    store = get_cam_store()
+    cam_urls = dict(result.get('cam_urls') or {})
+    for field, url in cam_urls.items():
+        key = _cam_key(url)
+        data = images.get(key)
+        if data is None:
+            # 워커 저장소에서도 사라진 이미지 - 깨진 URL 을 돌려주지 않는다
+            cam_urls[field] = None
+            if result.get(field) == url:
+                result[field] = None
+            continue
+        local_url = store.get_url(key) or store.put(key, bytes(data))
+        cam_urls[field] = local_url
+        if result.get(field) == url:
+            # CAM_INLINE 이면 필드는 data URI 이므로 그대로 둔다
+            result[field] = local_url
+    result['cam_urls'] = {field: url for field, url in cam_urls.items() if url is not None}
+    if 'cam_methods' in result:
+        result['cam_methods'] = [m for m in result['cam_methods'] if f'{m}_path' in result['cam_urls']]
+
+
+def decode_result(encoded: Dict[str, Any]) -> Dict[str, Any]:
+    result = dict(encoded)
+    images = result.pop('cam_images', None)
+    if images is not None:
+        store_cam_images(result, images)
+    if result.get('embedding') is not None:
+        result['embedding'] = decode_embedding(result['embedding'])
+    if result.get('perceptual_hash') is not None:
+        result['perceptual_hash'] = int(result['perceptual_hash'], 16)
+    return result
+
+
+def job_result(document: Dict[str, Any]) -> Dict[str, Any]:
+    """끝난 작업 문서 → predict() 결과. 실패한 작업은 local 모드와 같은 예외로 바꾼다."""
+    status = document['status']
+    if status == 'done':
+        result = decode_result(document['result'])
+        result['job_id'] = document['_id']
+        return result
+    if status == 'cancelled':
+        raise PipelineCancelled('cancelled')
+    error_type, error = document.get('error_type'), document.get('error') or '작업이 실패했습니다.'
+    if error_type == 'invalid_image':
+        raise InvalidImage(error)
+    if error_type in ('deadline_exceeded', 'expired_in_queue'):
+        raise PipelineCancelled(error_type)
+    raise JobFailed(f'{error} (worker: {document.get("worker_id")})')
+
+
+# ==========================================
+# API 쪽: 작업 넣기 + 결과 기다리기
+# ==========================================
+
+class JobClient:
+    def __init__(self, collection: Any, poll_interval: float = 0.2):
+        self.collection = collection
+        self.poll_interval = poll_interval
+        self._waiters: Dict[ObjectId, asyncio.Future] = {}
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self.submitted = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.poll_errors = 0
+
+    def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._poll(), name='inference-job-poller')
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for future in self._waiters.values():
+            if not future.done():
+                future.set_exception(RuntimeError('작업 큐 클라이언트가 종료되었습니다.'))
+
+    async def submit(
+        self,
+        image_data: bytes | bytearray,
+        priority: str,
+        patient_id: str | None = None,
+        cam_methods: List[str] | None = None,
+        deadline: float | None = None,
+    ) -> ObjectId:
+        if len(image_data) > MAX_JOB_IMAGE_BYTES:
+            raise InvalidImage(f'작업 큐 모드에서는 {MAX_JOB_IMAGE_BYTES:,} bytes 보다 큰 이미지를 처리할 수 없습니다.')
+        document = {
+            'status': 'queued',
+            'priority': PRIORITY_CLASSES.index(priority),
+            'priority_class': priority,
+            'image': bytes(image_data),
+            'patient_id': patient_id or None,
+            'cam_methods': cam_methods,
+            'attempts': 0,
+            'created_at': _now(),
+            'deadline_at': _wall_deadline(deadline),
+        }
+        inserted = await self.collection.insert_one(document)
+        self.submitted += 1
+        return inserted.inserted_id
+
+    async def wait(self, job_id: ObjectId) -> Dict[str, Any]:
+        assert self._wakeup is not None
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[job_id] = future
+        self._wakeup.set()
+        try:
+            document = await future
+        finally:
+            self._waiters.pop(job_id, None)
+        self.completed += 1
+        # CAM 이미지를 저장소에 쓰는 일이 있으므로 이벤트 루프 밖에서
+        return await asyncio.to_thread(job_result, document)
+
+    async def cancel(self, job_id: ObjectId) -> None:
+        """아직 아무 워커도 가져가지 않았으면 취소한다 (실행 중이면 그대로 두고 결과만 버린다)."""
+        result = await self.collection.update_one(
+            {'_id': job_id, 'status': 'queued'},
+            {'$set': {'status': 'cancelled', 'finished_at': _now()}, '$unset': {'image': ''}},
+        )
+        if result.modified_count:
+            self.cancelled += 1
+
+    async def run(
+        self,
+        image_data: bytes | bytearray,
+        priority: str,
+        context: PipelineContext,
+        patient_id: str | None = None,
+        cam_methods: List[str] | None = None,
+    ) -> Dict[str, Any]:
+        """작업을 넣고 끝날 때까지 기다린다. 기다리는 쪽이 취소되면(마감, 연결 종료) 작업도 취소한다."""
+        job_id = await self.submit(image_data, priority, patient_id, cam_methods, context.deadline)
+        try:
+            result = await self.wait(job_id)
+        except asyncio.CancelledError:
+            asyncio.ensure_future(self.cancel(job_id))
+            raise
+        context.timings.update(result.get('timings', {}))
+        return result
+
+    async def _poll(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            if not self._waiters:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            try:
+                documents = await self.collection.find(
+                    {'_id': {'$in': list(self._waiters)}, 'status': {'$in': list(TERMINAL_STATUSES)}},
+                    RESULT_PROJECTION,
+                ).to_list(None)
+            except Exception as e:
+                self.poll_errors += 1
+                metrics.inc('jobs.poll_failed')
+                print(f'⚠️ 추론 작업 상태 조회 실패: {e}')
+                documents = []
+            for document in documents:
+                future = self._waiters.get(document['_id'])
+                if future is not None and not future.done():
+                    future.set_result(document)
+            await asyncio.sleep(self.poll_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'mode': 'queue',
+            'waiting': len(self._waiters),
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'cancelled': self.cancelled,
+            'poll_errors': self.poll_errors,
+        }
+
+
+# ==========================================
+# 워커 쪽: 작업 가져가기 + 배치 추론
+# ==========================================
+
+def _error_type(error: Exception) -> str:
+    if isinstance(error, InvalidImage):
+        return 'invalid_image'
+    if isinstance(error, PipelineCancelled):
+        return error.reason
+    return 'error'
+
+
+class JobWorker:
+    def __init__(
+        self,
+        collection: Any,
+        worker_id: str,
+        batch_size: int = 4,
+        lease_seconds: float = 60.0,
+        max_attempts: int = 3,
+        poll_interval: float = 0.2,
+    ):
+        self.collection = collection
+        self.worker_id = worker_id
+        self.batch_size = max(1, batch_size)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.poll_interval = poll_interval
+        self.processed = 0
+        self.failed = 0
+        self.stale = 0
+        self.leases_lost = 0
+        self.batches = 0
+
+    async def claim(self) -> Dict[str, Any] | None:
+        """대기 중이거나 lease 가 만료된 작업 하나를 우선순위 → 먼저 들어온 순으로 가져간다."""
+        now = _now()
+        return await self.collection.find_one_and_update(
+            {
+                '$or': [{'status': 'queued'}, {'status': 'running', 'lease_until': {'$lt': now}}],
+                'attempts': {'$lt': self.max_attempts},
+            },
+            {
+                '$set': {
+                    'status': 'running',
+                    'worker_id': self.worker_id,
+                    'started_at': now,
+                    'lease_until': now + timedelta(seconds=self.lease_seconds),
+                },
+                '$inc': {'attempts': 1},
+            },
+            sort=[('priority', 1), ('created_at', 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def claim_batch(self) -> List[Dict[str, Any]]:
+        jobs: List[Dict[str, Any]] = []
+        while len(jobs) < self.batch_size:
+            job = await self.claim()
+            if job is None:
+                break
+            jobs.append(job)
+        return jobs
+
+    async def reap(self) -> int:
+        """재시도 횟수를 다 쓰고 lease 도 만료된 작업을 실패 처리한다."""
+        result = await self.collection.update_many(
+            {'status': 'running', 'lease_until': {'$lt': _now()}, 'attempts': {'$gte': self.max_attempts}},
+            {
+                '$set': {
+                    'status': 'failed',
+                    'error': f'워커가 {self.max_attempts}번 모두 작업을 끝내지 못했습니다.',
+                    'error_type': 'lease_expired',
+                    'finished_at': _now(),
+                },
+                '$unset': {'image': ''},
+            },
+        )
+        return result.modified_count
+
+    async def _finish(self, job: Dict[str, Any], update: Dict[str, Any]) -> bool:
+        result = await self.collection.update_one(
+            {'_id': job['_id'], 'worker_id': self.worker_id, 'status': 'running'},
+            {'$set': {**update, 'finished_at': _now()}, '$unset': {'image': ''}},
+        )
+        if not result.modified_count:
+            # lease 가 만료되어 다른 워커가 가져갔거나 취소됨
+            self.stale += 1
+            metrics.inc('jobs.stale_result')
+            print(f'⚠️ 작업 {job["_id"]} 결과 버림 (lease 를 잃음)')
+        return bool(result.modified_count)
+
+    async def _extend_leases(self, job_ids: List[ObjectId], done: asyncio.Event) -> bool:
+        """배치가 끝날 때까지 lease 를 연장한다. 연장에 실패하면 lease 를 잃은 것으로 보고 멈춘다 (예외는 올리지 않음).
+
+        lease 를 잃어도 배치는 끝까지 처리하고, 결과 반영 여부는 _finish 의 worker_id 조건이 정한다.
+        """
+        while True:
+            try:
+                await asyncio.wait_for(done.wait(), self.lease_seconds / 3)
+                return True
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.collection.update_many(
+                    {'_id': {'$in': job_ids}, 'worker_id': self.worker_id, 'status': 'running'},
+                    {'$set': {'lease_until': _now() + timedelta(seconds=self.lease_seconds)}},
+                )
+            except Exception as e:
+                self.leases_lost += len(job_ids)
+                metrics.inc('jobs.heartbeat_failed')
+                print(f'⚠️ lease 연장 실패 ({len(job_ids)}건, lease 를 잃은 것으로 처리): {e}')
+                return False
+
+    async def process(self, jobs: List[Dict[str, Any]]) -> None:
+        from app.services import model as model_service
+        from app.services.near_duplicate import get_near_duplicate_index
+
+        live: List[Dict[str, Any]] = []
+        for job in jobs:
+            deadline_at = job.get('deadline_at')
+            if deadline_at is not None and _as_utc(deadline_at) <= _now():
+                await self._finish(job, {'status': 'failed', 'error': '대기 중 마감 시각이 지났습니다.',
+                                         'error_type': 'expired_in_queue'})
+                self.failed += 1
+            else:
+                live.append(job)
+        if not live:
+            return
+
+        done = asyncio.Event()
+        heartbeat = asyncio.create_task(self._extend_leases([job['_id'] for job in live], done))
+        try:
+            results = await asyncio.to_thread(
+                model_service.predict_batch,
+                [job['image'] for job in live],
+                [PipelineContext(deadline=_monotonic_deadline(job.get('deadline_at'))) for job in live],
+                [job.get('cam_methods') for job in live],
+                [job.get('patient_id') for job in live],
+            )
+        finally:
+            done.set()
+            await heartbeat
+        self.batches += 1
+
+        index = get_near_duplicate_index()
+        for job, result in zip(live, results):
+            if isinstance(result, Exception):
+                self.failed += 1
+                await self._finish(job, {'status': 'failed', 'error': str(result), 'error_type': _error_type(result)})
+                continue
+            encoded = encode_result(result)
+            encoded['cam_images'] = await asyncio.to_thread(collect_cam_images, result)
+            if await self._finish(job, {'status': 'done', 'result': encoded}):
+                self.processed += 1
+                # 추론 기록의 _id 는 작업 _id 와 같다 (API 가 record_id 로 사용)
+                if index is not None and result.get('duplicate_of') is None and not result.get('unsuitable'):
+                    index.add(str(job['_id']), result['perceptual_hash'], job.get('patient_id'), result)
+
+    async def run(self, stop: asyncio.Event) -> None:
+        print(f'👷 추론 워커 시작: {self.worker_id} (배치 {self.batch_size}, lease {self.lease_seconds:g}초)')
+        last_reap = 0.0
+        while not stop.is_set():
+            try:
+                if time.monotonic() - last_reap >= self.lease_seconds:
+                    last_reap = time.monotonic()
+                    if reaped := await self.reap():
+                        print(f'⚠️ lease 만료 작업 {reaped}건 실패 처리')
+                jobs = await self.claim_batch()
+                if jobs:
+                    await self.process(jobs)
+                    continue
+            except Exception as e:
+                metrics.inc('jobs.worker_error')
+                print(f'❌ 추론 워커 오류: {e}')
+            try:
+                await asyncio.wait_for(stop.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+        print(f'🛑 추론 워커 종료: {self.worker_id} (완료 {self.processed}건, 실패 {self.failed}건)')
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'worker_id': self.worker_id,
+            'batches': self.batches,
+            'processed': self.processed,
+            'failed': self.failed,
+            'stale_results': self.stale,
+            'leases_lost': self.leases_lost,
+        }
+
+
+def _new_worker(collection: Any, worker_id: str, batch_size: int | None = None) -> JobWorker:
+    settings = get_settings()
+    return JobWorker(
+        collection,
+        worker_id=worker_id,
+        batch_size=batch_size or settings.job_batch_size or tuned_batch_size() or DEFAULT_BATCH_SIZE,
+        lease_seconds=settings.job_lease_seconds,
+        max_attempts=settings.job_max_attempts,
+        poll_interval=settings.job_poll_interval,
+    )
+
+
+# ==========================================
+# API 프로세스 수명 주기
+# ==========================================
+
+client: JobClient | None = None
+_local_workers: List[JobWorker] = []
+_local_tasks: List[asyncio.Task] = []
+_local_stop: asyncio.Event | None = None
+
+
+def start_job_queue(collection: Any) -> JobClient:
+    """INFERENCE_MODE=queue 일 때 호출한다. JOB_LOCAL_WORKERS 만큼 같은 프로세스 안에서도 워커를 돌린다."""
+    global client, _local_stop
+    settings = get_settings()
+    client = JobClient(collection, poll_interval=settings.job_poll_interval)
+    client.start()
+
+    _local_stop = asyncio.Event()
+    for i in range(settings.job_local_workers):
+        worker = _new_worker(collection, f'{socket.gethostname()}-{os.getpid()}-local{i}')
+        _local_workers.append(worker)
+        _local_tasks.append(asyncio.create_task(worker.run(_local_stop), name=f'inference-job-worker-{i}'))
+
+    metrics.register_collector('jobs', lambda: {
+        **client.stats(), 'local_workers': [worker.stats() for worker in _local_workers],
+    } if client is not None else {})
+    print(f'📮 추론 작업 큐 모드 (로컬 워커 {settings.job_local_workers}개)')
+    return client
+
+
+async def stop_job_queue() -> None:
+    global client
+    if _local_stop is not None:
+        _local_stop.set()
+    await asyncio.gather(*_local_tasks, return_exceptions=True)
+    _local_tasks.clear()
+    _local_workers.clear()
+    if client is not None:
+        await client.stop()
+        client = None
+
+
+# ==========================================
+# CLI
+# ==========================================
+
+async def _run_worker_process(args: argparse.Namespace) -> int:
+    import app.db.mongo as mongo
+    from app.services import model as model_service
+    from app.services.tuning import autotune_at_startup
+
+    if get_settings().mongo_uri.startswith('memory://'):
+        print('❌ 별도 워커 프로세스는 실제 mongod 가 필요합니다 (MONGODB_URI 확인, 개발용은 JOB_LOCAL_WORKERS).')
+        return 2
+
+    await mongo.connect_to_mongo()
+    try:
+        model_service.load_model()
+        autotune_at_startup()
+        worker = _new_worker(
+            mongo.session.inference_jobs, args.id or f'{socket.gethostname()}-{os.getpid()}', args.batch_size,
+        )
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await worker.run(stop)
+        return 0
+    finally:
+        await mongo.close_mongo_connection()
+
+
+async def _print_stats() -> int:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    settings = get_settings()
+    if settings.mongo_uri.startswith('memory://'):
+        print('❌ 작업 큐 통계는 실제 mongod 가 필요합니다 (MONGODB_URI 확인).')
+        return 2
+    mongo_client = AsyncIOMotorClient(settings.mongo_uri)
+    try:
+        collection = mongo_client[settings.mongo_db].get_collection('inference_jobs')
+        for status in ('queued', 'running', *TERMINAL_STATUSES):
+            print(f'{status:<10}{await collection.count_documents({"status": status}):>8}')
+        expired = await collection.count_documents({'status': 'running', 'lease_until': {'$lt': _now()}})
+        print(f'{"lease 만료":<10}{expired:>8}')
+        return 0
+    finally:
+        mongo_client.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='MongoDB 기반 추론 작업 큐')
+    sub = parser.add_subparsers(dest='command', required=True)
+    worker_parser = sub.add_parser('worker', help='작업을 가져가 배치로 추론하는 워커 실행')
+    worker_parser.add_argument('--batch-size', type=int, default=None, help='기본값 JOB_BATCH_SIZE → 스레드 튜닝 결과 → 4')
+    worker_parser.add_argument('--id', default=None, help='워커 이름 (기본값 호스트명-pid)')
+    sub.add_parser('stats', help='상태별 작업 수')
+    args = parser.parse_args()
+
+    if args.command == 'worker':
+        return asyncio.run(_run_worker_process(args))
+    return asyncio.run(_print_stats())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
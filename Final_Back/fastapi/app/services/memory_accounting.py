@@ -0,0 +1,303 @@
+"""요청/단계별 메모리 계측과 autograd 누수 탐지.
+
+MEMORY_ACCOUNTING=true 이면 /diagnose 요청마다
+  - 단계별 RSS 변화와 요청 중 최대 RSS (Linux: /proc/self/status VmHWM 을 요청 시작 시 초기화)
+  - 요청 전후 살아있는 tensor 수/바이트 변화
+  - 요청 후에도 남아있는 autograd graph(grad_fn 을 가진 tensor), 모델에 남은 hook
+을 기록하고 `/debug/memory`로 노출한다. 살아있는 객체를 gc 로 훑으므로 평소에는 꺼 둔다.
+(최대 RSS 는 프로세스 단위이므로 INFERENCE_CONCURRENCY=1 일 때 요청별 값이 정확하다)
+
+    python -m app.services.memory_accounting soak --iterations 2000   # 장시간 반복 후 RSS 증가 검사
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Iterator, List
+
+from app.core.config import get_settings
+from app.services import metrics
+from app.services.pipeline import PipelineContext
+
+if TYPE_CHECKING:
+    import torch
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss() -> int:
+    """현재 RSS (bytes). /proc 이 없으면 ru_maxrss 로 대체한다."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _peak_rss() -> int | None:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss() -> bool:
+    """VmHWM 을 현재 RSS 로 초기화한다 (Linux 4.0+, 실패하면 False)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def live_tensor_stats() -> Dict[str, int]:
+    """gc 가 추적하는 tensor 수, 저장소 기준 바이트, autograd graph 에 매달린 tensor 수."""
+    import torch
+
+    count = 0
+    graph_tensors = 0
+    storages: Dict[int, int] = {}
+    for obj in gc.get_objects():
+        try:
+            if not issubclass(type(obj), torch.Tensor):
+                continue
+            count += 1
+            if obj.grad_fn is not None:
+                graph_tensors += 1
+            storage = obj.untyped_storage()
+            storages[storage.data_ptr()] = storage.nbytes()
+        except Exception:
+            continue
+    return {'count': count, 'bytes': sum(storages.values()), 'graph_tensors': graph_tensors}
+
+
+def count_module_hooks(*modules: torch.nn.Module | None) -> int:
+    total = 0
+    for module in modules:
+        if module is None:
+            continue
+        for sub in module.modules():
+            total += len(sub._forward_hooks) + len(sub._forward_pre_hooks)
+            total += len(sub._backward_hooks) + len(getattr(sub, '_backward_pre_hooks', {}))
+    return total
+
+
+def _loaded_models() -> List[torch.nn.Module | None]:
+    from app.services import model as model_service
+
+    return [model_service._segmentation_model, model_service._classification_model]
+
+
+class MemoryTracker:
+    """최근 요청들의 메모리 기록을 보관한다."""
+
+    def __init__(self, history: int = 200):
+        self._lock = threading.Lock()
+        self._records: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self.requests = 0
+        self.flagged = 0
+        self.baseline_rss: int | None = None
+
+    @contextmanager
+    def track(self, ctx: PipelineContext, label: str = 'predict') -> Iterator[Dict[str, Any]]:
+        """요청 하나를 계측한다. ctx 의 각 단계에도 RSS 측정 훅을 건다."""
+        gc.collect()
+        tensors_before = live_tensor_stats()
+        hooks_before = count_module_hooks(*_loaded_models())
+        rss_before = current_rss()
+        peak_reset = _reset_peak_rss()
+        stages: Dict[str, Dict[str, int]] = {}
+
+        @contextmanager
+        def stage_hook(name: str) -> Iterator[None]:
+            start = current_rss()
+            try:
+                yield
+            finally:
+                end = current_rss()
+                stages[name] = {'rss_start': start, 'rss_end': end, 'rss_delta': end - start}
+
+        ctx.stage_hooks.append(stage_hook)
+        record: Dict[str, Any] = {'label': label, 'started_at': datetime.now(timezone.utc).isoformat()}
+        try:
+            yield record
+        finally:
+            ctx.stage_hooks.remove(stage_hook)
+            gc.collect()
+            tensors_after = live_tensor_stats()
+            hooks_after = count_module_hooks(*_loaded_models())
+            rss_after = current_rss()
+            peak = _peak_rss() if peak_reset else None
+
+            leaks: List[str] = []
+            if tensors_after['graph_tensors'] > tensors_before['graph_tensors']:
+                leaks.append('live_autograd_graph')
+            if hooks_after > hooks_before:
+                leaks.append('leaked_hooks')
+
+            record.update({
+                'rss_before': rss_before,
+                'rss_after': rss_after,
+                'rss_delta': rss_after - rss_before,
+                'peak_rss': peak if peak is not None else max([rss_after] + [s['rss_end'] for s in stages.values()]),
+                'tensor_count_delta': tensors_after['count'] - tensors_before['count'],
+                'tensor_bytes_delta': tensors_after['bytes'] - tensors_before['bytes'],
+                'graph_tensors': tensors_after['graph_tensors'],
+                'module_hooks': hooks_after,
+                'stages': stages,
+                'leaks': leaks,
+            })
+            with self._lock:
+                self.requests += 1
+                if self.baseline_rss is None:
+                    self.baseline_rss = rss_after
+                if leaks:
+                    self.flagged += 1
+                    for leak in leaks:
+                        metrics.inc(f'memory.leak.{leak}')
+                self._records.append(record)
+            if leaks:
+                print(f'⚠️ 메모리 누수 의심 ({", ".join(leaks)}): graph tensor {tensors_after["graph_tensors"]}개, hook {hooks_after}개')
+
+    def wrap(self, fn: Callable[..., Any], ctx: PipelineContext) -> Callable[..., Any]:
+        """스케줄러 스레드에서 실행될 함수를 계측 블록으로 감싼다."""
+        def tracked(*args: Any, **kwargs: Any) -> Any:
+            with self.track(ctx, label=getattr(fn, '__name__', 'call')):
+                return fn(*args, **kwargs)
+        return tracked
+
+    def snapshot(self, recent: int = 20) -> Dict[str, Any]:
+        with self._lock:
+            records = list(self._records)
+        rss = current_rss()
+        return {
+            'enabled': get_settings().memory_accounting,
+            'rss': rss,
+            'peak_rss': _peak_rss(),  # 요청 계측 중에는 요청 시작 시점부터의 최대값
+            'baseline_rss': self.baseline_rss,
+            'growth_since_baseline': rss - self.baseline_rss if self.baseline_rss is not None else None,
+            'live_tensors': live_tensor_stats(),
+            'module_hooks': count_module_hooks(*_loaded_models()),
+            'requests': self.requests,
+            'flagged': self.flagged,
+            'recent': records[-recent:] if recent else [],
+        }
+
+
+tracker = MemoryTracker()
+
+
+# ==========================================
+# soak 테스트
+# ==========================================
+
+def _slope(xs: List[float], ys: List[float]) -> float:
+    n = len(xs)
+    mean_x, mean_y = sum(xs) / n, sum(ys) / n
+    denominator = sum((x - mean_x) ** 2 for x in xs) or 1.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / denominator
+
+
+def soak(iterations: int, warmup: int, sample_every: int, max_growth_mb: float, image_size: int) -> bool:
+    """predict() 를 반복 실행하며 warmup 이후 RSS 가 평평한지 확인한다.
+
+    CAM 방식 조합을 돌아가며 사용해 hook/graph 경로를 모두 거친다. 합성 잡음 이미지는 품질 검사에서
+    거절되어 분류/CAM 을 건너뛰므로 soak 동안은 QUALITY_GATE 를 끈다 (그래도 거절되면 실패).
+    """
+    from app.services import model as model_service
+    from app.services.quality_gate import get_quality_gate
+
+    settings = get_settings()
+    original_gate = settings.quality_gate
+    settings.quality_gate = False
+    get_quality_gate.cache_clear()
+    try:
+        return _soak(model_service, iterations, warmup, sample_every, max_growth_mb, image_size)
+    finally:
+        settings.quality_gate = original_gate
+        get_quality_gate.cache_clear()
+
+
+def _soak(model_service: Any, iterations: int, warmup: int, sample_every: int, max_growth_mb: float, image_size: int) -> bool:
+    import contextlib
+    import io
+    import tempfile
+    from pathlib import Path
+
+    import numpy as np
+    from PIL import Image
+
+    model_service.load_model()
+    image_path = Path(tempfile.mkdtemp(prefix='soak-')) / 'soak.png'
+    rng = np.random.default_rng(0)
+    cam_mixes: List[List[str]] = [[], ['gradcam'], ['gradcam', 'gradcam_plus', 'layercam'], ['layercam']]
+
+    samples_x: List[float] = []
+    samples_y: List[float] = []
+    leaks = 0
+    unsuitable = 0
+    started = time.perf_counter()
+    for i in range(iterations):
+        # 매번 다른 이미지 (CAM 저장소 재사용으로 CAM 경로가 생략되지 않도록)
+        Image.fromarray(rng.integers(0, 255, (image_size, image_size), dtype=np.uint8)).convert('RGB').save(image_path)
+        ctx = PipelineContext()
+        with contextlib.redirect_stdout(io.StringIO()):
+            if i % sample_every == 0:
+                with tracker.track(ctx, label='soak') as record:
+                    result = model_service.predict(image_path, context=ctx, cam_methods=cam_mixes[i % len(cam_mixes)])
+            else:
+                result = model_service.predict(image_path, context=ctx, cam_methods=cam_mixes[i % len(cam_mixes)])
+        # 거절된 입력은 분류/CAM 경로를 거치지 않으므로 soak 결과가 의미 없다
+        unsuitable += bool(result.get('unsuitable'))
+
+        if i % sample_every == 0:
+            leaks += bool(record['leaks'])
+            if i >= warmup:
+                samples_x.append(i)
+                samples_y.append(record['rss_after'] / 1024 / 1024)
+                print(f'  [{i:>5}/{iterations}] RSS {samples_y[-1]:.1f}MB, '
+                      f'tensor Δ {record["tensor_count_delta"]:+d}, leaks={record["leaks"] or "-"}')
+
+    if len(samples_x) < 2:
+        print('❌ 표본이 부족합니다 (--iterations / --sample-every 조정)')
+        return False
+
+    growth = _slope(samples_x, samples_y) * (samples_x[-1] - samples_x[0])
+    elapsed = time.perf_counter() - started
+    ok = growth <= max_growth_mb and leaks == 0 and unsuitable == 0
+    print(f'{"✅" if ok else "❌"} soak {iterations}회 ({elapsed:.0f}초): '
+          f'추세 기준 RSS 증가 {growth:.1f}MB (허용 {max_growth_mb}MB), 누수 의심 {leaks}건, 품질 검사 거절 {unsuitable}건')
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='메모리 soak 테스트')
+    sub = parser.add_subparsers(dest='command', required=True)
+    soak_parser = sub.add_parser('soak', help='predict() 반복 실행 후 RSS 증가 검사')
+    soak_parser.add_argument('--iterations', type=int, default=2000)
+    soak_parser.add_argument('--warmup', type=int, default=50, help='RSS 추세 계산에서 제외할 초기 반복 수')
+    soak_parser.add_argument('--sample-every', type=int, default=25)
+    soak_parser.add_argument('--max-growth-mb', type=float, default=50.0)
+    soak_parser.add_argument('--image-size', type=int, default=512)
+    args = parser.parse_args()
+
+    ok = soak(args.iterations, args.warmup, args.sample_every, args.max_growth_mb, args.image_size)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""프로세스 내 간단한 메트릭 레지스트리.
+
+카운터는 `inc()`로 올리고, 저장소/스케줄러처럼 자체 상태를 가진 컴포넌트는
+`register_collector()`로 스냅샷 함수를 등록한다. `/api/ai/metrics`가 `snapshot()`을 그대로 반환한다.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = {}
+_collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def inc(name: str, value: int = 1) -> None:
+    """카운터를 증가시킨다."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def register_collector(name: str, collector: Callable[[], Dict[str, Any]]) -> None:
+    """스냅샷 시점에 호출될 collector를 등록한다 (같은 이름이면 교체)."""
+    with _lock:
+        _collectors[name] = collector
+
+
+def snapshot() -> Dict[str, Any]:
+    """현재 카운터와 collector 결과를 반환한다."""
+    with _lock:
+        counters = dict(_counters)
+        collectors = dict(_collectors)
+
+    result: Dict[str, Any] = {'counters': counters}
+    for name, collector in collectors.items():
+        try:
+            result[name] = collector()
+        except Exception as e:
+            result[name] = {'error': str(e)}
+    return result
@@ -1,18 +1,32 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple, Union
+import base64
+import hashlib
+import io
+import threading
+import time
 import numpy as np
-import os
 
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from PIL import Image
-from torchvision import transforms, models
-import cv2
+from PIL import Image, UnidentifiedImageError
 
 from app.core.config import get_settings
+from app.services import metrics
+from app.services.buffers import BufferSet, get_buffer_pool
+from app.services.cam_policy import get_cam_policy
+from app.services.cam_store import (
+    IMAGE_FORMATS, encode_image, get_cam_store, make_key, media_type_for, render_digest,
+)
+from app.services.near_duplicate import dhash, get_near_duplicate_index
+from app.services.pipeline import InvalidImage, PipelineContext
+from app.services.precision import autocast, resolve_precision
+from app.services.quality_gate import QualityVerdict, get_quality_gate
+from app.services.tuning import configure_threads
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent.parent.parent
@@ -119,27 +133,78 @@ class UNet(nn.Module):
         return logits
 
 
+@dataclass(frozen=True)
+class BackboneSpec:
+    """분류 backbone 정의 (torchvision 생성 함수, 헤드를 붙일 속성, CAM 대상 레이어)."""
+    builder: str
+    weights: str
+    head_attr: str
+    cam_layer: str
+    label: str
+
+
+# 모든 backbone 은 같은 헤드(Dropout → Linear(특징 수, 512) → ReLU → Dropout → Linear(512, 클래스 수))를 쓰고,
+# CAM 은 마지막 합성곱 특징 맵(cam_layer 출력)에서 계산한다
+CLASSIFIER_BACKBONES: Dict[str, BackboneSpec] = {
+    'resnet18': BackboneSpec('resnet18', 'ResNet18_Weights', 'fc', 'layer4', 'ResNet18'),
+    'resnet34': BackboneSpec('resnet34', 'ResNet34_Weights', 'fc', 'layer4', 'ResNet34'),
+    'resnet50': BackboneSpec('resnet50', 'ResNet50_Weights', 'fc', 'layer4', 'ResNet50'),
+    'mobilenet_v3_small': BackboneSpec('mobilenet_v3_small', 'MobileNet_V3_Small_Weights', 'classifier', 'features', 'MobileNetV3-Small'),
+    'mobilenet_v3_large': BackboneSpec('mobilenet_v3_large', 'MobileNet_V3_Large_Weights', 'classifier', 'features', 'MobileNetV3-Large'),
+    'efficientnet_b0': BackboneSpec('efficientnet_b0', 'EfficientNet_B0_Weights', 'classifier', 'features', 'EfficientNet-B0'),
+}
+DEFAULT_BACKBONE = 'resnet50'
+# 분류 헤드의 은닉 표현(ReLU 출력) 크기 = 유사 증례 검색용 임베딩 차원 (backbone 과 무관)
+EMBEDDING_DIM = 512
+
+# forward_with_embedding() 호출 중인 스레드에서만 헤드 은닉 표현을 보관한다 (동시 추론 간 섞이지 않도록)
+_embedding_capture = threading.local()
+
+
+def _keep_embedding(module: nn.Module, inputs: Any, output: torch.Tensor) -> None:
+    if getattr(_embedding_capture, 'active', False):
+        _embedding_capture.embedding = output
+
+
 class COVID19Classifier(nn.Module):
-    """ResNet 기반 COVID-19 분류 모델"""
+    """torchvision backbone 기반 COVID-19 분류 모델 (기본 ResNet50)"""
     
-    def __init__(self, num_classes=4, pretrained=False):
+    def __init__(self, num_classes=4, pretrained=False, backbone=DEFAULT_BACKBONE):
         super(COVID19Classifier, self).__init__()
-        if pretrained:
-            self.backbone = models.resnet50(weights=models.ResNet50_Weights.DEFAULT)
-        else:
-            self.backbone = models.resnet50(weights=None)
-        num_features = self.backbone.fc.in_features
-        self.backbone.fc = nn.Sequential(
+        if backbone not in CLASSIFIER_BACKBONES:
+            raise ValueError(f'지원하지 않는 backbone: {backbone} (가능: {", ".join(CLASSIFIER_BACKBONES)})')
+        # torchvision 은 import 비용이 커서 모델을 만들 때만 불러온다
+        from torchvision import models
+
+        spec = CLASSIFIER_BACKBONES[backbone]
+        self.backbone_name = backbone
+        self.cam_target_layer = spec.cam_layer
+        weights = getattr(models, spec.weights).DEFAULT if pretrained else None
+        self.backbone = getattr(models, spec.builder)(weights=weights)
+
+        head = getattr(self.backbone, spec.head_attr)
+        num_features = next(m for m in head.modules() if isinstance(m, nn.Linear)).in_features
+        setattr(self.backbone, spec.head_attr, nn.Sequential(
             nn.Dropout(0.5),
-            nn.Linear(num_features, 512),
+            nn.Linear(num_features, EMBEDDING_DIM),
             nn.ReLU(),
             nn.Dropout(0.3),
-            nn.Linear(512, num_classes)
-        )
+            nn.Linear(EMBEDDING_DIM, num_classes)
+        ))
+        getattr(self.backbone, spec.head_attr)[2].register_forward_hook(_keep_embedding)
     
     def forward(self, x):
         return self.backbone(x)
 
+    def forward_with_embedding(self, x):
+        """logits 와 헤드 은닉 표현(N x EMBEDDING_DIM)을 같은 forward 한 번으로 얻는다."""
+        _embedding_capture.active = True
+        try:
+            return self.backbone(x), _embedding_capture.embedding
+        finally:
+            _embedding_capture.active = False
+            _embedding_capture.embedding = None
+
 
 # ==========================================
 # 전역 변수
@@ -148,52 +213,104 @@ class COVID19Classifier(nn.Module):
 device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 _segmentation_model: UNet | None = None
 _classification_model: COVID19Classifier | None = None
+_model_version: str | None = None
+# 실제 사용 중인 추론 정밀도 (fp32 / bf16, load_model() 에서 INFERENCE_PRECISION 과 장치 지원 여부로 결정)
+_precision: str = 'fp32'
 
-# 성능 최적화를 위한 설정
-torch.set_num_threads(4)  # CPU 스레드 수 제한 (과도한 멀티스레딩 방지)
-if device.type == 'cpu':
-    torch.set_num_interop_threads(2)  # CPU 병렬 처리 최적화
+# 성능 최적화를 위한 설정 (튜닝 결과 / 환경 변수 / 호스트 CPU 수 기준)
+configure_threads()
 
 CLASS_NAMES = ['COVID', 'Lung_Opacity', 'Normal', 'Viral Pneumonia']
 
-# 분류 모델용 transform
-_classification_transform = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                        std=[0.229, 0.224, 0.225])
-])
+# 분할/분류 모델 공통 입력 정규화 (ImageNet 통계)
+INPUT_SIZE = (224, 224)
+_IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+_IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+
+def _to_model_input(
+    image: Image.Image,
+    out: torch.Tensor | None = None,
+    scratch: np.ndarray | None = None,
+) -> torch.Tensor:
+    """Resize(224) → ToTensor → Normalize 와 같은 결과를 torchvision 없이 만든다 (1x3x224x224).
+
+    out(1x3x224x224) 과 scratch(224x224x3 float32) 를 주면 새로 할당하지 않고 그 안에 채운다.
+    """
+    if image.size != INPUT_SIZE:
+        image = image.resize(INPUT_SIZE, Image.BILINEAR)
+    if out is None or scratch is None:
+        array = np.asarray(image, dtype=np.float32) / 255.0
+        array = (array - _IMAGENET_MEAN) / _IMAGENET_STD
+        return torch.from_numpy(np.ascontiguousarray(array.transpose(2, 0, 1))).unsqueeze(0)
+    _normalize_into(np.asarray(image), out, scratch)
+    return out
+
 
-# 분할 모델용 transform (RGB 이미지)
-_segmentation_transform = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                        std=[0.229, 0.224, 0.225])
-])
+def _normalize_into(pixels: np.ndarray, out: torch.Tensor, scratch: np.ndarray) -> None:
+    """uint8 HWC 픽셀을 정규화해 out(1x3xHxW) 에 쓴다. 연산 순서는 위 할당 경로와 같다 (결과가 비트 단위로 같음)."""
+    np.copyto(scratch, pixels, casting='unsafe')
+    np.divide(scratch, 255.0, out=scratch)
+    np.subtract(scratch, _IMAGENET_MEAN, out=scratch)
+    np.divide(scratch, _IMAGENET_STD, out=scratch)
+    np.copyto(out[0].numpy(), scratch.transpose(2, 0, 1))
+
+
+def _get_buffers(batch_size: int = 1) -> BufferSet | None:
+    """현재 스레드의 재사용 버퍼 (TENSOR_BUFFER_POOL=false 면 None)."""
+    pool = get_buffer_pool(INPUT_SIZE)
+    return pool.get(batch_size) if pool is not None else None
 
 
 # ==========================================
 # 모델 로드 함수
 # ==========================================
 
+def _compute_model_version(*paths: Path) -> str:
+    """체크포인트 파일의 이름/크기/수정시각으로 짧은 모델 버전 문자열을 만든다."""
+    digest = hashlib.sha1()
+    for path in paths:
+        stat = path.stat()
+        digest.update(f'{path.name}:{stat.st_size}:{int(stat.st_mtime)};'.encode())
+    return digest.hexdigest()[:12]
+
+
+def get_model_version() -> str:
+    """현재 로드된 모델의 버전을 반환한다."""
+    return _model_version or 'unknown'
+
+
 def load_model() -> None:
     """분할 모델과 분류 모델을 로드한다."""
-    global _segmentation_model, _classification_model
+    global _segmentation_model, _classification_model, _model_version, _precision
     
     if _segmentation_model is not None and _classification_model is not None:
         return
+
+    _precision = resolve_precision(get_settings().inference_precision, device)
+
+    # 부하 테스트/개발용: 체크포인트 없이 랜덤 가중치 모델 사용 (연산량은 동일)
+    if get_settings().model_standin == 'random':
+        # 고정 시드: 프로세스가 달라도 같은 가중치 (parity golden 재현용), 전역 RNG 상태는 건드리지 않음
+        with torch.random.fork_rng(devices=[]):
+            torch.manual_seed(0)
+            _segmentation_model = UNet(n_channels=3, n_classes=1, bilinear=False).to(device).eval()
+            _classification_model = COVID19Classifier(
+                num_classes=4, pretrained=False, backbone=get_settings().classifier_backbone or DEFAULT_BACKBONE,
+            ).to(device).eval()
+        _model_version = 'random-standin'
+        print(f'⚠️ 랜덤 가중치 모델 사용 (MODEL_STANDIN=random, device: {device}, 정밀도: {_precision})')
+        return
     
     # 모델 경로 설정
     seg_model_path = AI_MODEL_DIR/'seg_best_model.pth'
-    clf_model_path = AI_MODEL_DIR/'clf_best_model.pth'
+    clf_model_path = Path(get_settings().classifier_checkpoint or AI_MODEL_DIR/'clf_best_model.pth')
     
     # 모델 파일이 없으면 다운로드 시도 (Render 배포 환경)
     if not seg_model_path.exists() or not clf_model_path.exists():
         print("⚠️  모델 파일이 없습니다. GitHub Release에서 다운로드를 시도합니다...")
         try:
             import sys
-            from pathlib import Path
             # download_models.py가 있는 경로 추가
             download_script_path = Path(__file__).parent.parent.parent / 'download_models.py'
             if download_script_path.exists():
@@ -235,14 +352,18 @@ def load_model() -> None:
     if not clf_model_path.exists():
         raise FileNotFoundError(f"분류 모델 파일을 찾을 수 없습니다: {clf_model_path}")
     
-    _classification_model = COVID19Classifier(num_classes=4, pretrained=False)
     clf_checkpoint = torch.load(clf_model_path, map_location=device)
+    backbone = _resolve_backbone(clf_checkpoint)
+    _classification_model = COVID19Classifier(num_classes=4, pretrained=False, backbone=backbone)
     if isinstance(clf_checkpoint, dict) and 'model_state_dict' in clf_checkpoint:
-        _classification_model.load_state_dict(clf_checkpoint['model_state_dict'], strict=False)
+        # backbone 메타데이터가 있는 체크포인트는 구조가 확실하므로 키가 모두 맞아야 한다
+        _classification_model.load_state_dict(clf_checkpoint['model_state_dict'], strict='backbone' in clf_checkpoint)
     else:
         _classification_model.load_state_dict(clf_checkpoint, strict=False)
     _classification_model.to(device)
     _classification_model.eval()
+
+    _model_version = get_settings().model_version or _compute_model_version(seg_model_path, clf_model_path)
     
     # 모델 파라미터 수 확인
     seg_params = sum(p.numel() for p in _segmentation_model.parameters())
@@ -251,9 +372,11 @@ def load_model() -> None:
     print(f'✅ AI 모델 로드 완료 (device: {device})')
     print(f'  - 분할 모델: {seg_model_path}')
     print(f'    * 파라미터 수: {seg_params:,}개')
-    print(f'  - 분류 모델: {clf_model_path}')
+    print(f'  - 분류 모델: {clf_model_path} ({_classification_model.backbone_name})')
     print(f'    * 파라미터 수: {clf_params:,}개')
     print(f'  - 총 파라미터 수: {seg_params + clf_params:,}개')
+    print(f'  - 모델 버전: {_model_version}')
+    print(f'  - 추론 정밀도: {_precision}')
     
     # 모델 가중치 샘플 확인 (실제로 로드되었는지)
     seg_first_weight = next(_segmentation_model.parameters()).data[0, 0, 0, 0].item()
@@ -262,60 +385,91 @@ def load_model() -> None:
     print(f'  - 분류 모델 첫 번째 가중치 샘플: {clf_first_weight:.6f}')
 
 
+def _resolve_backbone(checkpoint: Any) -> str:
+    """체크포인트의 backbone 메타데이터 → CLASSIFIER_BACKBONE 설정 → resnet50 순으로 분류 backbone 을 정한다."""
+    configured = get_settings().classifier_backbone
+    recorded = checkpoint.get('backbone') if isinstance(checkpoint, dict) else None
+    if recorded and configured and recorded != configured:
+        print(f'⚠️ CLASSIFIER_BACKBONE={configured} 이지만 체크포인트는 {recorded} 입니다. 체크포인트 기준으로 로드합니다.')
+    return recorded or configured or DEFAULT_BACKBONE
+
+
 def unload_model() -> None:
     """모델을 메모리에서 해제한다."""
-    global _segmentation_model, _classification_model
+    global _segmentation_model, _classification_model, _model_version
     _segmentation_model = None
     _classification_model = None
+    _model_version = None
 
 
 # ==========================================
 # 전처리 및 예측 함수
 # ==========================================
 
-def _segment_lung(image_tensor: torch.Tensor, threshold: float = 0.5) -> torch.Tensor:
-    """폐 영역을 분할한다."""
+def get_precision() -> str:
+    return _precision
+
+
+def _segment_lung(image_tensor: torch.Tensor, threshold: float = 0.5, precision: str | None = None) -> torch.Tensor:
+    """폐 영역을 분할한다 (precision 생략 시 현재 추론 정밀도)."""
     if _segmentation_model is None:
         load_model()
 
     assert _segmentation_model is not None
 
     print(f'  🔬 분할 모델 입력 shape: {image_tensor.shape}, device: {image_tensor.device}')
-    with torch.inference_mode():  # no_grad()보다 빠름
-        import time
+    with torch.inference_mode(), autocast(precision or _precision, device):  # no_grad()보다 빠름
         forward_start = time.time()
-        mask_logits = _segmentation_model(image_tensor.to(device))
+        mask_logits = _segmentation_model(image_tensor.to(device, non_blocking=image_tensor.is_pinned())).float()
         forward_time = time.time() - forward_start
         print(f'  🔬 분할 모델 forward pass 완료: {forward_time:.4f}초')
         print(f'  🔬 분할 모델 출력 shape: {mask_logits.shape}')
-        mask = torch.sigmoid(mask_logits) > threshold
-        return mask.float()
+        # sigmoid / 비교를 제자리에서 (0/1 float 마스크, 중간 tensor 할당 없음)
+        return mask_logits.sigmoid_().gt_(threshold)
+
 
+# predict() 입력: 이미지 파일 경로 또는 업로드된 이미지 바이트
+ImageSource = Union[Path, bytes, bytearray, memoryview]
 
-def _preprocess_image(image_path: Path) -> torch.Tensor:
-    """이미지를 전처리한다 (RGB로 변환)."""
-    image = Image.open(image_path).convert('RGB')
-    tensor = _segmentation_transform(image).unsqueeze(0)
-    return tensor
+
+def _decode_image(data: bytes | bytearray | memoryview) -> Image.Image:
+    """이미지 바이트를 한 번만 디코딩해 RGB 이미지로 만든다 (이후 단계는 이 이미지를 재사용)."""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.convert('RGB')
+    except (UnidentifiedImageError, OSError) as e:
+        raise InvalidImage(f'이미지를 디코딩할 수 없습니다: {e}') from e
+
+
+def _preprocess_image(image: Image.Image, buffers: BufferSet | None = None, index: int = 0) -> torch.Tensor:
+    """이미지를 전처리한다 (RGB 이미지 → 정규화된 입력 tensor). buffers 가 있으면 index 번째 칸에 채운다."""
+    if buffers is None:
+        return _to_model_input(image)
+    return _to_model_input(image, buffers.segmentation_input[index:index + 1], buffers.scratch)
 
 # GradCAM 생성 전에 역정규화된 이미지 준비
 def _denormalize_image(tensor: torch.Tensor) -> Image.Image:
     """정규화된 tensor를 원본 이미지로 복원"""
-    mean = torch.tensor([0.485, 0.456, 0.406]).view(3, 1, 1)
-    std = torch.tensor([0.229, 0.224, 0.225]).view(3, 1, 1)
-    
+    array = tensor.squeeze(0).cpu().numpy().transpose(1, 2, 0)
+
     # 역정규화
-    tensor = tensor.squeeze(0).cpu() * std + mean
-    tensor = torch.clamp(tensor, 0, 1)
-    
-    # PIL Image로 변환
-    return transforms.ToPILImage()(tensor)
+    array = np.clip(array * _IMAGENET_STD + _IMAGENET_MEAN, 0, 1)
 
-def _preprocess_for_classification(image_path: Path, mask: torch.Tensor) -> torch.Tensor:
-    """원본 이미지에 마스크 적용 후 분류용으로 전처리"""
-    # 1. 원본 이미지 로드 (정규화 X)
-    image = Image.open(image_path).convert('RGB')
-    image = transforms.Resize((224, 224))(image)
+    # PIL Image로 변환
+    return Image.fromarray((array * 255).astype(np.uint8))
+
+def _preprocess_for_classification(
+    image: Image.Image,
+    mask: torch.Tensor,
+    buffers: BufferSet | None = None,
+    index: int = 0,
+) -> torch.Tensor:
+    """원본 이미지에 마스크 적용 후 분류용으로 전처리 (buffers 가 있으면 index 번째 칸에 채운다)"""
+    if buffers is not None:
+        return _masked_into(image, mask, buffers, index)
+
+    # 1. 원본 이미지 크기 조정 (정규화 X)
+    image = image.resize(INPUT_SIZE, Image.BILINEAR)
     image_np = np.array(image).astype(np.float32) / 255.0
     
     # 2. 마스크 적용
@@ -325,377 +479,501 @@ def _preprocess_for_classification(image_path: Path, mask: torch.Tensor) -> torc
     
     # 3. PIL로 변환 후 분류용 transform (정규화 포함)
     segmented_pil = Image.fromarray((segmented * 255).astype(np.uint8))
-    tensor = _classification_transform(segmented_pil).unsqueeze(0)
-    return tensor
+    return _to_model_input(segmented_pil)
+
+
+def _masked_into(image: Image.Image, mask: torch.Tensor, buffers: BufferSet, index: int) -> torch.Tensor:
+    """_preprocess_for_classification 과 같은 계산을 재사용 버퍼 안에서 한다 (마스크 적용 → 8bit 양자화 → 정규화)."""
+    if image.size != INPUT_SIZE:
+        image = image.resize(INPUT_SIZE, Image.BILINEAR)
+    scratch, quantized = buffers.scratch, buffers.quantized
+    np.copyto(scratch, np.asarray(image), casting='unsafe')
+    np.divide(scratch, 255.0, out=scratch)
+    np.multiply(scratch, mask.squeeze().cpu().numpy()[..., None], out=scratch)
+    np.multiply(scratch, 255, out=scratch)
+    np.copyto(quantized, scratch, casting='unsafe')
+    out = buffers.classification_input[index:index + 1]
+    _normalize_into(quantized, out, scratch)
+    return out
+
+
+def _classify_batch(input_tensor: torch.Tensor, precision: str | None = None) -> Tuple[torch.Tensor, np.ndarray]:
+    """N 장의 분류 확률 (N x 클래스 수, fp32) 과 유사 증례 검색용 임베딩 (N x EMBEDDING_DIM, float32)."""
+    assert _classification_model is not None
 
+    # 분류는 항상 autograd graph 없이 실행하고, CAM 이 필요할 때만 별도로 gradient 를 계산한다
+    with torch.inference_mode(), autocast(precision or _precision, device):
+        outputs, embedding = _classification_model.forward_with_embedding(input_tensor)
+    return torch.softmax(outputs.float(), dim=1), embedding.float().cpu().numpy()
 
-def _generate_gradcam(model: nn.Module, input_tensor: torch.Tensor, target_class: int, layer_name: str = 'layer4') -> np.ndarray | None:
-    """Grad-CAM 히트맵을 생성한다."""
-    model.eval()
-    
-    # Gradient를 저장할 hook 등록
-    gradients = []
-    activations = []
-    
-    def backward_hook(module, grad_input, grad_output):
-        gradients.append(grad_output[0])
-    
-    def forward_hook(module, input, output):
-        activations.append(output)
-    
-    # ResNet50의 마지막 convolutional layer 찾기
-    target_layer = None
+
+def _classify_with_embedding(input_tensor: torch.Tensor, precision: str | None = None) -> Tuple[torch.Tensor, np.ndarray]:
+    """한 장의 분류 확률 (클래스 수 길이의 1차원 fp32 tensor) 과 임베딩 (EMBEDDING_DIM, float32)."""
+    probabilities, embedding = _classify_batch(input_tensor, precision)
+    return probabilities[0], embedding[0]
+
+
+def _classify(input_tensor: torch.Tensor, precision: str | None = None) -> torch.Tensor:
+    """분류 확률 (클래스 수 길이의 1차원 fp32 tensor)."""
+    return _classify_with_embedding(input_tensor, precision)[0]
+
+
+def _find_target_layer(model: nn.Module, layer_name: str | None = None) -> nn.Module | None:
+    """CAM 대상 레이어를 찾는다 (생략 시 모델의 cam_target_layer, COVID19Classifier 는 backbone 아래)."""
+    default_name = getattr(model, 'cam_target_layer', 'layer4')
+    layer_name = layer_name or default_name
     if hasattr(model, 'backbone'):
-        # COVID19Classifier의 경우 backbone이 ResNet50
         if hasattr(model.backbone, layer_name):
-            target_layer = getattr(model.backbone, layer_name)
-        elif hasattr(model.backbone, 'layer4'):
-            target_layer = model.backbone.layer4
+            return getattr(model.backbone, layer_name)
+        return getattr(model.backbone, default_name, None)
+    return getattr(model, layer_name, None)
+
+
+def _normalize_cam(cam: torch.Tensor) -> np.ndarray:
+    cam_np: np.ndarray = cam.squeeze().cpu().numpy()
+    cam_np = cam_np - cam_np.min()
+    return cam_np / (cam_np.max() + 1e-8)
+
+
+def _gradcam_from(act: torch.Tensor, grad: torch.Tensor) -> np.ndarray:
+    """Grad-CAM: gradient 의 global average pooling 을 채널 가중치로 사용."""
+    weights = torch.mean(grad, dim=(2, 3), keepdim=True)
+    cam = F.relu(torch.sum(weights * act, dim=1, keepdim=True))
+    return _normalize_cam(cam)
+
+
+def _gradcam_plus_from(act: torch.Tensor, grad: torch.Tensor) -> np.ndarray:
+    """Grad-CAM++: alpha_ij^kc = (grad_ij^kc)^2 / (2 * (grad_ij^kc)^2 + sum_ab(act_ab^kc * grad_ab^kc))"""
+    grad_squared = grad.pow(2)
+    grad_sum = torch.sum(act * grad, dim=(2, 3), keepdim=True)
+    alpha = F.relu(grad_squared / (2 * grad_squared + grad_sum + 1e-8))
+    cam = F.relu(torch.sum(alpha * F.relu(grad) * act, dim=1, keepdim=True))
+    return _normalize_cam(cam)
+
+
+def _layercam_from(act: torch.Tensor, grad: torch.Tensor) -> np.ndarray:
+    """Layer-CAM: ReLU(gradient) * activation 을 채널 방향으로 합산 (activation 에는 ReLU 미적용)."""
+    if grad.shape[2:] != act.shape[2:]:
+        grad = F.interpolate(grad, size=act.shape[2:], mode='bilinear', align_corners=False)
+
+    cam = F.relu(torch.sum(F.relu(grad) * act, dim=1, keepdim=True)).squeeze()
+    if cam.dim() == 0:
+        cam = cam.unsqueeze(0)
+    cam_np: np.ndarray = cam.cpu().numpy()
+
+    cam_min = cam_np.min()
+    cam_max = cam_np.max()
+    if cam_max > cam_min:
+        cam_np = (cam_np - cam_min) / (cam_max - cam_min + 1e-8)
     else:
-        # 직접 접근
-        if hasattr(model, layer_name):
-            target_layer = getattr(model, layer_name)
-    
+        print(f'      ⚠️ Layer-CAM: 모든 값이 동일합니다 (값={cam_min:.6f})')
+        cam_np = np.ones_like(cam_np) * 0.5  # 중간값으로 설정하여 히트맵이 보이도록
+
+    if cam_np.max() < 0.01:
+        print(f'      ⚠️ Layer-CAM: 히트맵 값이 너무 작습니다 (max={cam_np.max():.6f})')
+        cam_np = cam_np * (0.3 / (cam_np.max() + 1e-8))  # 최소 0.3까지 스케일
+    return cam_np
+
+
+_CAM_FORMULAS = {
+    'gradcam': _gradcam_from,
+    'gradcam_plus': _gradcam_plus_from,
+    'layercam': _layercam_from,
+}
+
+
+def _compute_cams(
+    model: nn.Module,
+    input_tensor: torch.Tensor,
+    target_class: int,
+    methods: List[str],
+    layer_name: str | None = None,
+    precision: str | None = None,
+) -> Dict[str, np.ndarray]:
+    """forward/backward 한 번으로 얻은 activation·gradient 를 요청된 CAM 방식들이 공유한다.
+
+    gradient 는 대상 레이어 출력까지만 계산하므로 파라미터 gradient 는 만들지 않는다.
+    bf16 정밀도에서도 forward 만 autocast 로 실행하고, CAM 수식은 fp32 로 계산한다.
+    """
+    if not methods:
+        return {}
+
+    model.eval()
+    target_layer = _find_target_layer(model, layer_name)
     if target_layer is None:
-        print('⚠️ Grad-CAM: target layer를 찾을 수 없습니다. layer4를 찾을 수 없습니다.')
-        return None
-    
-    # Hook 등록
-    forward_handle = target_layer.register_forward_hook(forward_hook)
-    backward_handle = target_layer.register_backward_hook(backward_hook)
-    
+        print(f'⚠️ CAM: target layer({layer_name or getattr(model, "cam_target_layer", "layer4")})를 찾을 수 없습니다.')
+        return {}
+
+    activations: List[torch.Tensor] = []
+    handle = target_layer.register_forward_hook(lambda module, input, output: activations.append(output))
     try:
-        # Forward pass
-        input_tensor.requires_grad_(True)
-        output = model(input_tensor)
-        
-        # Target class에 대한 gradient 계산
-        model.zero_grad()
-        target_output = output[0, target_class]
-        target_output.backward()
-        
-        # Gradient와 activation 가져오기
-        if len(gradients) == 0 or len(activations) == 0:
-            return None
-        
-        grad = gradients[0]
-        act = activations[0]
-        
-        # Gradient의 global average pooling
-        weights = torch.mean(grad, dim=(2, 3), keepdim=True)
-        
-        # Weighted combination of activation maps
-        cam = torch.sum(weights * act, dim=1, keepdim=True)
-        cam = F.relu(cam)
-        
-        # Normalize
-        cam_np: np.ndarray = cam.squeeze().cpu().detach().numpy()
-        cam_np = cam_np - cam_np.min()
-        cam_np = cam_np / (cam_np.max() + 1e-8)
-
-        return cam_np
-        
+        with torch.enable_grad():
+            # 백본 파라미터가 고정된 체크포인트에서도 graph 가 만들어지도록 입력 쪽에서 grad 를 켠다
+            with autocast(precision or _precision, device):
+                output = model(input_tensor.detach().requires_grad_(True))
+            if not activations:
+                return {}
+            act = activations[0]
+            grad = torch.autograd.grad(output[0, target_class], act)[0]
     finally:
-        # Hook 제거
-        forward_handle.remove()
-        backward_handle.remove()
-        input_tensor.requires_grad_(False)
+        handle.remove()
 
+    act = act.detach().float()
+    grad = grad.float()
+    cams: Dict[str, np.ndarray] = {}
+    for method in methods:
+        try:
+            cams[method] = _CAM_FORMULAS[method](act, grad)
+        except Exception as e:
+            print(f'❌ {method} 생성 중 오류: {str(e)}')
+    return cams
 
-def _generate_gradcam_plus(model: nn.Module, input_tensor: torch.Tensor, target_class: int, layer_name: str = 'layer4') -> np.ndarray | None:
+
+def _generate_gradcam(model: nn.Module, input_tensor: torch.Tensor, target_class: int, layer_name: str | None = None) -> np.ndarray | None:
+    """Grad-CAM 히트맵을 생성한다."""
+    return _compute_cams(model, input_tensor, target_class, ['gradcam'], layer_name).get('gradcam')
+
+
+def _generate_gradcam_plus(model: nn.Module, input_tensor: torch.Tensor, target_class: int, layer_name: str | None = None) -> np.ndarray | None:
     """Grad-CAM++ 히트맵을 생성한다."""
-    model.eval()
-    
-    gradients = []
-    activations = []
-    
-    def backward_hook(module, grad_input, grad_output):
-        gradients.append(grad_output[0])
-    
-    def forward_hook(module, input, output):
-        activations.append(output)
-    
-    # 타겟 레이어 찾기
-    target_layer = None
-    if hasattr(model, 'backbone'):
-        if hasattr(model.backbone, layer_name):
-            target_layer = getattr(model.backbone, layer_name)
-        elif hasattr(model.backbone, 'layer4'):
-            target_layer = model.backbone.layer4
-    else:
-        if hasattr(model, layer_name):
-            target_layer = getattr(model, layer_name)
-    
-    if target_layer is None:
-        print('⚠️ Grad-CAM++: target layer를 찾을 수 없습니다.')
-        return None
-    
-    forward_handle = target_layer.register_forward_hook(forward_hook)
-    backward_handle = target_layer.register_backward_hook(backward_hook)
-    
-    try:
-        input_tensor.requires_grad_(True)
-        output = model(input_tensor)
-        
-        model.zero_grad()
-        target_output = output[0, target_class]
-        target_output.backward()
-        
-        if len(gradients) == 0 or len(activations) == 0:
-            return None
-        
-        grad = gradients[0]
-        act = activations[0]
-        
-        # Grad-CAM++: 올바른 alpha 계산 공식
-        # alpha_ij^kc = (grad_ij^kc)^2 / (2 * (grad_ij^kc)^2 + sum_ab(act_ab^kc * grad_ab^kc))
-        grad_squared = grad.pow(2)
-        grad_sum = torch.sum(act * grad, dim=(2, 3), keepdim=True)
-        alpha = grad_squared / (2 * grad_squared + grad_sum + 1e-8)
-        alpha = F.relu(alpha)
-        
-        # Weighted combination: sum over spatial dimensions
-        cam = torch.sum(alpha * F.relu(grad) * act, dim=1, keepdim=True)
-        cam = F.relu(cam)
-
-        cam_np: np.ndarray = cam.squeeze().cpu().detach().numpy()
-        cam_np = cam_np - cam_np.min()
-        cam_np = cam_np / (cam_np.max() + 1e-8)
-
-        return cam_np
-        
-    finally:
-        forward_handle.remove()
-        backward_handle.remove()
-        input_tensor.requires_grad_(False)
+    return _compute_cams(model, input_tensor, target_class, ['gradcam_plus'], layer_name).get('gradcam_plus')
 
 
-def _generate_layercam(model: nn.Module, input_tensor: torch.Tensor, target_class: int, layer_name: str = 'layer4') -> np.ndarray | None:
+def _generate_layercam(model: nn.Module, input_tensor: torch.Tensor, target_class: int, layer_name: str | None = None) -> np.ndarray | None:
     """Layer-CAM 히트맵을 생성한다."""
-    model.eval()
-    
-    gradients = []
-    activations = []
-    
-    def backward_hook(module, grad_input, grad_output):
-        if grad_output[0] is not None:
-            gradients.append(grad_output[0].clone())
-    
-    def forward_hook(module, input, output):
-        activations.append(output.clone())
-    
-    # 타겟 레이어 찾기
-    target_layer = None
-    if hasattr(model, 'backbone'):
-        if hasattr(model.backbone, layer_name):
-            target_layer = getattr(model.backbone, layer_name)
-        elif hasattr(model.backbone, 'layer4'):
-            target_layer = model.backbone.layer4
-    else:
-        if hasattr(model, layer_name):
-            target_layer = getattr(model, layer_name)
-    
-    if target_layer is None:
-        print('⚠️ Layer-CAM: target layer를 찾을 수 없습니다.')
-        return None
-    
-    forward_handle = target_layer.register_forward_hook(forward_hook)
-    backward_handle = target_layer.register_backward_hook(backward_hook)
-    
-    try:
-        input_tensor.requires_grad_(True)
-        output = model(input_tensor)
-        
-        model.zero_grad()
-        target_output = output[0, target_class]
-        target_output.backward(retain_graph=False)
-        
-        if len(gradients) == 0 or len(activations) == 0:
-            print('⚠️ Layer-CAM: gradient 또는 activation을 가져올 수 없습니다.')
-            return None
-        
-        grad = gradients[0]
-        act = activations[0]
-        
-        # Shape 확인 및 디버깅
-        if grad.shape != act.shape:
-            print(f'⚠️ Layer-CAM: gradient shape {grad.shape} != activation shape {act.shape}')
-            # Shape이 다르면 activation shape에 맞춰 gradient를 조정
-            if grad.shape[2:] != act.shape[2:]:
-                grad = F.interpolate(grad, size=act.shape[2:], mode='bilinear', align_corners=False)
-        
-        # Layer-CAM 알고리즘: 
-        # 1. Gradient의 양수 부분만 사용 (ReLU on gradient)
-        # 2. Activation에는 ReLU를 적용하지 않음 (원본 사용)
-        # 3. Gradient와 activation을 element-wise 곱
-        # 4. 채널별로 합산
-        # 5. 최종 결과에 ReLU 적용
-        
-        # Gradient에만 ReLU 적용 (양수 부분만 사용)
-        grad_positive = F.relu(grad)
-        
-        # Activation은 원본 그대로 사용 (ReLU 적용하지 않음)
-        # Layer-CAM은 activation의 음수 값도 중요할 수 있음
-        
-        # 디버깅: gradient와 activation의 통계 정보 출력
-        print(f'    📊 Layer-CAM 디버깅:')
-        print(f'      - Gradient shape: {grad.shape}, min={grad.min().item():.6f}, max={grad.max().item():.6f}, mean={grad.mean().item():.6f}')
-        print(f'      - Gradient (positive) min={grad_positive.min().item():.6f}, max={grad_positive.max().item():.6f}, mean={grad_positive.mean().item():.6f}')
-        print(f'      - Activation shape: {act.shape}, min={act.min().item():.6f}, max={act.max().item():.6f}, mean={act.mean().item():.6f}')
-        
-        # Element-wise 곱셈: ReLU(gradient) * activation
-        # 이렇게 하면 gradient가 양수인 영역에서만 activation이 강조됨
-        cam = grad_positive * act
-        
-        print(f'      - CAM (before sum) shape: {cam.shape}, min={cam.min().item():.6f}, max={cam.max().item():.6f}, mean={cam.mean().item():.6f}')
-        
-        # 채널 차원(dim=1)을 따라 합산하여 공간적 히트맵 생성
-        cam = torch.sum(cam, dim=1, keepdim=True)
-        # 최종 결과에만 ReLU 적용
-        cam = F.relu(cam)
-        
-        print(f'      - CAM (after sum) shape: {cam.shape}, min={cam.min().item():.6f}, max={cam.max().item():.6f}, mean={cam.mean().item():.6f}')
-        
-        # 배치 차원 제거 및 numpy 변환
-        if cam.dim() > 2:
-            cam = cam.squeeze()
-        if cam.dim() == 0:
-            cam = cam.unsqueeze(0)
-        cam = cam.cpu().detach().numpy()
-        
-        # 정규화
-        cam_min = cam.min()
-        cam_max = cam.max()
-        if cam_max > cam_min:
-            cam = (cam - cam_min) / (cam_max - cam_min + 1e-8)
-        else:
-            print(f'      ⚠️ Layer-CAM: 모든 값이 동일합니다 (값={cam_min:.6f})')
-            cam = np.ones_like(cam) * 0.5  # 중간값으로 설정하여 히트맵이 보이도록
-        
-        print(f'      - CAM (normalized) min={cam.min():.6f}, max={cam.max():.6f}, mean={cam.mean():.6f}')
-        
-        # 최소값 확인 (디버깅)
-        if cam.max() < 0.01:
-            print(f'      ⚠️ Layer-CAM: 히트맵 값이 너무 작습니다 (max={cam.max():.6f})')
-            # 히트맵이 너무 작으면 최소한의 가시성을 위해 스케일 조정
-            cam = cam * (0.3 / (cam.max() + 1e-8))  # 최소 0.3까지 스케일
-        
-        return cam
-        
-    except Exception as e:
-        print(f'❌ Layer-CAM 생성 중 오류: {str(e)}')
-        import traceback
-        traceback.print_exc()
-        return None
-    finally:
-        forward_handle.remove()
-        backward_handle.remove()
-        input_tensor.requires_grad_(False)
+    return _compute_cams(model, input_tensor, target_class, ['layercam'], layer_name).get('layercam')
 
 
-def _save_gradcam_image(original_image: Image.Image, gradcam: np.ndarray, mask: torch.Tensor, output_path: Path) -> Path:
-    """Grad-CAM 히트맵을 원본 이미지에 오버레이하여 저장한다."""
-    # 원본 이미지를 numpy 배열로 변환
-    original_image_resized = original_image.resize((224, 224))
-    img_array = np.array(original_image_resized)
-    
-    # Grad-CAM을 원본 이미지 크기로 리사이즈
-    gradcam_resized = cv2.resize(gradcam, (img_array.shape[1], img_array.shape[0]))
-    gradcam_uint8 = (255 * gradcam_resized).astype(np.uint8)
+def _data_uri(data: bytes, media_type: str) -> str:
+    return f'data:{media_type};base64,' + base64.b64encode(data).decode('ascii')
 
-    # 히트맵 생성 (Jet colormap)
-    heatmap = cv2.applyColorMap(gradcam_uint8, cv2.COLORMAP_JET)
-    heatmap = cv2.cvtColor(heatmap, cv2.COLOR_BGR2RGB)
-    
-    # 원본 이미지와 히트맵 오버레이 (0.4 투명도), 그레이 스케일 처리
-    if len(img_array.shape) == 2:
-        img_array = cv2.cvtColor(img_array, cv2.COLOR_GRAY2RGB)
 
-    # 마스크를 numpy로 변환 및 리사이즈
-    mask_np = mask.squeeze().cpu().numpy()
-    mask_resized = cv2.resize(mask_np, (224, 224), interpolation=cv2.INTER_NEAREST)
-    
-    overlayed = cv2.addWeighted(img_array, 0.6, heatmap, 0.4, 0)
+# CAM 방식 이름 → 응답 필드
+_CAM_FIELDS = {
+    'gradcam': 'gradcam_path',
+    'gradcam_plus': 'gradcam_plus_path',
+    'layercam': 'layercam_path',
+}
 
-    # 마스크 영역만 오버레이, 나머지는 원본 유지
-    result = img_array.copy()
-    mask_bool = mask_resized > 0.5
-    result[mask_bool] = overlayed[mask_bool]
-    
-    # 이미지 저장
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    Image.fromarray(overlayed).save(output_path)
-    
-    return output_path
 
+def _reuse_near_duplicate(
+    perceptual_hash: int,
+    patient_id: str | None,
+    cam_methods: List[str] | None,
+    ctx: PipelineContext,
+) -> Dict[str, Any] | None:
+    """근접 중복 이전 진단의 결과를 복사해 돌려준다.
 
-def predict(image_path: Path) -> Dict[str, Any]:
-    """이미지를 예측한다 (분할 → 분류 파이프라인)."""
-    import time
+    모델 버전이 다르거나, 이번 요청에 필요한 CAM 을 이전 진단에서 만들지 않았거나
+    CAM 저장소에서 이미 밀려났으면 None (정상 추론).
+    """
+    index = get_near_duplicate_index()
+    match = index.find(perceptual_hash, patient_id) if index is not None else None
+    if match is None:
+        return None
+    entry, distance = match
+    previous = entry.result
+    if previous.get('model_version') != get_model_version():
+        return None
+    methods, cam_skip_reason = get_cam_policy().decide(cam_methods, previous['predicted_class'], previous['confidence'])
+    if not set(methods) <= set(previous.get('cam_methods', [])):
+        return None
 
+    fields = [_CAM_FIELDS[m] for m in methods]
+    inline = get_settings().cam_inline
+    cam_store = get_cam_store()
+    cam_paths: Dict[str, str] = {}
+    for field in fields:
+        url = previous['cam_urls'].get(field)
+        key = url.rsplit('/', 1)[-1] if url else None
+        # LRU/TTL 로 지워진 CAM 의 URL 을 돌려주면 404 가 된다
+        data = cam_store.read(key) if key is not None and inline else None
+        if key is None or not cam_store.contains(key) or (inline and data is None):
+            metrics.inc('near_duplicate.cam_evicted')
+            return None
+        cam_paths[field] = _data_uri(data, media_type_for(key)) if inline else url
+
+    # 색인에는 REUSED_FIELDS 만 있으므로 임베딩은 복사되지 않는다 (중복 기록이 유사 증례 색인에 다시 들어가지 않도록)
+    result = dict(previous)
+    result.update(cam_paths)
+    result.update(
+        cam_urls={field: url for field, url in previous['cam_urls'].items() if field in fields},
+        cam_methods=methods,
+        cam_skip_reason=cam_skip_reason,
+        duplicate_of=entry.inference_id,
+        duplicate_distance=distance,
+    )
+    metrics.inc('near_duplicate.reused')
+    print(f'♻️ 근접 중복 이미지 (해밍 거리 {distance}) → 진단 {entry.inference_id} 결과 재사용\n')
+    return result
+
+
+@dataclass
+class _PreparedImage:
+    """디코딩까지 끝난 입력 하나. 배치 추론(predict_batch)은 여러 장을 모아 모델을 한 번에 실행한다."""
+    ctx: PipelineContext
+    started: float
+    content_hash: str
+    model_version: str
+    original_image: Image.Image
+    resized_image: Image.Image
+    perceptual_hash: int
+    cam_methods: List[str] | None
+
+
+def _prepare(
+    image: ImageSource,
+    ctx: PipelineContext,
+    cam_methods: List[str] | None,
+    patient_id: str | None,
+) -> _PreparedImage | Dict[str, Any]:
+    """읽기 + 디코딩 + 해시. 근접 중복이면 재사용한 결과 dict 를 돌려준다."""
     total_start = time.time()
-
-    if _segmentation_model is None or _classification_model is None:
-        load_model()
+    ctx.check()  # 대기열에서 기다리는 동안 취소/만료되었을 수 있음
 
     print(f'\n{"="*60}')
-    print(f'🔍 이미지 예측 시작: {image_path}')
+    data = image.read_bytes() if isinstance(image, Path) else image
+    print(f'🔍 이미지 예측 시작: {image if isinstance(image, Path) else f"업로드 {len(data):,} bytes"}')
     print(f'   Device: {device}')
     print(f'   CUDA available: {torch.cuda.is_available()}')
     print(f'{"="*60}\n')
 
-    # CAM 생성 여부 (환경 변수로 제어, 기본값: True로 변경)
-    enable_cam = os.getenv('ENABLE_GRADCAM', 'true').lower() == 'true'
-    print(f'🎯 GradCAM 모드: {"활성화" if enable_cam else "비활성화"}\n')
+    # 이미지 내용 해시 (CAM 저장소 키, 추론 기록에 사용)
+    content_hash = hashlib.sha256(data).hexdigest()
 
     # 1. Segmentation용 이미지 전처리 (정규화 O)
-    step_start = time.time()
     print(f'[단계 1/5] Segmentation 전처리 시작...')
-    image_tensor = _preprocess_image(image_path)
-    step_time = time.time() - step_start
-    print(f'  ✓ Segmentation 전처리 완료: {step_time:.4f}초')
+    with ctx.stage('decode'):
+        original_image = _decode_image(data)
+        resized_image = original_image.resize(INPUT_SIZE, Image.BILINEAR)
+        perceptual_hash = dhash(resized_image)
+    print(f'  ✓ 디코딩 완료: {ctx.timings["decode"]:.4f}초 (dHash {perceptual_hash:016x})')
+
+    # 빈 이미지/노출 이상은 분할 전에 거른다
+    gate = get_quality_gate()
+    if gate.enabled:
+        with ctx.stage('quality_image'):
+            verdict = gate.check_image(np.asarray(resized_image))
+        if not verdict.passed:
+            return _unsuitable(ctx, total_start, content_hash, perceptual_hash, verdict)
+
+    reused = _reuse_near_duplicate(perceptual_hash, patient_id, cam_methods, ctx)
+    if reused is not None:
+        reused.update(image_hash=content_hash, perceptual_hash=perceptual_hash, timings=ctx.timings)
+        ctx.timings['total'] = time.time() - total_start
+        return reused
+
+    return _PreparedImage(
+        ctx=ctx,
+        started=total_start,
+        content_hash=content_hash,
+        model_version=get_model_version(),
+        original_image=original_image,
+        resized_image=resized_image,
+        perceptual_hash=perceptual_hash,
+        cam_methods=cam_methods,
+    )
+
+
+def _check_mask(prepared: _PreparedImage, mask: torch.Tensor) -> Dict[str, Any] | None:
+    """분할 결과가 폐로 보기 어려우면 unsuitable 결과 dict, 통과하면 None."""
+    gate = get_quality_gate()
+    if not gate.enabled:
+        return None
+    with prepared.ctx.stage('quality_mask'):
+        verdict = gate.check_mask(mask.squeeze().cpu().numpy())
+    if verdict.passed:
+        return None
+    return _unsuitable(prepared.ctx, prepared.started, prepared.content_hash, prepared.perceptual_hash, verdict)
+
+
+def _unsuitable(
+    ctx: PipelineContext,
+    started: float,
+    content_hash: str,
+    perceptual_hash: int,
+    verdict: QualityVerdict,
+) -> Dict[str, Any]:
+    """품질 검사에서 거절된 입력의 결과 (분류/CAM 없음, 사유와 측정값 포함)."""
+    ctx.timings['total'] = time.time() - started
+    print(f'  ⛔ 품질 검사 거절 ({verdict.stage}): {", ".join(verdict.reasons)} {verdict.stats}')
+    print(f'     분류/CAM 생략 (총 {ctx.timings["total"]:.4f}초)\n')
+    return {
+        'unsuitable': True,
+        'quality': verdict.to_dict(),
+        'confidence': 0.0,
+        'predicted_class': None,
+        'findings': [],
+        'recommendations': verdict.messages() + ['흉부 X-ray 정면(PA/AP) 영상으로 다시 촬영하거나 업로드해 주세요.'],
+        'ai_notes': '영상 품질 검사에서 판독하기 어려운 이미지로 판정되어 분류를 생략했습니다.',
+        'probabilities': {},
+        'image_hash': content_hash,
+        'perceptual_hash': perceptual_hash,
+        'model_version': get_model_version(),
+        'precision': _precision,
+        'embedding': None,
+        'timings': ctx.timings,
+        'cam_urls': {},
+        'cam_methods': [],
+        'cam_skip_reason': 'unsuitable',
+    }
+
+
+def predict(
+    image: ImageSource,
+    context: PipelineContext | None = None,
+    cam_methods: List[str] | None = None,
+    patient_id: str | None = None,
+) -> Dict[str, Any]:
+    """이미지를 예측한다 (분할 → 분류 파이프라인).
+
+    image 는 파일 경로 또는 업로드된 바이트이며, 어느 쪽이든 한 번만 읽고 디코딩한다.
+    cam_methods 가 None 이면 서버 CAM 정책(app/services/cam_policy.py)에 따라 생성 여부를 정한다.
+    최근 같은 환자(또는 시간 창)의 거의 같은 이미지가 있으면 그 결과를 재사용한다 (app/services/near_duplicate.py).
+    context 가 취소되거나 마감 시각이 지나면 다음 단계 시작 시 PipelineCancelled 를 던진다.
+    """
+    ctx = context or PipelineContext()
+    if _segmentation_model is None or _classification_model is None:
+        load_model()
+
+    prepared = _prepare(image, ctx, cam_methods, patient_id)
+    if isinstance(prepared, dict):
+        return prepared
+
+    buffers = _get_buffers()
+    with ctx.stage('preprocess'):
+        image_tensor = _preprocess_image(prepared.resized_image, buffers)
+    print(f'  ✓ Segmentation 전처리 완료: {ctx.timings["preprocess"]:.4f}초')
     print(f'     - Image tensor shape: {image_tensor.shape}\n')
 
     # 2. 폐 영역 분할
-    step_start = time.time()
     print(f'[단계 2/5] 폐 영역 분할 시작...')
-    mask = _segment_lung(image_tensor)
-    step_time = time.time() - step_start
-    print(f'  ✓ 폐 영역 분할 완료: {step_time:.4f}초')
+    with ctx.stage('segmentation'):
+        mask = _segment_lung(image_tensor)
+    print(f'  ✓ 폐 영역 분할 완료: {ctx.timings["segmentation"]:.4f}초')
     print(f'     - Mask shape: {mask.shape}\n')
 
+    rejected = _check_mask(prepared, mask)
+    if rejected is not None:
+        return rejected
+
     # 3. 원본 이미지에 마스크 적용 후 분류용 전처리
-    step_start = time.time()
     print(f'[단계 3/5] 분류 전처리 시작...')
-    segmented_tensor = _preprocess_for_classification(image_path, mask)
-    step_time = time.time() - step_start
-    print(f'  ✓ 분류 전처리 완료: {step_time:.4f}초')
+    with ctx.stage('classification_preprocess'):
+        segmented_tensor = _preprocess_for_classification(prepared.resized_image, mask, buffers)
+    print(f'  ✓ 분류 전처리 완료: {ctx.timings["classification_preprocess"]:.4f}초')
     print(f'     - Segmented tensor shape: {segmented_tensor.shape}\n')
 
     # 4. 분류 예측
-    step_start = time.time()
     print(f'[단계 4/5] 분류 예측 시작...')
-    segmented_tensor = segmented_tensor.to(device)
+    segmented_tensor = segmented_tensor.to(device, non_blocking=buffers is not None and buffers.pinned)
 
     assert _classification_model is not None
 
-    # CAM이 필요한 경우에만 requires_grad 활성화
-    if enable_cam:
-        print(f'     - 모드: GradCAM 활성화 (requires_grad=True)')
-        segmented_tensor.requires_grad_(True)
-        outputs = _classification_model(segmented_tensor)
-        probabilities = torch.softmax(outputs, dim=1).squeeze(0)
-    else:
-        print(f'     - 모드: 고속 추론 (inference_mode)')
-        with torch.inference_mode():  # 더 빠른 추론
-            outputs = _classification_model(segmented_tensor)
-            probabilities = torch.softmax(outputs, dim=1).squeeze(0)
+    with ctx.stage('classification'):
+        probabilities, embedding = _classify_with_embedding(segmented_tensor)
+
+    print(f'  ✓ 분류 예측 완료: {ctx.timings["classification"]:.4f}초')
+    print(f'     - Output shape: {tuple(probabilities.shape)} ({_precision})\n')
 
-    step_time = time.time() - step_start
-    print(f'  ✓ 분류 예측 완료: {step_time:.4f}초')
-    print(f'     - Output shape: {outputs.shape}\n')
+    return _finish(prepared, mask, segmented_tensor, probabilities, embedding)
+
+
+def predict_batch(
+    images: List[ImageSource],
+    contexts: List[PipelineContext] | None = None,
+    cam_methods: List[List[str] | None] | None = None,
+    patient_ids: List[str | None] | None = None,
+) -> List[Dict[str, Any] | Exception]:
+    """여러 이미지를 한 번에 예측한다 (작업 큐 워커용).
+
+    분할과 분류 forward 는 배치 하나로 실행하고, CAM 과 결과 구성은 이미지별로 한다.
+    결과는 입력 순서대로이며, 실패한 이미지 자리에는 예외 객체가 들어간다 (나머지는 계속 처리).
+    """
+    count = len(images)
+    contexts = contexts or [PipelineContext() for _ in range(count)]
+    cam_methods = cam_methods or [None] * count
+    patient_ids = patient_ids or [None] * count
+    if _segmentation_model is None or _classification_model is None:
+        load_model()
+
+    results: List[Dict[str, Any] | Exception | None] = [None] * count
+    pending: List[Tuple[int, _PreparedImage]] = []
+    for i in range(count):
+        try:
+            prepared = _prepare(images[i], contexts[i], cam_methods[i], patient_ids[i])
+        except Exception as e:
+            results[i] = e
+            continue
+        if isinstance(prepared, dict):
+            results[i] = prepared
+        else:
+            pending.append((i, prepared))
+    if not pending:
+        return results  # type: ignore[return-value]
+
+    print(f'[단계 2-4/5] 배치 분할 + 분류 ({len(pending)}장)...')
+    batch_start = time.perf_counter()
+    buffers = _get_buffers(len(pending))
+    if buffers is None:
+        image_batch = torch.cat([_preprocess_image(prepared.resized_image) for _, prepared in pending])
+    else:
+        # 배치 크기만큼 미리 잡아 둔 버퍼의 앞쪽 칸을 채운다 (torch.cat 복사 없음)
+        for j, (_, prepared) in enumerate(pending):
+            _preprocess_image(prepared.resized_image, buffers, j)
+        image_batch = buffers.segmentation_input[:len(pending)]
+    masks = _segment_lung(image_batch)
+
+    # 품질 검사를 통과한 이미지만 분류한다 (j: 분할 배치 위치)
+    accepted: List[Tuple[int, int, _PreparedImage]] = []
+    for j, (i, prepared) in enumerate(pending):
+        rejected = _check_mask(prepared, masks[j:j + 1])
+        if rejected is not None:
+            prepared.ctx.timings['batch_inference'] = time.perf_counter() - batch_start
+            results[i] = rejected
+        else:
+            accepted.append((j, i, prepared))
+    if not accepted:
+        return results  # type: ignore[return-value]
+
+    if buffers is None:
+        segmented_batch = torch.cat([
+            _preprocess_for_classification(prepared.resized_image, masks[j:j + 1])
+            for j, _, prepared in accepted
+        ]).to(device)
+    else:
+        for k, (j, _, prepared) in enumerate(accepted):
+            _preprocess_for_classification(prepared.resized_image, masks[j:j + 1], buffers, k)
+        segmented_batch = buffers.classification_input[:len(accepted)].to(device, non_blocking=buffers.pinned)
+    probabilities, embeddings = _classify_batch(segmented_batch)
+    batch_time = time.perf_counter() - batch_start
+    print(f'  ✓ 배치 추론 완료: {batch_time:.4f}초 (장당 {batch_time / len(pending):.4f}초)\n')
+
+    for k, (j, i, prepared) in enumerate(accepted):
+        prepared.ctx.timings['batch_inference'] = batch_time
+        try:
+            results[i] = _finish(prepared, masks[j:j + 1], segmented_batch[k:k + 1], probabilities[k], embeddings[k])
+        except Exception as e:
+            results[i] = e
+    return results  # type: ignore[return-value]
+
+
+def _finish(
+    prepared: _PreparedImage,
+    mask: torch.Tensor,
+    segmented_tensor: torch.Tensor,
+    probabilities: torch.Tensor,
+    embedding: np.ndarray,
+) -> Dict[str, Any]:
+    """분류 결과로 CAM 생성, 권고 문구, 결과 dict 를 만든다 (단계 5/5)."""
+    assert _classification_model is not None
+    ctx = prepared.ctx
+    content_hash, model_version = prepared.content_hash, prepared.model_version
+    original_image, perceptual_hash = prepared.original_image, prepared.perceptual_hash
+    cam_methods, total_start = prepared.cam_methods, prepared.started
 
     probs = probabilities.detach().cpu().numpy()
+    probabilities_by_class = {name: float(probs[i]) for i, name in enumerate(CLASS_NAMES)}
     top_indices = probs.argsort()[::-1][:3]
     
     findings = []
@@ -710,76 +988,61 @@ def predict(image_path: Path) -> Dict[str, Any]:
     predicted_class = CLASS_NAMES[top_indices[0]]
     predicted_class_idx = top_indices[0]
     
-    # 5. GradCAM 생성 (선택적 - ENABLE_GRADCAM 환경변수로 제어)
-    gradcam_relative_path = None
-    gradcam_plus_relative_path = None
-    layercam_relative_path = None
-
-    print(f'[단계 5/5] GradCAM 생성...')
-    if enable_cam:
-        try:
-            cam_start = time.time()
-            print(f'     - GradCAM 활성화, 생성 시작...')
-
-            original_image = Image.open(image_path).convert('RGB')
-
-            gradcam_base = os.getenv('GRADCAM_STORAGE_PATH', str(BASE_DIR / 'Final_Back' / 'fastapi' / 'app' / 'static'))
-            static_dir = Path(gradcam_base)
-            gradcam_dir = static_dir / 'gradcam'
-            gradcam_dir.mkdir(parents=True, exist_ok=True)
-
-            # Grad-CAM 생성
-            gradcam = _generate_gradcam(
-                _classification_model,
-                segmented_tensor,
-                target_class=predicted_class_idx,
-                layer_name='layer4'
-            )
-            if gradcam is not None:
-                gradcam_filename = f"gradcam_{image_path.stem}_{predicted_class_idx}.png"
-                gradcam_path = gradcam_dir / gradcam_filename
-                _save_gradcam_image(original_image, gradcam, mask, gradcam_path)
-                gradcam_relative_path = f"/static/gradcam/{gradcam_filename}"
-                print(f'     ✓ Grad-CAM 저장: {gradcam_filename}')
-
-            # Grad-CAM++ 생성
-            gradcam_plus = _generate_gradcam_plus(
-                _classification_model,
-                segmented_tensor,
-                target_class=predicted_class_idx,
-                layer_name='layer4'
-            )
-            if gradcam_plus is not None:
-                gradcam_plus_filename = f"gradcam_plus_{image_path.stem}_{predicted_class_idx}.png"
-                gradcam_plus_path = gradcam_dir / gradcam_plus_filename
-                _save_gradcam_image(original_image, gradcam_plus, mask, gradcam_plus_path)
-                gradcam_plus_relative_path = f"/static/gradcam/{gradcam_plus_filename}"
-                print(f'     ✓ Grad-CAM++ 저장: {gradcam_plus_filename}')
-
-            # Layer-CAM 생성
-            layercam = _generate_layercam(
-                _classification_model,
-                segmented_tensor,
-                target_class=predicted_class_idx,
-                layer_name='layer4'
-            )
-            if layercam is not None:
-                layercam_filename = f"layercam_{image_path.stem}_{predicted_class_idx}.png"
-                layercam_path = gradcam_dir / layercam_filename
-                _save_gradcam_image(original_image, layercam, mask, layercam_path)
-                layercam_relative_path = f"/static/gradcam/{layercam_filename}"
-                print(f'     ✓ Layer-CAM 저장: {layercam_filename}')
-
-            cam_time = time.time() - cam_start
-            print(f'  ✓ 모든 CAM 생성 완료: {cam_time:.4f}초\n')
-
-        except Exception as e:
-            print(f'  ⚠️ CAM 생성 중 오류 발생: {str(e)}')
-            import traceback
-            traceback.print_exc()
+    # 5. CAM 생성 (요청 파라미터 또는 서버 정책에 따라)
+    methods, cam_skip_reason = get_cam_policy().decide(cam_methods, predicted_class, confidence)
+    cam_paths: Dict[str, str] = {}
+    cam_urls: Dict[str, str] = {}
+
+    print(f'[단계 5/5] CAM 생성...')
+    if methods:
+        with ctx.stage('cam'):
+            try:
+                print(f'     - 생성 대상: {", ".join(methods)}')
+
+                # 이미지 내용 + CAM 방식 + 모델 버전 + 렌더링 설정으로 저장 키 결정 (동일 이미지는 파일 공유)
+                settings = get_settings()
+                cam_store = get_cam_store()
+                _, image_ext, media_type = IMAGE_FORMATS[settings.cam_image_format]
+                render = render_digest(settings.cam_image_format, settings.cam_image_quality, settings.cam_mask_blend)
+                missing: List[str] = []
+
+                for method in methods:
+                    key = make_key(content_hash, method, model_version, image_ext, render)
+                    url = cam_store.get_url(key)
+                    if url is None:
+                        missing.append(method)
+                        continue
+                    field = _CAM_FIELDS[method]
+                    data = cam_store.read(key) if settings.cam_inline else None
+                    cam_paths[field] = _data_uri(data, media_type) if data is not None else url
+                    cam_urls[field] = url
+                    print(f'     ✓ {method} 저장소 재사용: {key}')
+
+                # 저장소에 없던 CAM들은 한 번의 backward 로 계산한 뒤 한 번에 오버레이 렌더링
+                cams = _compute_cams(_classification_model, segmented_tensor, int(predicted_class_idx), missing)
+                if cams:
+                    # cv2 를 쓰는 렌더러는 CAM 을 실제로 만들 때만 불러온다
+                    from app.services.cam_render import CamOverlayRenderer
+
+                    metrics.inc('cam.generated', len(cams))
+                    renderer = CamOverlayRenderer(original_image, mask, mask_blend=settings.cam_mask_blend)
+                    for method, overlay in renderer.render(cams).items():
+                        key = make_key(content_hash, method, model_version, image_ext, render)
+                        field = _CAM_FIELDS[method]
+                        data = encode_image(overlay, settings.cam_image_format, settings.cam_image_quality)
+                        url = cam_store.put(key, data)
+                        cam_paths[field] = _data_uri(data, media_type) if settings.cam_inline else url
+                        cam_urls[field] = url
+                        print(f'     ✓ {method} 저장: {key} ({len(data):,} bytes)')
+
+            except Exception as e:
+                print(f'  ⚠️ CAM 생성 중 오류 발생: {str(e)}')
+                import traceback
+                traceback.print_exc()
+        print(f'  ✓ 모든 CAM 생성 완료: {ctx.timings["cam"]:.4f}초\n')
     else:
-        print(f'     - GradCAM 비활성화 (환경변수 ENABLE_GRADCAM=false)')
-        print(f'  ✓ GradCAM 건너뜀: 0.0000초\n')
+        metrics.inc(f'cam.skipped.{cam_skip_reason}')
+        print(f'     - CAM 생략 ({cam_skip_reason})\n')
     
     recommendations = []
     if confidence > 0.7:
@@ -799,20 +1062,26 @@ def predict(image_path: Path) -> Dict[str, Any]:
         'predicted_class': predicted_class,
         'findings': findings,
         'recommendations': recommendations,
-        'ai_notes': 'UNet 기반 폐 분할 + ResNet50 기반 COVID-19 분류 모델 추론 결과입니다.'
+        'ai_notes': f'UNet 기반 폐 분할 + {CLASSIFIER_BACKBONES[_classification_model.backbone_name].label} 기반 COVID-19 분류 모델 추론 결과입니다.',
+        'probabilities': probabilities_by_class,
+        'image_hash': content_hash,
+        'perceptual_hash': perceptual_hash,
+        'model_version': model_version,
+        'precision': _precision,
+        'embedding': embedding,
+        'timings': ctx.timings,
+        'cam_urls': cam_urls,
+        'cam_methods': [m for m in methods if _CAM_FIELDS[m] in cam_urls],
+        'cam_skip_reason': cam_skip_reason,
     }
     
-    if gradcam_relative_path:
-        result['gradcam_path'] = gradcam_relative_path
-    if gradcam_plus_relative_path:
-        result['gradcam_plus_path'] = gradcam_plus_relative_path
-    if layercam_relative_path:
-        result['layercam_path'] = layercam_relative_path
+    result.update(cam_paths)
     
     if torch.cuda.is_available():
         torch.cuda.empty_cache()
 
     total_time = time.time() - total_start
+    ctx.timings['total'] = total_time
     print(f'\n{"="*60}')
     print(f'✅ 전체 예측 완료!')
     print(f'   총 소요 시간: {total_time:.4f}초 ({total_time:.2f}초)')
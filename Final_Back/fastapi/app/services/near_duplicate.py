@@ -0,0 +1,199 @@
+"""지각 해시(dHash) 기반 재업로드 감지와 이전 추론 재사용.
+
+같은 필름을 다시 내보내거나 재압축·약간 잘라서 올리면 내용 해시(sha256)는 달라지지만
+224x224 로 줄인 이미지의 dHash 는 거의 같다. predict() 는 디코딩 직후 dHash 를 계산해
+이 색인(BK-tree, 해밍 거리)에서 NEAR_DUPLICATE_THRESHOLD 이내의 최근 추론을 찾고,
+있으면 모델을 실행하지 않고 그 결과와 CAM 을 재사용한다 (응답에 near_duplicate 로 표시).
+색인 항목에는 재사용에 필요한 필드(REUSED_FIELDS)만 보관하고, CAM 은 저장소 URL 로만 가리킨다.
+
+  - scope=patient: 같은 patient_id 의 기록만 (patient_id 가 없으면 재사용하지 않음)
+  - scope=window: 시간 창 안의 모든 기록
+색인은 프로세스 메모리에만 있으며, 오래된 항목은 조회 시 건너뛰고 절반 이상 쌓이면 트리를 다시 만든다.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import get_settings
+
+HASH_SIZE = 8  # 64비트 dHash
+NEAR_DUPLICATE_SCOPES = ('patient', 'window')
+# 재사용에 필요한 predict() 결과 필드만 보관한다 (임베딩, CAM_INLINE 의 data URI 같은 큰 값은 제외)
+REUSED_FIELDS = (
+    'predicted_class',
+    'confidence',
+    'probabilities',
+    'findings',
+    'recommendations',
+    'ai_notes',
+    'model_version',
+    'precision',
+    'cam_urls',
+    'cam_methods',
+)
+
+
+def dhash(image: Image.Image, hash_size: int = HASH_SIZE) -> int:
+    """가로 방향 밝기 기울기 부호로 만든 hash_size^2 비트 해시 (행 우선, 첫 비트가 최상위)."""
+    gray = np.asarray(image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR))
+    bits = (gray[:, :-1] > gray[:, 1:]).ravel()
+    # packbits 는 8비트 단위로 뒤를 0 으로 채우므로 그만큼 되돌린다
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big') >> (-bits.size % 8)
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+@dataclass
+class DuplicateEntry:
+    inference_id: str
+    phash: int
+    patient_id: str | None
+    result: Dict[str, Any]
+    created_at: float = field(default_factory=time.time)
+
+
+class _Node:
+    __slots__ = ('phash', 'entries', 'children')
+
+    def __init__(self, phash: int):
+        self.phash = phash
+        self.entries: List[DuplicateEntry] = []
+        self.children: Dict[int, _Node] = {}
+
+
+class BKTree:
+    """해밍 거리 BK-tree. 같은 해시의 항목은 한 노드에 모은다."""
+
+    def __init__(self) -> None:
+        self.root: _Node | None = None
+        self.size = 0
+
+    def insert(self, entry: DuplicateEntry) -> None:
+        self.size += 1
+        if self.root is None:
+            self.root = _Node(entry.phash)
+            self.root.entries.append(entry)
+            return
+        node = self.root
+        while True:
+            distance = hamming(entry.phash, node.phash)
+            if distance == 0:
+                node.entries.append(entry)
+                return
+            child = node.children.get(distance)
+            if child is None:
+                child = node.children[distance] = _Node(entry.phash)
+                child.entries.append(entry)
+                return
+            node = child
+
+    def search(self, phash: int, threshold: int) -> List[Tuple[DuplicateEntry, int]]:
+        """해밍 거리 threshold 이내의 모든 항목 (삼각 부등식으로 가지치기)."""
+        found: List[Tuple[DuplicateEntry, int]] = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(phash, node.phash)
+            if distance <= threshold:
+                found.extend((entry, distance) for entry in node.entries)
+            for edge, child in node.children.items():
+                if distance - threshold <= edge <= distance + threshold:
+                    stack.append(child)
+        return found
+
+    def entries(self) -> List[DuplicateEntry]:
+        result: List[DuplicateEntry] = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            result.extend(node.entries)
+            stack.extend(node.children.values())
+        return result
+
+
+class NearDuplicateIndex:
+    def __init__(self, threshold: int, window_seconds: float, scope: str = 'patient', max_entries: int = 5000):
+        if scope not in NEAR_DUPLICATE_SCOPES:
+            raise ValueError(f'알 수 없는 NEAR_DUPLICATE_SCOPE: {scope} (가능: {", ".join(NEAR_DUPLICATE_SCOPES)})')
+        self.threshold = threshold
+        self.window_seconds = window_seconds
+        self.scope = scope
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._tree = BKTree()
+        self.hits = 0
+        self.misses = 0
+
+    def _live(self, entry: DuplicateEntry, now: float) -> bool:
+        return now - entry.created_at <= self.window_seconds
+
+    def add(self, inference_id: str, phash: int, patient_id: str | None, result: Dict[str, Any]) -> None:
+        kept = {key: result[key] for key in REUSED_FIELDS if key in result}
+        entry = DuplicateEntry(inference_id, phash, patient_id or None, kept)
+        with self._lock:
+            self._tree.insert(entry)
+            if self._tree.size > self.max_entries:
+                self._compact()
+
+    def _compact(self) -> None:
+        """만료 항목을 버리고, 그래도 많으면 오래된 것부터 버린 뒤 트리를 다시 만든다."""
+        now = time.time()
+        live = sorted((e for e in self._tree.entries() if self._live(e, now)), key=lambda e: e.created_at)
+        tree = BKTree()
+        for entry in live[-(self.max_entries // 2):]:
+            tree.insert(entry)
+        self._tree = tree
+
+    def find(self, phash: int, patient_id: str | None) -> Tuple[DuplicateEntry, int] | None:
+        """조건에 맞는 가장 가까운(같으면 가장 최근) 기록."""
+        if self.scope == 'patient' and not patient_id:
+            return None
+        now = time.time()
+        with self._lock:
+            candidates = [
+                (entry, distance)
+                for entry, distance in self._tree.search(phash, self.threshold)
+                if self._live(entry, now) and (self.scope == 'window' or entry.patient_id == patient_id)
+            ]
+        if not candidates:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return min(candidates, key=lambda item: (item[1], -item[0].created_at))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'entries': self._tree.size,
+            'threshold': self.threshold,
+            'window_seconds': self.window_seconds,
+            'scope': self.scope,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+@lru_cache
+def get_near_duplicate_index() -> NearDuplicateIndex | None:
+    """NEAR_DUPLICATE_REUSE=false 이면 None."""
+    settings = get_settings()
+    if not settings.near_duplicate_reuse:
+        return None
+    from app.services import metrics
+
+    index = NearDuplicateIndex(
+        threshold=settings.near_duplicate_threshold,
+        window_seconds=settings.near_duplicate_window_seconds,
+        scope=settings.near_duplicate_scope,
+        max_entries=settings.near_duplicate_max_entries,
+    )
+    metrics.register_collector('near_duplicate', index.stats)
+    return index
@@ -0,0 +1,359 @@
+"""기준(fp32 eager) 출력 기록과 최적화된 추론 경로의 parity 비교.
+
+record: 이미지 묶음에 대해 기준 파이프라인의 폐 마스크, 4-클래스 확률, CAM 3종을 golden 디렉터리에 저장한다.
+compare: 다른 파이프라인 설정(bf16, predict() 전체 경로 등)을 golden 과 비교해
+마스크 IoU, 확률 차이, top-1 일치율, CAM 상관계수를 계산하고 허용치를 넘으면 종료 코드 1 을 반환한다.
+
+    python -m app.services.parity record --images ./samples --output parity_golden
+    python -m app.services.parity compare --golden parity_golden --pipeline bf16
+    # 데이터 없이 CPU 에서 (MODEL_STANDIN=random 은 고정 시드 가중치)
+    MODEL_STANDIN=random python -m app.services.parity record --synthetic 8 --output /tmp/golden
+    MODEL_STANDIN=random python -m app.services.parity compare --golden /tmp/golden --pipeline predict
+    python -m pytest tests/test_parity.py   # 위 과정 + 일부러 어긋난 출력이 실패하는지
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import sys
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+# 파이프라인 한 번의 출력: mask(bool HxW), probabilities(CLASS_NAMES 순서), target(CAM 대상 클래스), cams
+Capture = Dict[str, Any]
+# (이미지 바이트, CAM 방식, CAM 대상 클래스) → Capture. 비교할 수 없는 항목은 None 으로 둔다
+Pipeline = Callable[[bytes, List[str], int | None], Capture]
+
+_PIPELINES: Dict[str, Pipeline] = {}
+_IMAGE_SUFFIXES = {'.png', '.jpg', '.jpeg', '.bmp', '.webp'}
+REFERENCE_PIPELINE = 'fp32'
+
+
+def register_pipeline(name: str) -> Callable[[Pipeline], Pipeline]:
+    """비교 대상 파이프라인 등록 (새 최적화 경로는 여기에 추가해 golden 과 비교한다)."""
+    def decorator(fn: Pipeline) -> Pipeline:
+        _PIPELINES[name] = fn
+        return fn
+    return decorator
+
+
+def available_pipelines() -> List[str]:
+    return sorted(_PIPELINES)
+
+
+def run_pipeline(data: bytes, precision: str, methods: List[str], target: int | None = None) -> Capture:
+    """predict() 와 같은 단계를 지정한 정밀도로 실행하고 중간 결과를 돌려준다."""
+    from app.services import model as model_service
+
+    image = model_service._decode_image(data)
+    mask = model_service._segment_lung(model_service._preprocess_image(image), precision=precision)
+    segmented = model_service._preprocess_for_classification(image, mask).to(model_service.device)
+    probabilities = model_service._classify(segmented, precision=precision).cpu().numpy()
+    # CAM 은 기준과 같은 클래스(기준의 top-1)에 대해 비교한다
+    target = int(probabilities.argmax()) if target is None else target
+    cams = model_service._compute_cams(
+        model_service._classification_model, segmented, target, methods, precision=precision,
+    )
+    return {'mask': mask.squeeze().cpu().numpy() > 0.5, 'probabilities': probabilities, 'target': target, 'cams': cams}
+
+
+@register_pipeline('fp32')
+def _fp32_pipeline(data: bytes, methods: List[str], target: int | None) -> Capture:
+    return run_pipeline(data, 'fp32', methods, target)
+
+
+@register_pipeline('bf16')
+def _bf16_pipeline(data: bytes, methods: List[str], target: int | None) -> Capture:
+    return run_pipeline(data, 'bf16', methods, target)
+
+
+def _service_probabilities(result: Dict[str, Any]) -> np.ndarray:
+    from app.services import model as model_service
+
+    if result.get('unsuitable'):
+        # 품질 검사에서 거절되면 분류를 하지 않으므로 비교할 확률이 없다
+        reasons = ', '.join(result['quality']['reasons'])
+        raise RuntimeError(f'품질 검사에서 거절된 입력입니다 ({reasons}). QUALITY_GATE=false 로 비교하세요.')
+    return np.array([result['probabilities'][name] for name in model_service.CLASS_NAMES], dtype=np.float32)
+
+
+@register_pipeline('predict')
+def _predict_pipeline(data: bytes, methods: List[str], target: int | None) -> Capture:
+    """서비스 경로 전체 (현재 설정의 정밀도, 스레드 등). 마스크와 CAM 배열은 노출되지 않아 확률만 비교한다."""
+    from app.services import model as model_service
+
+    result = model_service.predict(data, cam_methods=[])
+    probabilities = _service_probabilities(result)
+    return {'mask': None, 'probabilities': probabilities, 'target': target, 'cams': {}}
+
+
+@register_pipeline('batch')
+def _batch_pipeline(data: bytes, methods: List[str], target: int | None) -> Capture:
+    """작업 큐 워커의 배치 경로 (predict_batch). 같은 이미지를 배치 4장으로 넣고 첫 장의 확률을 비교한다."""
+    from app.services import model as model_service
+
+    result = model_service.predict_batch([data] * 4, cam_methods=[[]] * 4)[0]
+    if isinstance(result, Exception):
+        raise result
+    probabilities = _service_probabilities(result)
+    return {'mask': None, 'probabilities': probabilities, 'target': target, 'cams': {}}
+
+
+# ==========================================
+# 지표
+# ==========================================
+
+def mask_iou(a: np.ndarray, b: np.ndarray) -> float:
+    union = np.logical_or(a, b).sum()
+    return float(np.logical_and(a, b).sum() / union) if union else 1.0
+
+
+def cam_correlation(a: np.ndarray, b: np.ndarray) -> float:
+    """두 CAM 의 피어슨 상관계수 (둘 다 상수면 같을 때 1)."""
+    a, b = a.ravel().astype(np.float64), b.ravel().astype(np.float64)
+    if a.std() == 0 or b.std() == 0:
+        return 1.0 if np.allclose(a, b) else 0.0
+    return float(np.corrcoef(a, b)[0, 1])
+
+
+def summarize(pairs: List[Tuple[Capture, Capture]], methods: List[str]) -> Dict[str, Any]:
+    """(기준, 후보) 쌍들의 집계: top-1 일치율, 확률 차이, 최소 마스크 IoU, CAM 상관계수."""
+    top1_agree = 0
+    prob_deltas: List[float] = []
+    mask_ious: List[float] = []
+    cam_corr: Dict[str, List[float]] = {method: [] for method in methods}
+    for reference, candidate in pairs:
+        top1_agree += int(reference['probabilities'].argmax() == candidate['probabilities'].argmax())
+        prob_deltas.append(float(np.abs(reference['probabilities'] - candidate['probabilities']).max()))
+        if reference.get('mask') is not None and candidate.get('mask') is not None:
+            mask_ious.append(mask_iou(reference['mask'], candidate['mask']))
+        for method in methods:
+            if method in reference['cams'] and method in candidate['cams']:
+                cam_corr[method].append(cam_correlation(reference['cams'][method], candidate['cams'][method]))
+
+    count = len(pairs)
+    return {
+        'images': count,
+        'top1_agreement': top1_agree / count if count else None,
+        'max_probability_delta': max(prob_deltas, default=None),
+        'mean_probability_delta': float(np.mean(prob_deltas)) if prob_deltas else None,
+        'min_mask_iou': min(mask_ious, default=None),
+        'cam_correlation': {
+            method: {'min': min(values), 'mean': float(np.mean(values))} if values else None
+            for method, values in cam_corr.items()
+        },
+    }
+
+
+@dataclass(frozen=True)
+class Tolerances:
+    min_mask_iou: float = 0.98
+    max_probability_delta: float = 0.02
+    min_top1_agreement: float = 0.99
+    min_cam_correlation: float = 0.98
+
+    def violations(self, summary: Dict[str, Any]) -> List[str]:
+        """허용치를 벗어난 항목 (비교할 수 없었던 항목은 건너뛴다)."""
+        found = []
+        if summary['top1_agreement'] is not None and summary['top1_agreement'] < self.min_top1_agreement:
+            found.append(f"top-1 일치율 {summary['top1_agreement']:.4f} < {self.min_top1_agreement}")
+        if summary['max_probability_delta'] is not None and summary['max_probability_delta'] > self.max_probability_delta:
+            found.append(f"최대 확률 차이 {summary['max_probability_delta']:.5f} > {self.max_probability_delta}")
+        if summary['min_mask_iou'] is not None and summary['min_mask_iou'] < self.min_mask_iou:
+            found.append(f"최소 마스크 IoU {summary['min_mask_iou']:.4f} < {self.min_mask_iou}")
+        for method, corr in summary['cam_correlation'].items():
+            if corr and corr['min'] < self.min_cam_correlation:
+                found.append(f"{method} CAM 상관계수 {corr['min']:.4f} < {self.min_cam_correlation}")
+        return found
+
+
+# ==========================================
+# golden 기록 / 비교
+# ==========================================
+
+def _quiet() -> contextlib.AbstractContextManager:
+    # predict() 단계별 로그는 보고서 출력을 가리므로 숨긴다
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def record(images: List[Tuple[str, bytes]], output: Path, methods: List[str] | None = None) -> Dict[str, Any]:
+    """기준 파이프라인 출력과 입력 이미지를 output 에 저장한다 (manifest.json, golden.npz, inputs/)."""
+    import torch
+
+    from app.services import model as model_service
+    from app.services.cam_policy import CAM_METHOD_NAMES
+
+    methods = list(methods or CAM_METHOD_NAMES)
+    with _quiet():
+        model_service.load_model()
+    (output / 'inputs').mkdir(parents=True, exist_ok=True)
+
+    arrays: Dict[str, np.ndarray] = {}
+    entries = []
+    for index, (name, data) in enumerate(images):
+        with _quiet():
+            capture = _PIPELINES[REFERENCE_PIPELINE](data, methods, None)
+        key = f'{index:04d}'
+        input_name = f'{key}{Path(name).suffix.lower() or ".png"}'
+        (output / 'inputs' / input_name).write_bytes(data)
+        arrays[f'{key}__mask'] = np.packbits(capture['mask'])
+        arrays[f'{key}__probabilities'] = capture['probabilities'].astype(np.float32)
+        for method, cam in capture['cams'].items():
+            arrays[f'{key}__cam__{method}'] = cam.astype(np.float32)
+        entries.append({
+            'key': key,
+            'source': name,
+            'input': input_name,
+            'sha256': hashlib.sha256(data).hexdigest(),
+            'mask_shape': list(capture['mask'].shape),
+            'target': capture['target'],
+        })
+
+    np.savez_compressed(output / 'golden.npz', **arrays)
+    manifest = {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'pipeline': REFERENCE_PIPELINE,
+        'model_version': model_service.get_model_version(),
+        'torch_version': torch.__version__,
+        'methods': methods,
+        'images': entries,
+    }
+    (output / 'manifest.json').write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding='utf-8')
+    return manifest
+
+
+def load_golden(golden: Path) -> Tuple[Dict[str, Any], List[Tuple[bytes, Capture]]]:
+    manifest = json.loads((golden / 'manifest.json').read_text(encoding='utf-8'))
+    arrays = np.load(golden / 'golden.npz')
+    cases = []
+    for entry in manifest['images']:
+        key = entry['key']
+        size = int(np.prod(entry['mask_shape']))
+        capture = {
+            'mask': np.unpackbits(arrays[f'{key}__mask'])[:size].reshape(entry['mask_shape']).astype(bool),
+            'probabilities': arrays[f'{key}__probabilities'],
+            'target': entry['target'],
+            'cams': {m: arrays[f'{key}__cam__{m}'] for m in manifest['methods'] if f'{key}__cam__{m}' in arrays},
+        }
+        cases.append(((golden / 'inputs' / entry['input']).read_bytes(), capture))
+    return manifest, cases
+
+
+def compare(golden: Path, pipeline: str, tolerances: Tolerances, allow_model_change: bool = False) -> Dict[str, Any]:
+    """golden 과 pipeline 출력을 비교한 보고서 (ok=False 면 허용치 위반)."""
+    from app.services import model as model_service
+
+    if pipeline not in _PIPELINES:
+        raise ValueError(f'알 수 없는 파이프라인: {pipeline} (가능: {", ".join(available_pipelines())})')
+    manifest, cases = load_golden(golden)
+    with _quiet():
+        model_service.load_model()
+
+    pairs = []
+    for data, reference in cases:
+        with _quiet():
+            pairs.append((reference, _PIPELINES[pipeline](data, manifest['methods'], reference['target'])))
+
+    summary = summarize(pairs, manifest['methods'])
+    violations = tolerances.violations(summary)
+    model_version = model_service.get_model_version()
+    if model_version != manifest['model_version'] and not allow_model_change:
+        violations.insert(0, f"모델 버전 불일치: golden {manifest['model_version']} / 현재 {model_version}")
+    return {
+        'golden': str(golden),
+        'pipeline': pipeline,
+        'golden_model_version': manifest['model_version'],
+        'model_version': model_version,
+        'tolerances': asdict(tolerances),
+        **summary,
+        'violations': violations,
+        'ok': not violations,
+    }
+
+
+def load_images(directory: Path | None, limit: int, synthetic: int) -> List[Tuple[str, bytes]]:
+    """디렉터리의 이미지, 또는 디렉터리가 없으면 고정 시드 합성 이미지 (이름, 바이트)."""
+    if directory is not None:
+        paths = sorted(p for p in directory.rglob('*') if p.suffix.lower() in _IMAGE_SUFFIXES)
+        return [(str(p.relative_to(directory)), p.read_bytes()) for p in paths[:limit]]
+
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    images = []
+    for index in range(synthetic):
+        size = 512
+        yy, xx = np.mgrid[0:size, 0:size]
+        base = 128 + 60 * np.sin(xx / size * np.pi) * np.cos(yy / size * np.pi)
+        gray = np.clip(base + rng.normal(0, 20, (size, size)), 0, 255).astype(np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(gray).convert('RGB').save(buffer, format='PNG')
+        images.append((f'synthetic_{index:03d}.png', buffer.getvalue()))
+    return images
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    def fmt(value: float | None, spec: str) -> str:
+        return format(value, spec) if value is not None else '-'
+
+    print(f"🔬 {report['pipeline']} vs golden ({report['golden']}, 이미지 {report['images']}장, 모델 {report['model_version']})")
+    print(f"   top-1 일치율:     {fmt(report['top1_agreement'], '.2%')}")
+    print(f"   최대 확률 차이:   {fmt(report['max_probability_delta'], '.5f')} (평균 {fmt(report['mean_probability_delta'], '.5f')})")
+    print(f"   최소 마스크 IoU:  {fmt(report['min_mask_iou'], '.4f')}")
+    for method, corr in report['cam_correlation'].items():
+        if corr:
+            print(f"   CAM 상관계수 {method:<13} 최소 {corr['min']:.4f} / 평균 {corr['mean']:.4f}")
+    for violation in report['violations']:
+        print(f'❌ {violation}')
+    if report['ok']:
+        print('✅ 허용치 이내')
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='추론 경로 golden parity 검사')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = sub.add_parser('record', help='기준(fp32 eager) 출력 기록')
+    record_parser.add_argument('--images', type=Path, default=None, help='이미지 디렉터리 (생략 시 합성 이미지)')
+    record_parser.add_argument('--limit', type=int, default=100)
+    record_parser.add_argument('--synthetic', type=int, default=8)
+    record_parser.add_argument('--output', type=Path, required=True)
+
+    compare_parser = sub.add_parser('compare', help='golden 과 비교 (허용치 위반 시 종료 코드 1)')
+    compare_parser.add_argument('--golden', type=Path, required=True)
+    compare_parser.add_argument('--pipeline', default='predict', help=f'비교할 경로 ({", ".join(available_pipelines())})')
+    compare_parser.add_argument('--min-mask-iou', type=float, default=Tolerances.min_mask_iou)
+    compare_parser.add_argument('--max-probability-delta', type=float, default=Tolerances.max_probability_delta)
+    compare_parser.add_argument('--min-top1-agreement', type=float, default=Tolerances.min_top1_agreement)
+    compare_parser.add_argument('--min-cam-correlation', type=float, default=Tolerances.min_cam_correlation)
+    compare_parser.add_argument('--allow-model-change', action='store_true', help='모델 버전이 달라도 비교')
+    compare_parser.add_argument('--json', action='store_true', help='결과를 JSON 으로 출력')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        images = load_images(args.images, args.limit, args.synthetic)
+        if not images:
+            print('❌ 기록할 이미지가 없습니다.')
+            return 1
+        manifest = record(images, args.output)
+        print(f"✅ golden 기록: {args.output} (이미지 {len(manifest['images'])}장, 모델 {manifest['model_version']})")
+        return 0
+
+    tolerances = Tolerances(args.min_mask_iou, args.max_probability_delta, args.min_top1_agreement, args.min_cam_correlation)
+    report = compare(args.golden, args.pipeline, tolerances, args.allow_model_change)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        _print_report(report)
+    return 0 if report['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""추론 결과의 write-behind 저장.
+
+`/diagnose` 응답 경로에서는 `record_inference()`로 큐에 넣기만 하고,
+백그라운드 태스크가 배치 크기 또는 시간 간격 기준으로 `insert_many`를 호출한다.
+큐가 가득 차면 응답을 지연시키지 않고 기록을 버린다 (dropped 카운터로 확인).
+"""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from bson import ObjectId
+
+from app.core.config import get_settings
+from app.services import metrics
+from app.services.similarity import encode_embedding
+
+_STOP = object()
+
+
+class DiagnosisWriter:
+    """비동기 배치 writer. collection은 motor 컬렉션 또는 `insert_many`를 가진 대용품."""
+
+    def __init__(self, batch_size: int = 50, flush_interval: float = 1.0, max_queue: int = 10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+
+        self._collection: Any = None
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, collection: Any) -> None:
+        self._collection = collection
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run(), name='diagnosis-writer')
+
+    def enqueue(self, document: Dict[str, Any]) -> bool:
+        """문서를 큐에 넣는다. 큐가 없거나 가득 차면 False."""
+        if self._queue is None or not self.running:
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait(document)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    async def _run(self) -> None:
+        assert self._queue is not None
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+
+            batch: List[Dict[str, Any]] = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            await self._collection.insert_many(batch, ordered=False)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.failed += len(batch)
+            print(f'⚠️ 추론 기록 저장 실패 ({len(batch)}건): {e}')
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """남은 기록을 모두 flush하고 종료한다."""
+        if self._queue is None or self._task is None:
+            return
+        if self.running:
+            try:
+                await asyncio.wait_for(self._queue.put(_STOP), timeout)
+                await asyncio.wait_for(asyncio.shield(self._task), timeout)
+            except asyncio.TimeoutError:
+                print(f'⚠️ 추론 기록 flush 시간 초과 (남은 {self._queue.qsize()}건)')
+                self._task.cancel()
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'batches': self.batches,
+        }
+
+
+writer: DiagnosisWriter | None = None
+
+
+def start_diagnosis_writer(collection: Any) -> DiagnosisWriter:
+    global writer
+    settings = get_settings()
+    writer = DiagnosisWriter(
+        batch_size=settings.diagnosis_write_batch_size,
+        flush_interval=settings.diagnosis_write_interval,
+        max_queue=settings.diagnosis_write_queue_size,
+    )
+    writer.start(collection)
+    metrics.register_collector('diagnosis_writer', writer.stats)
+    return writer
+
+
+async def stop_diagnosis_writer() -> None:
+    if writer is not None:
+        await writer.stop()
+        print(f'🛑 추론 기록 writer 종료 (저장 {writer.written}건, 실패 {writer.failed}건)')
+
+
+def build_inference_record(
+    inference_result: Dict[str, Any],
+    patient_id: str | None = None,
+    notes: str | None = None,
+) -> Dict[str, Any]:
+    """predict() 결과로 ai_diagnoses 문서를 만든다 (_id는 응답의 inference_id로 사용).
+
+    작업 큐 모드의 결과는 작업 _id 를 그대로 쓴다 (워커의 근접 중복 색인과 같은 id).
+    """
+    record = {
+        '_id': inference_result.get('job_id') or ObjectId(),
+        'patient_id': patient_id or None,
+        'image_hash': inference_result.get('image_hash'),
+        'model_version': inference_result.get('model_version'),
+        'precision': inference_result.get('precision'),
+        'predicted_class': inference_result.get('predicted_class'),
+        'confidence': inference_result.get('confidence'),
+        'probabilities': inference_result.get('probabilities', {}),
+        'timings': inference_result.get('timings', {}),
+        'cam_paths': inference_result.get('cam_urls', {}),
+        'notes': notes,
+        'created_at': datetime.now(timezone.utc),
+    }
+    if inference_result.get('perceptual_hash') is not None:
+        # 64비트 dHash (BSON int64 범위를 넘을 수 있어 16자리 16진수 문자열)
+        record['perceptual_hash'] = f"{inference_result['perceptual_hash']:016x}"
+    if inference_result.get('duplicate_of') is not None:
+        record['duplicate_of'] = ObjectId(inference_result['duplicate_of'])
+        record['duplicate_distance'] = inference_result.get('duplicate_distance')
+    if inference_result.get('unsuitable'):
+        # 품질 검사에서 거절된 입력 (predicted_class 없음, 사유와 측정값)
+        record['unsuitable'] = True
+        record['quality'] = inference_result.get('quality')
+    if inference_result.get('embedding') is not None:
+        # 유사 증례 검색용 (app/services/similarity.py), 목록 조회 projection 에는 포함되지 않음
+        record['embedding'] = encode_embedding(inference_result['embedding'])
+    return record
+
+
+def record_inference(document: Dict[str, Any]) -> bool:
+    """추론 기록을 write-behind 큐에 넣는다 (응답 지연 없음)."""
+    if writer is None:
+        return False
+    return writer.enqueue(document)
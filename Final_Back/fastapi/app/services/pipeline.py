@@ -0,0 +1,88 @@
+"""predict() 파이프라인 한 번의 실행 상태."""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Callable, ContextManager, Dict, Iterator, List
+
+# 단계 이름을 받아 해당 단계를 감싸는 context manager 를 돌려주는 훅 (메모리 계측, 프로파일러 등)
+StageHook = Callable[[str], ContextManager[None]]
+
+
+class PipelineCancelled(RuntimeError):
+    """마감 시간 경과 또는 클라이언트 연결 종료로 추론을 중단했다."""
+
+    def __init__(self, reason: str):
+        super().__init__(f'추론이 중단되었습니다 ({reason})')
+        self.reason = reason
+
+
+class InvalidImage(ValueError):
+    """업로드된 데이터를 이미지로 디코딩할 수 없다."""
+
+
+def parse_deadline(deadline_ms: str | None = None, timeout_ms: str | None = None) -> float | None:
+    """절대 마감 시각(epoch ms) 또는 남은 시간(ms)을 time.monotonic() 기준 마감 시각으로 변환한다.
+
+    둘 다 주어지면 더 이른 쪽을 사용한다. 형식이 잘못되었거나 nan/inf 면 ValueError.
+    """
+    candidates = []
+    if deadline_ms:
+        candidates.append(time.monotonic() + _finite_ms(deadline_ms) / 1000 - time.time())
+    if timeout_ms:
+        candidates.append(time.monotonic() + _finite_ms(timeout_ms) / 1000)
+    return min(candidates) if candidates else None
+
+
+def _finite_ms(value: str) -> float:
+    ms = float(value)
+    if not math.isfinite(ms):
+        raise ValueError(f'마감 시간은 유한한 숫자(ms)여야 합니다: {value}')
+    return ms
+
+
+class PipelineContext:
+    """단계별 소요 시간, 마감 시각, 취소 여부 등 요청 단위 정보를 모은다.
+
+    predict() 는 스레드 풀에서 실행되므로 취소는 이벤트 루프 쪽에서 `cancel()`로 표시하고,
+    파이프라인은 각 단계 시작 시 `check()`로 확인한다.
+    stage_hooks 에 등록된 훅은 모든 단계를 감싼다.
+    """
+
+    def __init__(self, deadline: float | None = None) -> None:
+        self.timings: Dict[str, float] = {}
+        self.deadline = deadline
+        self.stage_hooks: List[StageHook] = []
+        self._cancelled = threading.Event()
+        self._cancel_reason: str | None = None
+
+    def cancel(self, reason: str) -> None:
+        if not self._cancelled.is_set():
+            self._cancel_reason = reason
+            self._cancelled.set()
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def check(self) -> None:
+        """취소되었거나 마감 시각이 지났으면 PipelineCancelled 를 던진다."""
+        if self._cancelled.is_set():
+            raise PipelineCancelled(self._cancel_reason or 'cancelled')
+        if self.expired:
+            raise PipelineCancelled('deadline_exceeded')
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """with 블록의 소요 시간을 timings[name]에 기록한다 (시작 전에 취소 여부 확인)."""
+        self.check()
+        with ExitStack() as hooks:
+            for hook in self.stage_hooks:
+                hooks.enter_context(hook(name))
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.timings[name] = time.perf_counter() - start
@@ -0,0 +1,130 @@
+"""추론 정밀도(fp32 / bf16) 선택과 fp32 대비 parity 보고서.
+
+INFERENCE_PRECISION=bf16 이면 분할 모델, 분류 모델, CAM 용 forward 를
+torch.autocast(bfloat16)로 실행한다. CAM 수식 자체는 fp32 로 계산한다.
+CPU 가 bf16 연산을 네이티브로 지원하지 않으면(AVX512-BF16 / AMX 없음) 자동으로 fp32 로 돌아간다.
+
+    python -m app.services.precision report --images ./samples --limit 50
+    python -m app.services.precision report --synthetic 20 --json
+
+golden 출력과 허용치 기반 비교는 app/services/parity.py 참고.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, ContextManager, Dict, List
+
+import torch
+
+PRECISIONS = ('fp32', 'bf16')
+
+
+def _cpu_flags() -> set[str]:
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('flags'):
+                    return set(line.split(':', 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+
+def bf16_supported(device: torch.device) -> bool:
+    """해당 장치에서 bf16 연산이 네이티브로 빠르게 실행되는지."""
+    if device.type == 'cuda':
+        return torch.cuda.is_bf16_supported()
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return bool(_cpu_flags() & {'avx512_bf16', 'amx_bf16'})
+
+
+def resolve_precision(requested: str, device: torch.device) -> str:
+    """설정값을 실제로 사용할 정밀도로 바꾼다 (지원하지 않으면 fp32). 알 수 없는 값은 ValueError."""
+    requested = (requested or 'fp32').lower()
+    if requested not in PRECISIONS:
+        raise ValueError(f'알 수 없는 INFERENCE_PRECISION: {requested} (가능: {", ".join(PRECISIONS)})')
+    if requested == 'bf16' and not bf16_supported(device):
+        print(f'⚠️ {device.type} 에서 bf16 을 지원하지 않아 fp32 로 실행합니다.')
+        return 'fp32'
+    return requested
+
+
+def autocast(precision: str, device: torch.device) -> ContextManager[Any]:
+    """bf16 이면 autocast 블록, fp32 면 아무것도 하지 않는 블록."""
+    if precision == 'bf16':
+        return torch.autocast(device.type, dtype=torch.bfloat16)
+    return nullcontext()
+
+
+# ==========================================
+# fp32 대비 parity 보고서
+# ==========================================
+
+def parity_report(images: List[bytes], precision: str = 'bf16', methods: List[str] | None = None) -> Dict[str, Any]:
+    """fp32 결과를 기준으로 top-1 일치율, 최대 확률 차이, 마스크 IoU, CAM 상관계수를 계산한다."""
+    from app.services import model as model_service
+    from app.services.cam_policy import CAM_METHOD_NAMES
+    from app.services.parity import run_pipeline, summarize
+
+    model_service.load_model()
+    methods = list(methods or CAM_METHOD_NAMES)
+    pairs = []
+    for data in images:
+        reference = run_pipeline(data, 'fp32', methods)
+        pairs.append((reference, run_pipeline(data, precision, methods, target=reference['target'])))
+
+    return {
+        'precision': precision,
+        'device': str(model_service.device),
+        'native_bf16': bf16_supported(model_service.device),
+        'model_version': model_service.get_model_version(),
+        **summarize(pairs, methods),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='추론 정밀도 parity 보고서')
+    sub = parser.add_subparsers(dest='command', required=True)
+    report_parser = sub.add_parser('report', help='fp32 대비 bf16 결과 비교')
+    report_parser.add_argument('--images', type=Path, default=None, help='비교할 이미지 디렉터리 (생략 시 합성 이미지)')
+    report_parser.add_argument('--limit', type=int, default=100)
+    report_parser.add_argument('--synthetic', type=int, default=10, help='--images 가 없을 때 만들 합성 이미지 수')
+    report_parser.add_argument('--precision', default='bf16', choices=PRECISIONS)
+    report_parser.add_argument('--json', action='store_true', help='결과를 JSON 으로 출력')
+    args = parser.parse_args()
+
+    from app.services.parity import load_images
+
+    images = [data for _, data in load_images(args.images, args.limit, args.synthetic)]
+    if not images:
+        print('❌ 비교할 이미지가 없습니다.')
+        return 1
+
+    import contextlib
+    import io
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = parity_report(images, args.precision)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+
+    print(f"🔬 {report['precision']} vs fp32 ({report['device']}, native bf16: {report['native_bf16']}, "
+          f"모델 {report['model_version']}, 이미지 {report['images']}장)")
+    print(f"   top-1 일치율:     {report['top1_agreement']:.2%}")
+    print(f"   최대 확률 차이:   {report['max_probability_delta']:.5f} (평균 {report['mean_probability_delta']:.5f})")
+    print(f"   최소 마스크 IoU:  {report['min_mask_iou']:.4f}")
+    for method, corr in report['cam_correlation'].items():
+        if corr:
+            print(f"   CAM 상관계수 {method:<13} 최소 {corr['min']:.4f} / 평균 {corr['mean']:.4f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""요청 단위 torch.profiler 캡처.
+
+`/debug/profiler/arm`으로 다음 N건 또는 일정 시간 동안의 /diagnose 요청을 프로파일링한다.
+각 predict() 단계는 record_function('predict.<단계>')으로 표시되어 trace 에서 구분된다.
+결과는 PROFILE_DIR 에 `*.pt.trace.json`(Chrome trace, TensorBoard profiler 플러그인 호환)과
+연산자별 요약 `*.txt`로 저장된다. 비활성 상태에서는 armed 플래그 확인 외에 비용이 없다.
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List
+
+from app.core.config import get_settings
+from app.services import metrics
+from app.services.pipeline import PipelineContext
+
+TRACE_SUFFIX = '.pt.trace.json'
+_TRACE_NAME = re.compile(r'^[\w.-]+\.(pt\.trace\.json|txt)$')
+
+
+class ProfilerController:
+    def __init__(self, output_dir: Path, max_traces: int = 50):
+        self.output_dir = Path(output_dir)
+        self.max_traces = max_traces
+        self._lock = threading.Lock()
+        # 한 번에 하나의 요청만 프로파일링 (프로파일러는 프로세스 전역 상태)
+        self._busy = threading.Lock()
+        self._armed = False
+        # 남은 요청 수 / 종료 시각 (둘 다 있으면 먼저 도달하는 쪽에서 종료)
+        self._remaining: int | None = None
+        self._until: float | None = None
+        self.record_shapes = False
+        self.with_stack = False
+        self.captured = 0
+
+    @property
+    def armed(self) -> bool:
+        if self._armed and self._until is not None and time.monotonic() >= self._until:
+            self.disarm()
+        return self._armed
+
+    def arm(self, requests: int | None = None, seconds: float | None = None,
+            record_shapes: bool = False, with_stack: bool = False) -> Dict[str, Any]:
+        with self._lock:
+            self._remaining = requests if requests or seconds else 1
+            self._until = time.monotonic() + seconds if seconds else None
+            self._armed = True
+            self.record_shapes = record_shapes
+            self.with_stack = with_stack
+        print(f'🔬 프로파일러 활성화: 요청 {self._remaining or "-"}건 / {seconds or "-"}초')
+        return self.status()
+
+    def disarm(self) -> None:
+        with self._lock:
+            self._armed = False
+            self._remaining = None
+            self._until = None
+
+    def _claim(self) -> bool:
+        """이번 요청을 프로파일링할지 결정하고 남은 횟수를 줄인다."""
+        if not self.armed:
+            return False
+        with self._lock:
+            if not self._busy.acquire(blocking=False):
+                return False
+            if self._remaining is not None:
+                self._remaining -= 1
+                if self._remaining <= 0:
+                    self._armed = False
+                    self._remaining = None
+                    self._until = None
+            return True
+
+    @contextmanager
+    def profile(self, ctx: PipelineContext, label: str) -> Iterator[None]:
+        if not self._claim():
+            yield
+            return
+
+        import torch
+        from torch.profiler import ProfilerActivity, profile, record_function
+
+        @contextmanager
+        def stage_hook(name: str) -> Iterator[None]:
+            with record_function(f'predict.{name}'):
+                yield
+
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+
+        ctx.stage_hooks.append(stage_hook)
+        try:
+            with profile(activities=activities, record_shapes=self.record_shapes,
+                         with_stack=self.with_stack, profile_memory=True) as prof:
+                with record_function(f'predict.{label}'):
+                    yield
+            self._export(prof)
+        finally:
+            ctx.stage_hooks.remove(stage_hook)
+            self._busy.release()
+
+    def _export(self, prof: Any) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+        base = f'{os.getpid()}_{stamp}'
+        prof.export_chrome_trace(str(self.output_dir / f'{base}{TRACE_SUFFIX}'))
+        table = prof.key_averages().table(sort_by='self_cpu_time_total', row_limit=40)
+        (self.output_dir / f'{base}.txt').write_text(table, encoding='utf-8')
+        self.captured += 1
+        metrics.inc('profiler.captured')
+        print(f'🔬 프로파일 저장: {self.output_dir / (base + TRACE_SUFFIX)}')
+        self._prune()
+
+    def _prune(self) -> None:
+        traces = sorted(self.output_dir.glob(f'*{TRACE_SUFFIX}'), key=lambda p: p.stat().st_mtime)
+        for old in traces[:-self.max_traces] if len(traces) > self.max_traces else []:
+            old.unlink(missing_ok=True)
+            old.with_name(old.name[:-len(TRACE_SUFFIX)] + '.txt').unlink(missing_ok=True)
+
+    def wrap(self, fn: Callable[..., Any], ctx: PipelineContext) -> Callable[..., Any]:
+        """활성 상태일 때만 호출 측에서 감싼다 (비활성 시 원래 함수를 그대로 사용)."""
+        def profiled(*args: Any, **kwargs: Any) -> Any:
+            with self.profile(ctx, label=getattr(fn, '__name__', 'call')):
+                return fn(*args, **kwargs)
+        return profiled
+
+    def list_traces(self) -> List[Dict[str, Any]]:
+        if not self.output_dir.exists():
+            return []
+        files = sorted(self.output_dir.iterdir(), key=lambda p: p.stat().st_mtime, reverse=True)
+        return [
+            {
+                'name': path.name,
+                'size': path.stat().st_size,
+                'created_at': datetime.fromtimestamp(path.stat().st_mtime, timezone.utc).isoformat(),
+            }
+            for path in files
+            if _TRACE_NAME.match(path.name)
+        ]
+
+    def trace_path(self, name: str) -> Path | None:
+        """다운로드 가능한 trace 파일 경로 (이름 검증 후, 없으면 None)."""
+        if not _TRACE_NAME.match(name):
+            return None
+        path = self.output_dir / name
+        return path if path.is_file() else None
+
+    def status(self) -> Dict[str, Any]:
+        remaining_seconds = max(0.0, self._until - time.monotonic()) if self._until is not None else None
+        return {
+            'armed': self.armed,
+            'remaining_requests': self._remaining,
+            'remaining_seconds': remaining_seconds,
+            'record_shapes': self.record_shapes,
+            'with_stack': self.with_stack,
+            'captured': self.captured,
+            'output_dir': str(self.output_dir),
+        }
+
+
+controller = ProfilerController(get_settings().profile_dir)
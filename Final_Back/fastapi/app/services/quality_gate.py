@@ -0,0 +1,129 @@
+"""분류 전 영상 품질 검사 (흉부 X-ray 로 판독하기 어려운 입력 조기 거절).
+
+빈 업로드, 흉부가 아닌 사진, 뒤집힌 영상은 폐 분할 결과가 비어 있거나 조각나 있다.
+이런 입력에 분류 모델과 CAM 을 돌려도 의미 있는 결과가 나오지 않으므로 두 단계에서 거른다.
+
+  - image (분할 전): 224x224 흑백 기준 대비(표준편차)와 평균 밝기
+  - mask (분할 후): 폐 마스크 면적 비율, 일정 크기 이상 연결 요소 수,
+    가장 큰 두 요소(좌/우 폐)가 마스크에서 차지하는 비율
+
+거절된 입력은 분류/CAM 없이 unsuitable 결과(사유 + 측정값)를 돌려주고, 결과는 metrics 의
+quality_gate.* 카운터로 집계한다. 기준값은 QUALITY_* 환경 변수로 조정한다.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.services import metrics
+
+REASON_MESSAGES: Dict[str, str] = {
+    'low_contrast': '영상 대비가 거의 없습니다 (빈 이미지이거나 노출이 잘못되었을 수 있습니다).',
+    'too_dark': '영상이 지나치게 어둡습니다.',
+    'too_bright': '영상이 지나치게 밝습니다.',
+    'mask_too_small': '폐 영역이 거의 검출되지 않았습니다 (흉부 X-ray 가 아니거나 방향이 잘못되었을 수 있습니다).',
+    'mask_too_large': '폐 영역이 비정상적으로 넓게 검출되었습니다.',
+    'mask_fragmented': '폐 영역이 여러 조각으로 흩어져 검출되었습니다.',
+}
+
+
+@dataclass
+class QualityVerdict:
+    stage: str  # image | mask
+    reasons: List[str] = field(default_factory=list)
+    stats: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def passed(self) -> bool:
+        return not self.reasons
+
+    def messages(self) -> List[str]:
+        return [REASON_MESSAGES.get(reason, reason) for reason in self.reasons]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'stage': self.stage, 'reasons': list(self.reasons), 'stats': dict(self.stats)}
+
+
+@dataclass(frozen=True)
+class QualityGate:
+    enabled: bool = True
+    # 분할 전 (0~255 흑백)
+    min_contrast: float = 8.0
+    min_brightness: float = 10.0
+    max_brightness: float = 245.0
+    # 분할 후 (이미지 면적 대비 비율)
+    min_mask_area: float = 0.05
+    max_mask_area: float = 0.8
+    min_component_area: float = 0.005
+    max_components: int = 4
+    min_main_fraction: float = 0.8
+
+    @classmethod
+    def from_settings(cls) -> 'QualityGate':
+        settings = get_settings()
+        return cls(
+            enabled=settings.quality_gate,
+            min_contrast=settings.quality_min_contrast,
+            min_brightness=settings.quality_min_brightness,
+            max_brightness=settings.quality_max_brightness,
+            min_mask_area=settings.quality_min_mask_area,
+            max_mask_area=settings.quality_max_mask_area,
+            min_component_area=settings.quality_min_component_area,
+            max_components=settings.quality_max_components,
+            min_main_fraction=settings.quality_min_main_fraction,
+        )
+
+    def check_image(self, pixels: np.ndarray) -> QualityVerdict:
+        """RGB uint8 (HxWx3) 배열의 흑백 밝기 통계."""
+        gray = pixels.mean(axis=2, dtype=np.float32)
+        contrast, brightness = float(gray.std()), float(gray.mean())
+        verdict = QualityVerdict('image', stats={'contrast': contrast, 'brightness': brightness})
+        if contrast < self.min_contrast:
+            verdict.reasons.append('low_contrast')
+        if brightness < self.min_brightness:
+            verdict.reasons.append('too_dark')
+        elif brightness > self.max_brightness:
+            verdict.reasons.append('too_bright')
+        return _count(verdict)
+
+    def check_mask(self, mask: np.ndarray) -> QualityVerdict:
+        """0/1 폐 마스크 (HxW) 의 면적과 연결 요소."""
+        import cv2
+
+        binary = (mask > 0).astype(np.uint8)
+        total = binary.size
+        area = int(binary.sum())
+        verdict = QualityVerdict('mask', stats={'mask_area': area / total})
+        if area < self.min_mask_area * total:
+            verdict.reasons.append('mask_too_small')
+            return _count(verdict)
+        if area > self.max_mask_area * total:
+            verdict.reasons.append('mask_too_large')
+
+        count, _, component_stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        areas = np.sort(component_stats[1:count, cv2.CC_STAT_AREA])[::-1]
+        components = int((areas >= self.min_component_area * total).sum())
+        main_fraction = float(areas[:2].sum()) / area
+        verdict.stats.update(components=components, main_fraction=main_fraction)
+        if components > self.max_components or main_fraction < self.min_main_fraction:
+            verdict.reasons.append('mask_fragmented')
+        return _count(verdict)
+
+
+def _count(verdict: QualityVerdict) -> QualityVerdict:
+    if verdict.passed:
+        metrics.inc(f'quality_gate.{verdict.stage}.passed')
+    else:
+        metrics.inc(f'quality_gate.{verdict.stage}.rejected')
+        for reason in verdict.reasons:
+            metrics.inc(f'quality_gate.reason.{reason}')
+    return verdict
+
+
+@lru_cache
+def get_quality_gate() -> QualityGate:
+    return QualityGate.from_settings()
@@ -0,0 +1,305 @@
+"""우선순위 클래스별 추론 스케줄러.
+
+요청은 우선순위 클래스(urgent / routine / bulk)별 큐에 들어가고, 디스패처가
+가중치 기반 공정 분배(smooth weighted round robin)로 다음 작업을 고른다.
+상위 클래스의 대기 시간이 SLO 에 근접하면(SCHEDULER_DEMOTE_RATIO) 해당 클래스를
+우선 처리하고, 그 상위 클래스의 SLO 시간 동안 하위 클래스의 가중치를 한 단계 아래 클래스의
+가중치로 낮춘다. 작업을 다른 큐로 옮기지 않으므로 클래스 안의 FIFO 순서는 유지되고,
+강등된 클래스도 자기 SLO 에 근접하면 다시 우선 처리된다.
+predict() 는 스레드 풀에서 실행되므로 이벤트 루프를 막지 않는다.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Callable, Deque, Dict, List
+
+from app.core.config import get_settings
+from app.services import metrics
+from app.services.pipeline import PipelineCancelled
+
+PRIORITY_CLASSES = ('urgent', 'routine', 'bulk')
+_LATENCY_WINDOW = 200
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+class InvalidPriority(ValueError):
+    pass
+
+
+def parse_priority_map(value: str, cast: Callable[[str], Any]) -> Dict[str, Any]:
+    """'urgent:6,routine:3,bulk:1' 형식을 dict 로 변환한다."""
+    result: Dict[str, Any] = {}
+    for item in value.split(','):
+        if ':' not in item:
+            continue
+        name, raw = item.split(':', 1)
+        result[name.strip()] = cast(raw.strip())
+    return result
+
+
+def normalize_priority(value: str | None) -> str:
+    if value is None or not value.strip():
+        return get_settings().default_priority
+    value = value.strip().lower()
+    if value not in PRIORITY_CLASSES:
+        raise InvalidPriority(f'알 수 없는 우선순위: {value} (가능: {", ".join(PRIORITY_CLASSES)})')
+    return value
+
+
+def _percentile(values: List[float], q: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+@dataclass
+class InferenceJob:
+    fn: Callable[..., Any]
+    args: tuple
+    kwargs: Dict[str, Any]
+    priority: str
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+    # time.monotonic() 기준 마감 시각 (지나면 실행하지 않고 버림)
+    deadline: float | None = None
+
+
+@dataclass
+class _ClassState:
+    weight: int
+    slo: float
+    queue: Deque[InferenceJob] = field(default_factory=deque)
+    current_weight: int = 0
+    # 이 시각(perf_counter)까지 가중치를 한 단계 아래 클래스 값으로 낮춘다
+    demoted_until: float = 0.0
+    dispatched: int = 0
+    demoted: int = 0
+    rejected: int = 0
+    expired: int = 0
+    abandoned: int = 0
+    slo_violations: int = 0
+    waits: Deque[float] = field(default_factory=lambda: deque(maxlen=_LATENCY_WINDOW))
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=_LATENCY_WINDOW))
+    services: Deque[float] = field(default_factory=lambda: deque(maxlen=_LATENCY_WINDOW))
+
+
+class InferenceScheduler:
+    def __init__(
+        self,
+        weights: Dict[str, int],
+        slos: Dict[str, float],
+        concurrency: int = 1,
+        max_queue: int = 100,
+        demote_ratio: float = 0.8,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max_queue
+        self.demote_ratio = demote_ratio
+        self._classes: Dict[str, _ClassState] = {
+            name: _ClassState(weight=max(1, int(weights.get(name, 1))), slo=float(slos.get(name, 60.0)))
+            for name in PRIORITY_CLASSES
+        }
+        self._wakeup: asyncio.Event | None = None
+        self._workers: List[asyncio.Task] = []
+        self._executor: ThreadPoolExecutor | None = None
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._workers)
+
+    def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='inference')
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f'inference-dispatcher-{i}')
+            for i in range(self.concurrency)
+        ]
+
+    async def submit(
+        self,
+        priority: str,
+        fn: Callable[..., Any],
+        *args: Any,
+        deadline: float | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        """작업을 큐에 넣고 결과를 기다린다. 큐가 가득 차면 QueueFull,
+        실행 전에 마감 시각이 지나면 PipelineCancelled('expired_in_queue')."""
+        state = self._classes[priority]
+        if len(state.queue) >= self.max_queue:
+            state.rejected += 1
+            raise QueueFull(f'{priority} 큐가 가득 찼습니다 ({self.max_queue}건).')
+
+        job = InferenceJob(fn, args, kwargs, priority, asyncio.get_running_loop().create_future(), deadline=deadline)
+        state.queue.append(job)
+        assert self._wakeup is not None
+        self._wakeup.set()
+        return await job.future
+
+    def _estimated_service(self, state: _ClassState) -> float:
+        return _percentile(list(state.services), 0.5) or 0.0
+
+    def _at_risk(self, name: str, now: float) -> bool:
+        """가장 오래 기다린 작업이 지금 시작해도 SLO 의 demote_ratio 를 넘기는지."""
+        state = self._classes[name]
+        if not state.queue:
+            return False
+        projected = now - state.queue[0].enqueued_at + self._estimated_service(state)
+        return projected >= state.slo * self.demote_ratio
+
+    def _demote_below(self, name: str, now: float) -> None:
+        """name 보다 낮은 클래스의 가중치를 name 의 SLO 동안 한 단계 낮춘다 (맨 아래 클래스는 그대로)."""
+        index = PRIORITY_CLASSES.index(name)
+        until = now + self._classes[name].slo
+        for lower_name in PRIORITY_CLASSES[index + 1:-1]:
+            state = self._classes[lower_name]
+            if state.demoted_until <= now:
+                state.demoted += 1
+                metrics.inc(f'scheduler.demoted.{lower_name}')
+            state.demoted_until = max(state.demoted_until, until)
+
+    def _effective_weight(self, name: str, now: float) -> int:
+        state = self._classes[name]
+        if state.demoted_until <= now:
+            return state.weight
+        below = PRIORITY_CLASSES[PRIORITY_CLASSES.index(name) + 1]
+        return min(state.weight, self._classes[below].weight)
+
+    def _next_job(self) -> InferenceJob | None:
+        now = time.perf_counter()
+        for name in PRIORITY_CLASSES:
+            if self._at_risk(name, now):
+                self._demote_below(name, now)
+                return self._classes[name].queue.popleft()
+
+        candidates = [(name, state) for name, state in self._classes.items() if state.queue]
+        if not candidates:
+            return None
+        weights = {name: self._effective_weight(name, now) for name, _ in candidates}
+        total = sum(weights.values())
+        for name, state in candidates:
+            state.current_weight += weights[name]
+        _, chosen = max(candidates, key=lambda item: item[1].current_weight)
+        chosen.current_weight -= total
+        return chosen.queue.popleft()
+
+    async def _worker(self) -> None:
+        assert self._wakeup is not None
+        loop = asyncio.get_running_loop()
+        while True:
+            job = self._next_job()
+            if job is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            if job.future.done():
+                # 기다리던 요청이 이미 사라짐
+                self._classes[job.priority].abandoned += 1
+                continue
+            if job.deadline is not None and time.monotonic() >= job.deadline:
+                self._classes[job.priority].expired += 1
+                job.future.set_exception(PipelineCancelled('expired_in_queue'))
+                continue
+
+            started = time.perf_counter()
+            state = self._classes[job.priority]
+            state.dispatched += 1
+            state.waits.append(started - job.enqueued_at)
+            try:
+                result = await loop.run_in_executor(self._executor, partial(job.fn, *job.args, **job.kwargs))
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                if not job.future.done():
+                    job.future.set_result(result)
+            finished = time.perf_counter()
+            state.services.append(finished - started)
+            state.latencies.append(finished - job.enqueued_at)
+            if finished - job.enqueued_at > state.slo:
+                state.slo_violations += 1
+                metrics.inc(f'scheduler.slo_violation.{job.priority}')
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for state in self._classes.values():
+            while state.queue:
+                job = state.queue.popleft()
+                if not job.future.done():
+                    job.future.set_exception(RuntimeError('스케줄러가 종료되었습니다.'))
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {'concurrency': self.concurrency}
+        for name, state in self._classes.items():
+            waits = list(state.waits)
+            latencies = list(state.latencies)
+            result[name] = {
+                'weight': state.weight,
+                'effective_weight': self._effective_weight(name, time.perf_counter()),
+                'slo_seconds': state.slo,
+                'queued': len(state.queue),
+                'dispatched': state.dispatched,
+                'demoted': state.demoted,
+                'rejected': state.rejected,
+                'expired': state.expired,
+                'abandoned': state.abandoned,
+                'slo_violations': state.slo_violations,
+                'wait_p50_seconds': _percentile(waits, 0.5),
+                'wait_p95_seconds': _percentile(waits, 0.95),
+                'wait_max_seconds': max(waits) if waits else None,
+                'latency_p95_seconds': _percentile(latencies, 0.95),
+            }
+        return result
+
+
+scheduler: InferenceScheduler | None = None
+
+
+def start_scheduler() -> InferenceScheduler:
+    global scheduler
+    settings = get_settings()
+    scheduler = InferenceScheduler(
+        weights=parse_priority_map(settings.priority_weights, int),
+        slos=parse_priority_map(settings.priority_slo_seconds, float),
+        concurrency=settings.inference_concurrency,
+        max_queue=settings.inference_queue_size,
+        demote_ratio=settings.scheduler_demote_ratio,
+    )
+    scheduler.start()
+    metrics.register_collector('scheduler', scheduler.stats)
+    return scheduler
+
+
+async def stop_scheduler() -> None:
+    global scheduler
+    if scheduler is not None:
+        await scheduler.stop()
+        scheduler = None
+
+
+async def run_inference(
+    priority: str,
+    fn: Callable[..., Any],
+    *args: Any,
+    deadline: float | None = None,
+    **kwargs: Any,
+) -> Any:
+    """스케줄러가 있으면 큐를 거쳐, 없으면 (스크립트 등) 스레드 풀에서 바로 실행한다."""
+    if scheduler is None or not scheduler.running:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    return await scheduler.submit(priority, fn, *args, deadline=deadline, **kwargs)
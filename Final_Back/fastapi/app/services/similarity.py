@@ -0,0 +1,242 @@
+"""진단 임베딩 기반 유사 증례 검색.
+
+predict() 는 분류 헤드의 512 차원 은닉 표현(추가 연산 없음)을 임베딩으로 돌려주고,
+추론 기록에 float16 바이트로 함께 저장된다. 이 모듈은 현재 모델 버전의 임베딩을
+L2 정규화된 NumPy 행렬 하나로 메모리에 두고, 행렬-벡터 곱 한 번으로 코사인 유사도 top-k 를 찾는다.
+
+  - 새 진단은 응답 직후 `add()`로 바로 추가된다 (행렬 용량은 두 배씩 늘림).
+  - 다른 워커가 저장한 기록까지 반영하도록 SIMILARITY_REBUILD_SECONDS 마다 MongoDB 에서 다시 만든다.
+"""
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+from bson import ObjectId
+
+from app.core.config import get_settings
+from app.services import metrics
+
+EMBEDDING_DTYPE = np.dtype('<f2')
+SIMILARITY_PROJECTION: Dict[str, int] = {'embedding': 1, 'model_version': 1, 'created_at': 1}
+
+
+def encode_embedding(vector: np.ndarray) -> bytes:
+    """L2 정규화 후 float16 바이트로 (512 차원 기준 1KB)."""
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(vector))
+    return (vector / norm if norm > 0 else vector).astype(EMBEDDING_DTYPE).tobytes()
+
+
+def decode_embedding(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=EMBEDDING_DTYPE).astype(np.float32)
+
+
+class SimilarityIndex:
+    """한 모델 버전의 임베딩 행렬. 검색은 잠금 밖에서 행렬 스냅샷으로 수행한다."""
+
+    def __init__(self, max_items: int = 50000):
+        self.max_items = max_items
+        self.model_version: str | None = None
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._ids: List[ObjectId] = []
+        self._positions: Dict[ObjectId, int] = {}
+        # 재구성 중에 추가된 기록 (아직 MongoDB 에 쓰이지 않았을 수 있으므로 재구성 후 다시 넣는다)
+        self._added_during_rebuild: List[Dict[str, Any]] | None = None
+        self.rebuilds = 0
+        self.last_rebuild_seconds: float | None = None
+        self.searches = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, document: Dict[str, Any]) -> bool:
+        """추론 기록 하나를 추가한다 (다른 모델 버전이거나 임베딩이 없으면 무시)."""
+        data = document.get('embedding')
+        if self.model_version is None:
+            # 모델을 로드하지 않은 프로세스(작업 큐 모드의 API)는 첫 기록의 모델 버전을 따른다
+            self.model_version = document.get('model_version')
+        if not data or document.get('model_version') != self.model_version:
+            return False
+        vector = decode_embedding(data)
+        with self._lock:
+            if self._added_during_rebuild is not None:
+                self._added_during_rebuild.append(document)
+            return self._append(document['_id'], vector)
+
+    def _append(self, doc_id: ObjectId, vector: np.ndarray) -> bool:
+        if doc_id in self._positions:
+            return False
+        if self._matrix.shape[1] not in (0, len(vector)):
+            return False
+        if len(self._ids) >= self.max_items:
+            self._evict_oldest(max(1, self.max_items // 10))
+
+        size = len(self._ids)
+        if size == self._matrix.shape[0]:
+            grown = np.zeros((max(64, size * 2), len(vector)), dtype=np.float32)
+            if size:
+                grown[:size] = self._matrix[:size]
+            self._matrix = grown
+        self._matrix[size] = vector
+        self._ids.append(doc_id)
+        self._positions[doc_id] = size
+        return True
+
+    def _evict_oldest(self, count: int) -> None:
+        # 새 배열로 복사하므로 진행 중인 검색의 스냅샷은 그대로 유효하다
+        size = len(self._ids)
+        matrix = np.zeros_like(self._matrix)
+        matrix[:size - count] = self._matrix[count:size]
+        self._matrix = matrix
+        self._ids = self._ids[count:]
+        self._positions = {doc_id: i for i, doc_id in enumerate(self._ids)}
+
+    def vector(self, doc_id: ObjectId) -> np.ndarray | None:
+        with self._lock:
+            position = self._positions.get(doc_id)
+            return None if position is None else self._matrix[position].copy()
+
+    def search(self, vector: np.ndarray, k: int, exclude: Iterable[ObjectId] = ()) -> List[Tuple[ObjectId, float]]:
+        """코사인 유사도 상위 k 개 (doc_id, 유사도)."""
+        with self._lock:
+            size = len(self._ids)
+            matrix = self._matrix[:size]
+            ids = self._ids
+            excluded = [self._positions[doc_id] for doc_id in exclude if doc_id in self._positions]
+        self.searches += 1
+        if size == 0:
+            return []
+
+        query = np.asarray(vector, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(query))
+        scores = matrix @ (query / norm if norm > 0 else query)
+        scores[excluded] = -np.inf
+        k = min(k, size - len(excluded))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[i], float(scores[i])) for i in top]
+
+    async def rebuild(self, collection: Any, model_version: str) -> int:
+        """현재 모델 버전의 최근 기록(최대 max_items)으로 행렬을 다시 만든다."""
+        started = time.perf_counter()
+        with self._lock:
+            self._added_during_rebuild = []
+            if model_version != self.model_version:
+                # 모델이 바뀌면 이전 임베딩과는 비교할 수 없으므로 비우고 새 버전 기록부터 받는다
+                self.model_version = model_version
+                self._matrix = np.zeros((0, 0), dtype=np.float32)
+                self._ids = []
+                self._positions = {}
+        try:
+            documents = await (
+                collection.find(
+                    # 근접 중복 기록은 원본과 같은 결과이므로 색인에 넣지 않는다 (응답/추가 경로와 동일)
+                    {'model_version': model_version, 'embedding': {'$exists': True}, 'duplicate_of': None},
+                    SIMILARITY_PROJECTION,
+                )
+                .sort([('created_at', -1), ('_id', -1)])
+                .limit(self.max_items)
+                .to_list(self.max_items)
+            )
+        except Exception:
+            with self._lock:
+                self._added_during_rebuild = None
+            raise
+
+        documents.reverse()  # 오래된 것부터 (용량 초과 시 오래된 것부터 제거)
+        vectors = [decode_embedding(doc['embedding']) for doc in documents if doc.get('embedding')]
+        ids = [doc['_id'] for doc in documents if doc.get('embedding')]
+        matrix = np.stack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+        if len(matrix):
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+        with self._lock:
+            pending = self._added_during_rebuild or []
+            self._added_during_rebuild = None
+            self._matrix = matrix
+            self._ids = ids
+            self._positions = {doc_id: i for i, doc_id in enumerate(ids)}
+            for document in pending:
+                if document.get('model_version') == model_version:
+                    self._append(document['_id'], decode_embedding(document['embedding']))
+        self.rebuilds += 1
+        self.last_rebuild_seconds = time.perf_counter() - started
+        return len(self._ids)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'model_version': self.model_version,
+            'items': len(self._ids),
+            'capacity': self._matrix.shape[0],
+            'dimension': self._matrix.shape[1] if self._matrix.ndim == 2 else 0,
+            'matrix_bytes': self._matrix.nbytes,
+            'searches': self.searches,
+            'rebuilds': self.rebuilds,
+            'last_rebuild_seconds': self.last_rebuild_seconds,
+        }
+
+
+index: SimilarityIndex | None = None
+_rebuild_task: asyncio.Task | None = None
+
+
+def add(document: Dict[str, Any]) -> bool:
+    """응답 경로에서 호출: 색인이 켜져 있으면 방금 만든 추론 기록을 추가한다."""
+    return index.add(document) if index is not None else False
+
+
+async def _current_model_version(collection: Any) -> str | None:
+    """모델을 로드한 프로세스는 그 버전, 작업 큐 모드의 API 처럼 모델이 없으면 가장 최근 기록의 버전."""
+    model_service = sys.modules.get('app.services.model')
+    if model_service is not None and model_service.get_model_version() != 'unknown':
+        return model_service.get_model_version()
+    latest = await collection.find({}, {'model_version': 1}).sort([('created_at', -1), ('_id', -1)]).limit(1).to_list(1)
+    return latest[0].get('model_version') if latest else index.model_version
+
+
+async def _rebuild_periodically(collection: Any, interval: float) -> None:
+    while True:
+        try:
+            version = await _current_model_version(collection)
+            if version is None:
+                await asyncio.sleep(interval)
+                continue
+            count = await index.rebuild(collection, version)
+            print(f'🧭 유사 증례 색인 재구성: {count}건 ({index.last_rebuild_seconds:.2f}초)')
+        except Exception as e:
+            metrics.inc('similarity.rebuild_failed')
+            print(f'⚠️ 유사 증례 색인 재구성 실패: {e}')
+        await asyncio.sleep(interval)
+
+
+def start_similarity_index(collection: Any) -> SimilarityIndex | None:
+    """모델 로드 후 호출한다. 첫 재구성은 백그라운드에서 바로 시작된다."""
+    global index, _rebuild_task
+    settings = get_settings()
+    if not settings.similarity_index:
+        return None
+    index = SimilarityIndex(max_items=settings.similarity_index_max_items)
+    _rebuild_task = asyncio.create_task(
+        _rebuild_periodically(collection, settings.similarity_rebuild_seconds), name='similarity-rebuild',
+    )
+    metrics.register_collector('similarity_index', index.stats)
+    return index
+
+
+async def stop_similarity_index() -> None:
+    global _rebuild_task
+    if _rebuild_task is not None:
+        _rebuild_task.cancel()
+        try:
+            await _rebuild_task
+        except asyncio.CancelledError:
+            pass
+        _rebuild_task = None
@@ -0,0 +1,344 @@
+"""PyTorch intra/inter-op 스레드 수 자동 튜닝.
+
+우선순위: 환경 변수(TORCH_NUM_THREADS/TORCH_INTEROP_THREADS) > 튜닝 결과 파일 > 호스트 CPU 수 기반 기본값.
+튜닝 결과는 실제 머신에서 UNet / COVID19Classifier forward 를 스레드 수·배치 크기별로
+측정해 THREAD_CONFIG_PATH(JSON)에 저장한다.
+
+    python -m app.services.tuning tune          # 오프라인 튜닝 (inter-op 후보마다 별도 프로세스)
+    python -m app.services.tuning show          # 현재 적용될 설정 확인
+
+AUTOTUNE_THREADS=true 이면 서버 시작 시 저장된 결과가 없거나 CPU 수가 바뀐 경우
+프로세스 안에서 intra-op 스레드 수만 다시 측정한다 (inter-op 은 프로세스당 한 번만 설정 가능).
+오프라인 튜닝이 고른 배치 크기는 JOB_BATCH_SIZE 가 없을 때 작업 큐 워커의 배치 크기가 된다.
+CPU_AFFINITY=pin 이면 워커마다 겹치지 않는 CPU 묶음에 프로세스를 고정한다.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.core.config import get_settings
+
+
+@dataclass
+class ThreadConfig:
+    intra_op_threads: int
+    inter_op_threads: int
+    batch_size: int = 1
+    cpus: int = 0
+    source: str = 'default'
+    results: List[Dict[str, Any]] = field(default_factory=list)
+    tuned_at: str | None = None
+
+
+_applied: ThreadConfig | None = None
+_affinity_lock_file = None
+
+
+def available_cpus() -> List[int]:
+    """현재 프로세스가 사용할 수 있는 CPU 목록 (컨테이너 cpuset 반영)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def default_thread_config(cpus: int) -> ThreadConfig:
+    """측정 없이 정하는 기본값. 워커가 여러 개면 CPU를 나눠 쓴다."""
+    workers = max(1, get_settings().worker_count)
+    intra = max(1, cpus // workers)
+    return ThreadConfig(intra_op_threads=intra, inter_op_threads=1 if intra <= 2 else 2, cpus=cpus)
+
+
+def load_thread_config(path: Path) -> ThreadConfig | None:
+    try:
+        data = json.loads(Path(path).read_text(encoding='utf-8'))
+        return ThreadConfig(**data)
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def save_thread_config(config: ThreadConfig, path: Path) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    with os.fdopen(fd, 'w', encoding='utf-8') as tmp_file:
+        json.dump(asdict(config), tmp_file, ensure_ascii=False, indent=2)
+    os.replace(tmp_name, path)
+
+
+def _pin_cpu_affinity(cpus: List[int]) -> List[int]:
+    """워커 슬롯을 하나 잡고 해당 CPU 묶음에 프로세스를 고정한다."""
+    global _affinity_lock_file
+    if not hasattr(os, 'sched_setaffinity'):
+        print('⚠️ 이 플랫폼은 CPU affinity 고정을 지원하지 않습니다.')
+        return cpus
+
+    settings = get_settings()
+    workers = max(1, min(settings.worker_count, len(cpus)))
+    slot = settings.worker_index
+    if slot is None:
+        # WORKER_INDEX 가 없으면 파일 잠금으로 비어있는 슬롯을 차지한다 (프로세스 종료 시 자동 해제)
+        import fcntl
+
+        for candidate in range(workers):
+            lock_path = Path(tempfile.gettempdir()) / f'covid-ai-cpu-slot-{candidate}.lock'
+            lock_file = open(lock_path, 'w')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                continue
+            _affinity_lock_file = lock_file
+            slot = candidate
+            break
+        if slot is None:
+            print('⚠️ 비어있는 CPU 슬롯이 없어 affinity 고정을 건너뜁니다.')
+            return cpus
+
+    per_worker = max(1, len(cpus) // workers)
+    pinned = cpus[(slot % workers) * per_worker:(slot % workers + 1) * per_worker]
+    os.sched_setaffinity(0, pinned)
+    print(f'📌 CPU affinity 고정: 워커 슬롯 {slot} → CPU {pinned}')
+    return pinned
+
+
+def configure_threads() -> ThreadConfig:
+    """모델 모듈 import 시 한 번 호출되어 스레드 설정을 적용한다."""
+    global _applied
+    import torch
+
+    settings = get_settings()
+    cpus = available_cpus()
+    if settings.cpu_affinity == 'pin':
+        cpus = _pin_cpu_affinity(cpus)
+
+    config = default_thread_config(len(cpus))
+    tuned = load_thread_config(settings.thread_config_path)
+    if tuned is not None and tuned.cpus == len(cpus):
+        config = tuned
+    elif tuned is not None:
+        print(f'ℹ️ 튜닝 결과({tuned.cpus} CPU)가 현재 호스트({len(cpus)} CPU)와 달라 기본값을 사용합니다.')
+
+    if settings.torch_num_threads:
+        config.intra_op_threads = settings.torch_num_threads
+        config.source = 'env'
+    if settings.torch_interop_threads:
+        config.inter_op_threads = settings.torch_interop_threads
+        config.source = 'env'
+
+    torch.set_num_threads(config.intra_op_threads)
+    try:
+        torch.set_num_interop_threads(config.inter_op_threads)
+    except RuntimeError:
+        # 이미 병렬 작업이 시작된 뒤에는 변경할 수 없다
+        config.inter_op_threads = torch.get_num_interop_threads()
+
+    _applied = config
+    print(f'🧵 PyTorch 스레드 설정 ({config.source}): intra-op {config.intra_op_threads}, '
+          f'inter-op {config.inter_op_threads}, 배치 {config.batch_size}')
+    return config
+
+
+def get_thread_config() -> ThreadConfig:
+    return _applied or configure_threads()
+
+
+# ==========================================
+# 벤치마크
+# ==========================================
+
+def _candidate_threads(cpus: int) -> List[int]:
+    candidates = {1, cpus}
+    n = 2
+    while n < cpus:
+        candidates.add(n)
+        n *= 2
+    return sorted(candidates)
+
+
+def benchmark(
+    thread_candidates: List[int],
+    batch_sizes: List[int],
+    repeats: int = 5,
+    warmup: int = 2,
+) -> List[Dict[str, Any]]:
+    """UNet + 분류 모델 forward 를 스레드 수·배치 크기별로 측정한다.
+
+    가중치 값은 연산량과 무관하므로 로드된 모델이 없으면 랜덤 가중치 모델을 사용한다.
+    """
+    import torch
+    from app.services import model as model_service
+
+    seg_model = model_service._segmentation_model or model_service.UNet(n_channels=3, n_classes=1, bilinear=False)
+    clf_model = model_service._classification_model or model_service.COVID19Classifier(
+        num_classes=4, pretrained=False, backbone=get_settings().classifier_backbone or model_service.DEFAULT_BACKBONE,
+    )
+    seg_model.eval()
+    clf_model.eval()
+
+    original_threads = torch.get_num_threads()
+    results = []
+    try:
+        for threads in thread_candidates:
+            torch.set_num_threads(threads)
+            for batch_size in batch_sizes:
+                x = torch.randn(batch_size, 3, 224, 224)
+                timings = []
+                with torch.inference_mode():
+                    for i in range(warmup + repeats):
+                        start = time.perf_counter()
+                        seg_model(x)
+                        clf_model(x)
+                        if i >= warmup:
+                            timings.append(time.perf_counter() - start)
+                median = statistics.median(timings)
+                results.append({
+                    'intra_op_threads': threads,
+                    'inter_op_threads': torch.get_num_interop_threads(),
+                    'batch_size': batch_size,
+                    'median_batch_seconds': median,
+                    'per_image_seconds': median / batch_size,
+                    'jitter_seconds': max(timings) - min(timings),
+                })
+                print(f'  - threads={threads:<3} batch={batch_size:<3} '
+                      f'{median:.4f}s/batch, {median / batch_size:.4f}s/image')
+    finally:
+        torch.set_num_threads(original_threads)
+    return results
+
+
+def select_best(results: List[Dict[str, Any]], cpus: int, source: str) -> ThreadConfig:
+    """이미지당 처리 시간이 가장 짧은 조합을 고른다 (5% 이내면 스레드가 적은 쪽)."""
+    best_time = min(r['per_image_seconds'] for r in results)
+    good = [r for r in results if r['per_image_seconds'] <= best_time * 1.05]
+    best = min(good, key=lambda r: (r['intra_op_threads'], r['batch_size'], r['per_image_seconds']))
+    return ThreadConfig(
+        intra_op_threads=best['intra_op_threads'],
+        inter_op_threads=best['inter_op_threads'],
+        batch_size=best['batch_size'],
+        cpus=cpus,
+        source=source,
+        results=results,
+        tuned_at=datetime.now(timezone.utc).isoformat(),
+    )
+
+
+def autotune_at_startup() -> ThreadConfig | None:
+    """AUTOTUNE_THREADS=true 일 때 lifespan 에서 호출된다 (TORCH_NUM_THREADS 가 있으면 측정하지 않음)."""
+    import torch
+
+    settings = get_settings()
+    if not settings.autotune_threads:
+        return None
+    if settings.torch_num_threads is not None:
+        # 환경 변수가 우선이므로 측정해도 적용되지 않는다
+        print(f'ℹ️ TORCH_NUM_THREADS={settings.torch_num_threads} 가 설정되어 스레드 자동 튜닝을 건너뜁니다.')
+        return None
+    cpus = len(available_cpus())
+    tuned = load_thread_config(settings.thread_config_path)
+    if tuned is not None and tuned.cpus == cpus:
+        return tuned
+
+    print('🔧 스레드 자동 튜닝 시작 (intra-op)...')
+    results = benchmark(_candidate_threads(cpus), batch_sizes=[1], repeats=3, warmup=1)
+    config = select_best(results, cpus, source='startup')
+    save_thread_config(config, settings.thread_config_path)
+    torch.set_num_threads(config.intra_op_threads)
+    get_thread_config().intra_op_threads = config.intra_op_threads
+    print(f'✅ 스레드 자동 튜닝 완료: intra-op {config.intra_op_threads} → {settings.thread_config_path}')
+    return config
+
+
+def tuned_batch_size() -> int | None:
+    """오프라인 튜닝(tune)이 이 호스트에서 고른 배치 크기.
+
+    시작 시 튜닝은 배치 1 만 측정하므로 그 결과(source=startup)의 배치 크기는 쓰지 않는다.
+    """
+    config = load_thread_config(get_settings().thread_config_path)
+    if config is None or config.source != 'tuned' or config.cpus != len(available_cpus()):
+        return None
+    return config.batch_size
+
+
+def _run_bench_subprocess(interop: int, threads: List[int], batch_sizes: List[int], repeats: int) -> List[Dict[str, Any]]:
+    env = dict(os.environ, TORCH_INTEROP_THREADS=str(interop))
+    command = [
+        sys.executable, '-m', 'app.services.tuning', 'bench',
+        '--threads', ','.join(map(str, threads)),
+        '--batch-sizes', ','.join(map(str, batch_sizes)),
+        '--repeats', str(repeats),
+    ]
+    completed = subprocess.run(
+        command, env=env, capture_output=True, text=True,
+        cwd=Path(__file__).resolve().parent.parent.parent,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f'벤치마크 프로세스 실패 (inter-op {interop}): {completed.stderr}')
+    marker = completed.stdout.rsplit('BENCH_RESULTS=', 1)[-1]
+    return json.loads(marker)
+
+
+def _parse_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='PyTorch 스레드 수 튜닝')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    tune = sub.add_parser('tune', help='측정 후 최적 설정을 저장')
+    tune.add_argument('--threads', type=_parse_list, default=None, help='intra-op 후보 (예: 1,2,4,8)')
+    tune.add_argument('--interop', type=_parse_list, default=[1, 2], help='inter-op 후보')
+    tune.add_argument('--batch-sizes', type=_parse_list, default=[1, 2, 4])
+    tune.add_argument('--repeats', type=int, default=5)
+    tune.add_argument('--output', type=Path, default=None)
+
+    bench = sub.add_parser('bench', help='(내부용) 현재 프로세스에서 측정만 수행')
+    bench.add_argument('--threads', type=_parse_list, required=True)
+    bench.add_argument('--batch-sizes', type=_parse_list, default=[1])
+    bench.add_argument('--repeats', type=int, default=5)
+
+    sub.add_parser('show', help='현재 적용될 설정 출력')
+
+    args = parser.parse_args()
+    # `python -m` 로 실행하면 이 파일이 __main__ 으로 한 번 더 로드되므로
+    # 모델 모듈 import 시 이미 적용된 설정을 패키지 모듈에서 가져온다
+    from app.services.tuning import get_thread_config as applied_thread_config
+
+    if args.command == 'bench':
+        applied_thread_config()
+        results = benchmark(args.threads, args.batch_sizes, repeats=args.repeats)
+        print('BENCH_RESULTS=' + json.dumps(results))
+        return 0
+
+    if args.command == 'show':
+        print(json.dumps(asdict(applied_thread_config()), ensure_ascii=False, indent=2))
+        return 0
+
+    cpus = len(available_cpus())
+    threads = args.threads or _candidate_threads(cpus)
+    results: List[Dict[str, Any]] = []
+    for interop in args.interop:
+        print(f'🔧 inter-op {interop} 측정 중...')
+        results.extend(_run_bench_subprocess(interop, threads, args.batch_sizes, args.repeats))
+
+    config = select_best(results, cpus, source='tuned')
+    output = args.output or get_settings().thread_config_path
+    save_thread_config(config, output)
+    print(f'✅ 최적 설정: intra-op {config.intra_op_threads}, inter-op {config.inter_op_threads}, '
+          f'배치 {config.batch_size} → {output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,9 @@
+"""분류 모델 학습 스크립트 (서빙 코드와 같은 전처리·모델 정의를 사용한다).
+
+    python -m app.training.distill --data ./COVID-19_Radiography_Dataset --backbone resnet18
+
+PNG 디코딩 대신 전처리 캐시(memmap)에서 읽으려면 먼저 한 번 만들어 둔다 (app/training/cache.py).
+
+    python -m app.training.cache build --data ./COVID-19_Radiography_Dataset --output ./cache/covid224
+    python -m app.training.distill --cache ./cache/covid224 --backbone resnet18
+"""
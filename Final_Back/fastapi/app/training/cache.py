@@ -0,0 +1,349 @@
+"""학습 데이터 전처리 캐시 (memory-mapped NumPy).
+
+노트북(모델학습.ipynb)의 COVID19SegmentationDataset / 분류 데이터셋과 XrayDataset 은 epoch 마다
+PNG 를 다시 디코딩하고 크기를 줄여서, GPU 가 있어도 epoch 시간이 PNG 디코딩에 묶인다.
+한 번만 전처리해 고정 크기 배열로 저장해 두고, 학습 중에는 memmap 에서 잘라 읽는다.
+
+    <cache>/images.npy   uint8 [N, 3, H, W]  XrayDataset 과 같은 RGB BILINEAR 리사이즈
+    <cache>/masks.npy    uint8 [N, H, W]     폐 마스크 0/1 (NEAREST, 마스크가 없으면 0)
+    <cache>/index.json   원본 상대 경로, 라벨, 마스크 유무, 읽기 실패 여부 (마지막에 써서 완료 표시)
+
+COVID-19_Radiography_Dataset 21k 장 기준 224x224 에서 약 3.5GB 이다. 페이지 캐시에 올라간 뒤에는
+DataLoader 워커가 여럿이어도 같은 메모리를 공유한다.
+
+    python -m app.training.cache build --data ./COVID-19_Radiography_Dataset --output ./cache/covid224
+    python -m app.training.cache bench --cache ./cache/covid224 --data ./COVID-19_Radiography_Dataset
+    python -m app.training.distill --cache ./cache/covid224 --backbone resnet18
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image
+from torch.utils.data import DataLoader, Dataset
+
+from app.services.model import INPUT_SIZE
+from app.training.data import UNLABELED, XrayDataset, find_images, is_validation
+
+CACHE_VERSION = 1
+INDEX_FILE = 'index.json'
+IMAGES_FILE = 'images.npy'
+MASKS_FILE = 'masks.npy'
+# 워커 하나가 한 번에 처리하는 이미지 수
+_BUILD_CHUNK = 256
+
+
+def find_mask(image_path: Path) -> Path | None:
+    """`<클래스>/images/X.png` 의 마스크 `<클래스>/masks/X.png` (노트북과 같이 대소문자 변형도 찾는다)."""
+    if image_path.parent.name != 'images':
+        return None
+    mask_dir = image_path.parent.parent / 'masks'
+    stem, suffix = image_path.stem, image_path.suffix
+    variants = [stem, stem.lower()]
+    if '-' in stem:
+        head, tail = stem.split('-', 1)
+        variants.insert(1, f'{head.capitalize()}-{tail}')
+    for variant in variants:
+        candidate = mask_dir / f'{variant}{suffix}'
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def _fill_chunk(output: str, root: str, start: int, paths: List[str], size: Tuple[int, int]) -> Tuple[List[bool], List[bool]]:
+    """워커 프로세스: start 부터 paths 를 디코딩해 memmap 에 쓴다. (마스크 유무, 성공 여부) 를 돌려준다."""
+    images = np.load(Path(output) / IMAGES_FILE, mmap_mode='r+')
+    masks = np.load(Path(output) / MASKS_FILE, mmap_mode='r+')
+    has_mask, ok = [], []
+    for offset, relative in enumerate(paths):
+        position = start + offset
+        path = Path(root) / relative
+        try:
+            with Image.open(path) as image:
+                resized = image.convert('RGB').resize(size, Image.BILINEAR)
+            images[position] = np.asarray(resized).transpose(2, 0, 1)
+        except (OSError, ValueError) as e:
+            print(f'  ⚠️ 읽기 실패 (건너뜀): {relative} ({e})')
+            images[position] = 0
+            masks[position] = 0
+            has_mask.append(False)
+            ok.append(False)
+            continue
+        mask_path = find_mask(path)
+        masks[position] = 0
+        if mask_path is not None:
+            try:
+                with Image.open(mask_path) as mask:
+                    masks[position] = np.asarray(mask.convert('L').resize(size, Image.NEAREST)) > 127
+            except (OSError, ValueError) as e:
+                # 이미지는 쓸 수 있으므로 마스크 없는 샘플로 남긴다
+                print(f'  ⚠️ 마스크 읽기 실패 (마스크 없음으로 처리): {mask_path.name} ({e})')
+                masks[position] = 0
+                mask_path = None
+        has_mask.append(mask_path is not None)
+        ok.append(True)
+    images.flush()
+    masks.flush()
+    return has_mask, ok
+
+
+def build_cache(
+    root: Path,
+    output: Path,
+    size: Tuple[int, int] = INPUT_SIZE,
+    workers: int | None = None,
+    limit: int = 0,
+    force: bool = False,
+) -> 'DatasetCache':
+    """root 아래 이미지를 한 번 전처리해 output 에 저장한다 (이미 있으면 그대로 연다)."""
+    if (output / INDEX_FILE).exists() and not force:
+        print(f'ℹ️ 이미 만들어진 캐시를 사용합니다: {output} (다시 만들려면 --force)')
+        return DatasetCache.open(output)
+
+    items = find_images(root)
+    if limit:
+        items = items[:limit]
+    if not items:
+        raise SystemExit(f'❌ 이미지가 없습니다: {root}')
+
+    output.mkdir(parents=True, exist_ok=True)
+    # index 가 없으면 미완성 캐시 (중간에 끊겨도 열리지 않는다)
+    (output / INDEX_FILE).unlink(missing_ok=True)
+    width, height = size
+    count = len(items)
+    np.lib.format.open_memmap(output / IMAGES_FILE, mode='w+', dtype=np.uint8, shape=(count, 3, height, width)).flush()
+    np.lib.format.open_memmap(output / MASKS_FILE, mode='w+', dtype=np.uint8, shape=(count, height, width)).flush()
+
+    paths = [str(path.relative_to(root)) for path, _ in items]
+    workers = workers or os.cpu_count() or 1
+    print(f'🗂️ 캐시 생성: {count}장 → {output} ({width}x{height}, 워커 {workers})')
+    started = time.perf_counter()
+    has_mask: List[bool] = []
+    ok: List[bool] = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_fill_chunk, str(output), str(root), start, paths[start:start + _BUILD_CHUNK], size)
+            for start in range(0, count, _BUILD_CHUNK)
+        ]
+        for done, future in enumerate(futures, 1):
+            chunk_has_mask, chunk_ok = future.result()
+            has_mask.extend(chunk_has_mask)
+            ok.extend(chunk_ok)
+            if done % 10 == 0 or done == len(futures):
+                print(f'   {min(done * _BUILD_CHUNK, count)}/{count}장 ({time.perf_counter() - started:.0f}초)')
+
+    index = {
+        'version': CACHE_VERSION,
+        'size': [width, height],
+        'count': count,
+        'root': str(root.resolve()),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'paths': paths,
+        'labels': [label for _, label in items],
+        'has_mask': has_mask,
+        'ok': ok,
+    }
+    temporary = output / f'{INDEX_FILE}.tmp'
+    temporary.write_text(json.dumps(index, ensure_ascii=False))
+    temporary.replace(output / INDEX_FILE)
+    print(f'✅ 캐시 생성 완료: {sum(ok)}장 (마스크 {sum(has_mask)}장, 실패 {count - sum(ok)}장, '
+          f'{time.perf_counter() - started:.0f}초)')
+    return DatasetCache.open(output)
+
+
+class DatasetCache:
+    """index + memmap 배열. 배열은 처음 읽을 때 연다 (DataLoader 워커마다 각자 memmap 을 연다)."""
+
+    def __init__(self, directory: Path, index: Dict[str, Any]):
+        self.directory = directory
+        self.size: Tuple[int, int] = tuple(index['size'])  # type: ignore[assignment]
+        self.paths: List[str] = index['paths']
+        self.labels: List[int] = index['labels']
+        self.has_mask: List[bool] = index['has_mask']
+        self.ok: List[bool] = index['ok']
+        self._images: np.ndarray | None = None
+        self._masks: np.ndarray | None = None
+
+    @classmethod
+    def open(cls, directory: Path) -> 'DatasetCache':
+        index_path = directory / INDEX_FILE
+        if not index_path.exists():
+            raise FileNotFoundError(f'캐시가 없거나 생성이 끝나지 않았습니다: {directory} (python -m app.training.cache build)')
+        index = json.loads(index_path.read_text())
+        if index.get('version') != CACHE_VERSION:
+            raise ValueError(f'캐시 형식 버전이 다릅니다 ({index.get("version")} != {CACHE_VERSION}): 다시 만드세요')
+        return cls(directory, index)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # DataLoader 워커로 넘길 때 memmap 대신 경로만 보낸다
+        state = dict(self.__dict__)
+        state['_images'] = state['_masks'] = None
+        return state
+
+    @property
+    def images(self) -> np.ndarray:
+        if self._images is None:
+            self._images = np.load(self.directory / IMAGES_FILE, mmap_mode='r')
+        return self._images
+
+    @property
+    def masks(self) -> np.ndarray:
+        if self._masks is None:
+            self._masks = np.load(self.directory / MASKS_FILE, mmap_mode='r')
+        return self._masks
+
+    def split(self, val_ratio: float, limit: int = 0) -> Tuple[List[int], List[int]]:
+        """읽기에 성공한 샘플의 train/val 위치 (split_items 와 같은 파일 이름 해시 기준)."""
+        positions = [i for i, ok in enumerate(self.ok) if ok]
+        if limit:
+            positions = positions[:limit]
+        train, val = [], []
+        for i in positions:
+            (val if is_validation(Path(self.paths[i]).name, val_ratio) else train).append(i)
+        return train, val
+
+
+class CachedXrayDataset(Dataset):
+    """XrayDataset 과 같은 (3x224x224 [0, 1] tensor, 라벨) 을 캐시에서 읽는다."""
+
+    def __init__(self, cache: DatasetCache, indices: List[int] | None = None):
+        self.cache = cache
+        self.indices = indices if indices is not None else [i for i, ok in enumerate(cache.ok) if ok]
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, index: int) -> Tuple[torch.Tensor, int]:
+        position = self.indices[index]
+        image = torch.from_numpy(np.array(self.cache.images[position], dtype=np.float32))
+        return image.div_(255.0), self.cache.labels[position]
+
+
+class CachedSegmentationDataset(Dataset):
+    """(3xHxW [0, 1] 이미지, HxW 0/1 마스크, 라벨). 마스크가 있는 샘플만 사용한다.
+
+    정규화는 배치 단위로 data.to_segmentation_input 을 쓴다. augment=True 면 노트북의
+    SegmentationTransform 처럼 이미지/마스크에 같은 좌우·상하 반전과 ±15도 회전을 적용한다.
+    """
+
+    def __init__(self, cache: DatasetCache, indices: List[int] | None = None, augment: bool = False):
+        self.cache = cache
+        candidates = indices if indices is not None else range(len(cache))
+        self.indices = [i for i in candidates if cache.ok[i] and cache.has_mask[i]]
+        self.augment = augment
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, index: int) -> Tuple[torch.Tensor, torch.Tensor, int]:
+        position = self.indices[index]
+        image = torch.from_numpy(np.array(self.cache.images[position], dtype=np.float32)).div_(255.0)
+        mask = torch.from_numpy(np.array(self.cache.masks[position], dtype=np.float32))
+        if self.augment:
+            image, mask = _augment(image, mask)
+        return image, mask, self.cache.labels[position]
+
+
+def _augment(image: torch.Tensor, mask: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    if random.random() < 0.5:
+        image, mask = image.flip(-1), mask.flip(-1)
+    if random.random() < 0.5:
+        image, mask = image.flip(-2), mask.flip(-2)
+    if random.random() < 0.5:
+        angle = math.radians(random.uniform(-15, 15))
+        theta = torch.tensor([[math.cos(angle), -math.sin(angle), 0.0],
+                              [math.sin(angle), math.cos(angle), 0.0]]).unsqueeze(0)
+        grid = F.affine_grid(theta, [1, 1, *mask.shape], align_corners=False)
+        image = F.grid_sample(image[None], grid, mode='bilinear', align_corners=False)[0]
+        mask = F.grid_sample(mask[None, None], grid, mode='nearest', align_corners=False)[0, 0]
+    return image, mask
+
+
+def make_loader(dataset: Dataset, batch_size: int, shuffle: bool = False, workers: int = 2,
+                drop_last: bool = False) -> DataLoader:
+    """캐시 데이터셋용 DataLoader (워커 유지, CUDA 면 pinned memory)."""
+    return DataLoader(
+        dataset,
+        batch_size=batch_size,
+        shuffle=shuffle,
+        num_workers=workers,
+        drop_last=drop_last,
+        pin_memory=torch.cuda.is_available(),
+        persistent_workers=workers > 0,
+    )
+
+
+# ==========================================
+# CLI
+# ==========================================
+
+def _time_loader(loader: DataLoader, batches: int) -> Tuple[float, int]:
+    """첫 배치(워커 시작)를 뺀 처리 시간과 장 수."""
+    iterator = iter(loader)
+    next(iterator)
+    started = time.perf_counter()
+    seen = 0
+    for _, batch in zip(range(batches), iterator):
+        seen += len(batch[0])
+    return time.perf_counter() - started, seen
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='학습용 memmap 데이터 캐시')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help='이미지/마스크를 전처리해 캐시 생성')
+    build.add_argument('--data', type=Path, required=True, help='COVID-19_Radiography_Dataset 등 이미지 루트')
+    build.add_argument('--output', type=Path, required=True)
+    build.add_argument('--size', type=int, default=INPUT_SIZE[0], help='정사각형 한 변 (기본 서빙 입력 크기)')
+    build.add_argument('--workers', type=int, default=None, help='기본: CPU 수')
+    build.add_argument('--limit', type=int, default=0, help='사용할 최대 이미지 수 (0: 전체)')
+    build.add_argument('--force', action='store_true', help='이미 있어도 다시 생성')
+    info = sub.add_parser('info', help='캐시 요약')
+    info.add_argument('--cache', type=Path, required=True)
+    bench = sub.add_parser('bench', help='PNG 디코딩 대비 캐시 읽기 속도')
+    bench.add_argument('--cache', type=Path, required=True)
+    bench.add_argument('--data', type=Path, required=True)
+    bench.add_argument('--batch-size', type=int, default=32)
+    bench.add_argument('--workers', type=int, default=4)
+    bench.add_argument('--batches', type=int, default=50)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_cache(args.data, args.output, (args.size, args.size), args.workers, args.limit, args.force)
+        return 0
+
+    cache = DatasetCache.open(args.cache)
+    if args.command == 'info':
+        labeled = sum(label != UNLABELED for label in cache.labels)
+        print(f'🗂️ {args.cache}: {len(cache)}장 ({cache.size[0]}x{cache.size[1]}), 라벨 {labeled}장, '
+              f'마스크 {sum(cache.has_mask)}장, 실패 {len(cache) - sum(cache.ok)}장, '
+              f'{(cache.images.nbytes + cache.masks.nbytes) / 1e9:.2f}GB')
+        return 0
+
+    positions = [i for i, ok in enumerate(cache.ok) if ok]
+    items = [(args.data / cache.paths[i], cache.labels[i]) for i in positions]
+    for label, dataset in (('png', XrayDataset(items)), ('cache', CachedXrayDataset(cache, positions))):
+        loader = DataLoader(dataset, batch_size=args.batch_size, shuffle=True, num_workers=args.workers)
+        elapsed, seen = _time_loader(loader, args.batches)
+        print(f'{label:<6} {seen / elapsed:>9.1f} 장/초 ({seen}장, {elapsed:.2f}초)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""학습용 이미지 목록과 서빙과 동일한 입력 변환.
+
+이미지는 INPUT_SIZE 로 줄인 [0, 1] RGB tensor 로 읽고,
+분할 입력 / 마스크 적용 후 분류 입력은 배치 단위로 만든다 (app/services/model.py 의 전처리와 같은 값).
+"""
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+import torch
+from PIL import Image
+from torch.utils.data import Dataset
+
+from app.services.model import _IMAGENET_MEAN, _IMAGENET_STD, CLASS_NAMES, INPUT_SIZE
+
+IMAGE_SUFFIXES = {'.png', '.jpg', '.jpeg', '.bmp'}
+# 라벨을 알 수 없는 이미지 (교사 soft label 만 사용)
+UNLABELED = -1
+
+_MEAN = torch.from_numpy(_IMAGENET_MEAN).view(1, 3, 1, 1)
+_STD = torch.from_numpy(_IMAGENET_STD).view(1, 3, 1, 1)
+
+
+def find_images(root: Path) -> List[Tuple[Path, int]]:
+    """root 아래 이미지와 라벨. 경로 중 CLASS_NAMES 와 같은 폴더 이름이 있으면 그 클래스로 본다.
+
+    COVID-19_Radiography_Dataset 의 `<클래스>/images/*.png` 구조에서는 masks 폴더를 건너뛴다.
+    """
+    items = []
+    for path in sorted(root.rglob('*')):
+        if path.suffix.lower() not in IMAGE_SUFFIXES or 'masks' in path.parts:
+            continue
+        label = next((CLASS_NAMES.index(part) for part in path.parts if part in CLASS_NAMES), UNLABELED)
+        items.append((path, label))
+    return items
+
+
+def is_validation(name: str, val_ratio: float) -> bool:
+    """파일 이름 해시로 val 쪽인지 정한다 (실행마다, 목록이 늘어나도 같은 이미지는 같은 쪽)."""
+    return int(hashlib.md5(name.encode()).hexdigest()[:8], 16) / 0xFFFFFFFF < val_ratio
+
+
+def split_items(
+    items: List[Tuple[Path, int]], val_ratio: float,
+) -> Tuple[List[Tuple[Path, int]], List[Tuple[Path, int]]]:
+    """파일 이름 해시로 train/val 을 나눈다 (is_validation)."""
+    train, val = [], []
+    for item in items:
+        (val if is_validation(item[0].name, val_ratio) else train).append(item)
+    return train, val
+
+
+class XrayDataset(Dataset):
+    """(3x224x224 [0, 1] tensor, 라벨) 을 돌려준다."""
+
+    def __init__(self, items: List[Tuple[Path, int]]):
+        self.items = items
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __getitem__(self, index: int) -> Tuple[torch.Tensor, int]:
+        path, label = self.items[index]
+        image = Image.open(path).convert('RGB').resize(INPUT_SIZE, Image.BILINEAR)
+        array = np.asarray(image, dtype=np.float32) / 255.0
+        return torch.from_numpy(np.ascontiguousarray(array.transpose(2, 0, 1))), label
+
+
+def to_segmentation_input(images: torch.Tensor) -> torch.Tensor:
+    """[0, 1] 배치 → 분할 모델 입력 (정규화)."""
+    return (images - _MEAN.to(images.device)) / _STD.to(images.device)
+
+
+def to_classifier_input(images: torch.Tensor, masks: torch.Tensor) -> torch.Tensor:
+    """[0, 1] 배치에 폐 마스크를 곱한 뒤 8bit 로 양자화하고 정규화한다 (_preprocess_for_classification 과 동일)."""
+    segmented = torch.floor(images * masks * 255.0) / 255.0
+    return to_segmentation_input(segmented)
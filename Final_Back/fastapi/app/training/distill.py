@@ -0,0 +1,220 @@
+"""서빙 중인 ResNet50 분류 모델을 교사로 경량 backbone 을 지식 증류로 학습한다.
+
+학생 입력은 서빙과 같다: 이미지 → UNet 폐 분할 → 마스크 적용 → 정규화.
+손실은 온도 T 의 soft label KL 과 (라벨이 있는 이미지에 한해) cross entropy 의 가중합이다.
+결과 체크포인트에는 backbone 메타데이터가 들어가므로 CLASSIFIER_CHECKPOINT 로 바로 서빙할 수 있다.
+
+    python -m app.training.distill --data ./COVID-19_Radiography_Dataset --backbone resnet18 \\
+        --epochs 10 --output ../../clf_resnet18_distilled.pth
+    CLASSIFIER_CHECKPOINT=../../clf_resnet18_distilled.pth uvicorn app.main:app   # 선별 검사용 서빙
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader
+
+from app.services import model as model_service
+from app.services.model import CLASS_NAMES, CLASSIFIER_BACKBONES, COVID19Classifier
+from app.training.cache import CachedXrayDataset, DatasetCache, make_loader
+from app.training.data import UNLABELED, XrayDataset, find_images, split_items, to_classifier_input, to_segmentation_input
+
+
+def distillation_loss(
+    student_logits: torch.Tensor,
+    teacher_logits: torch.Tensor,
+    labels: torch.Tensor,
+    temperature: float,
+    alpha: float,
+) -> torch.Tensor:
+    """alpha * T^2 * KL(teacher_T || student_T) + (1 - alpha) * CE(student, label)."""
+    soft = F.kl_div(
+        F.log_softmax(student_logits / temperature, dim=1),
+        F.softmax(teacher_logits / temperature, dim=1),
+        reduction='batchmean',
+    ) * temperature ** 2
+    if alpha >= 1 or not (labels != UNLABELED).any():
+        return soft
+    hard = F.cross_entropy(student_logits, labels, ignore_index=UNLABELED)
+    return alpha * soft + (1 - alpha) * hard
+
+
+@torch.no_grad()
+def _teacher_batch(images: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    """분류 입력과 교사 logits (inference_mode 가 아닌 no_grad: 학생 학습 그래프에 입력으로 쓰기 때문)."""
+    assert model_service._segmentation_model is not None and model_service._classification_model is not None
+    masks = (torch.sigmoid(model_service._segmentation_model(to_segmentation_input(images))) > 0.5).float()
+    inputs = to_classifier_input(images, masks)
+    return inputs, model_service._classification_model(inputs)
+
+
+@torch.no_grad()
+def evaluate(student: COVID19Classifier, loader: DataLoader, device: torch.device) -> Dict[str, float | None]:
+    """교사와의 top-1 일치율, 라벨 정확도 (학생/교사)."""
+    student.eval()
+    total = agree = labeled = student_correct = teacher_correct = 0
+    for images, labels in loader:
+        images, labels = images.to(device), labels.to(device)
+        inputs, teacher_logits = _teacher_batch(images)
+        student_pred = student(inputs).argmax(dim=1)
+        teacher_pred = teacher_logits.argmax(dim=1)
+        has_label = labels != UNLABELED
+        total += len(labels)
+        agree += int((student_pred == teacher_pred).sum())
+        labeled += int(has_label.sum())
+        student_correct += int((student_pred == labels)[has_label].sum())
+        teacher_correct += int((teacher_pred == labels)[has_label].sum())
+    return {
+        'teacher_agreement': agree / total if total else None,
+        'student_accuracy': student_correct / labeled if labeled else None,
+        'teacher_accuracy': teacher_correct / labeled if labeled else None,
+    }
+
+
+def _latency_ms(module: torch.nn.Module, device: torch.device, repeats: int = 10) -> float:
+    x = torch.randn(1, 3, 224, 224, device=device)
+    module.eval()
+    with torch.inference_mode():
+        module(x)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            module(x)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def distill(args: argparse.Namespace) -> Dict[str, Any]:
+    device = model_service.device
+    model_service.load_model()
+    teacher = model_service._classification_model
+    assert teacher is not None
+    model_service._segmentation_model.eval()
+    teacher.eval()
+
+    if args.cache is not None:
+        # 전처리 캐시 (python -m app.training.cache build) 에서 읽는다
+        cache = DatasetCache.open(args.cache)
+        train_indices, val_indices = cache.split(args.val_ratio, args.limit)
+        train_set, val_set = CachedXrayDataset(cache, train_indices), CachedXrayDataset(cache, val_indices)
+        labels = [cache.labels[i] for i in train_indices + val_indices]
+        source = args.cache
+    else:
+        items = find_images(args.data)
+        if args.limit:
+            items = items[:args.limit]
+        train_items, val_items = split_items(items, args.val_ratio)
+        train_set, val_set = XrayDataset(train_items), XrayDataset(val_items)
+        labels = [label for _, label in items]
+        source = args.data
+    train_images, val_images = len(train_set), len(val_set)
+    if not train_images:
+        raise SystemExit(f'❌ 학습 이미지가 없습니다: {source}')
+    print(f'📂 이미지 {len(labels)}장 (train {train_images} / val {val_images}), '
+          f'라벨 있음 {sum(label != UNLABELED for label in labels)}장')
+
+    train_loader = make_loader(train_set, args.batch_size, shuffle=True, workers=args.workers,
+                               drop_last=train_images > args.batch_size)
+    val_loader = make_loader(val_set, args.batch_size, workers=args.workers)
+
+    student = COVID19Classifier(num_classes=len(CLASS_NAMES), pretrained=args.pretrained, backbone=args.backbone).to(device)
+    optimizer = torch.optim.AdamW(student.parameters(), lr=args.lr, weight_decay=args.weight_decay)
+    scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=max(1, args.epochs * len(train_loader)))
+
+    best: Dict[str, Any] | None = None
+    for epoch in range(1, args.epochs + 1):
+        student.train()
+        started = time.perf_counter()
+        running = 0.0
+        for images, labels in train_loader:
+            images, labels = images.to(device), labels.to(device)
+            # 좌우 반전 증강 (교사도 같은 입력을 보도록 분할 전에 적용)
+            flip = torch.rand(len(images), device=device) < 0.5
+            images = torch.where(flip.view(-1, 1, 1, 1), images.flip(-1), images)
+            inputs, teacher_logits = _teacher_batch(images)
+
+            loss = distillation_loss(student(inputs), teacher_logits, labels, args.temperature, args.alpha)
+            optimizer.zero_grad(set_to_none=True)
+            loss.backward()
+            optimizer.step()
+            scheduler.step()
+            running += loss.item() * len(images)
+
+        scores = evaluate(student, val_loader, device) if val_images else {'teacher_agreement': None}
+        print(f'[epoch {epoch}/{args.epochs}] loss {running / train_images:.4f}, '
+              f'교사 일치율 {scores["teacher_agreement"]}, 정확도 {scores.get("student_accuracy")} '
+              f'({time.perf_counter() - started:.0f}초)')
+
+        agreement = scores['teacher_agreement'] if scores['teacher_agreement'] is not None else -running
+        if best is None or agreement >= best['agreement']:
+            best = {'agreement': agreement, 'epoch': epoch, 'scores': scores,
+                    'state_dict': {k: v.detach().cpu().clone() for k, v in student.state_dict().items()}}
+
+    assert best is not None
+    checkpoint = {
+        'model_state_dict': best['state_dict'],
+        'backbone': args.backbone,
+        'num_classes': len(CLASS_NAMES),
+        'class_names': CLASS_NAMES,
+        'teacher': {'backbone': teacher.backbone_name, 'model_version': model_service.get_model_version()},
+        'distillation': {
+            'temperature': args.temperature,
+            'alpha': args.alpha,
+            'epochs': args.epochs,
+            'best_epoch': best['epoch'],
+            'train_images': train_images,
+            'val_images': val_images,
+        },
+        'val_scores': best['scores'],
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    torch.save(checkpoint, args.output)
+
+    student.load_state_dict(best['state_dict'])
+    report = {
+        'output': str(args.output),
+        'best_epoch': best['epoch'],
+        'val_scores': best['scores'],
+        'teacher_params': sum(p.numel() for p in teacher.parameters()),
+        'student_params': sum(p.numel() for p in student.parameters()),
+        'teacher_latency_ms': _latency_ms(teacher, device),
+        'student_latency_ms': _latency_ms(student, device),
+    }
+    print(f'✅ 저장: {args.output} (epoch {best["epoch"]})')
+    print(f'   파라미터 {report["teacher_params"]:,} → {report["student_params"]:,}, '
+          f'forward {report["teacher_latency_ms"]:.1f}ms → {report["student_latency_ms"]:.1f}ms')
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='ResNet50 교사 → 경량 backbone 지식 증류')
+    parser.add_argument('--data', type=Path, default=None, help='학습 이미지 루트 (클래스 이름 폴더가 있으면 라벨로 사용)')
+    parser.add_argument('--cache', type=Path, default=None, help='전처리 캐시 디렉터리 (python -m app.training.cache build, --data 대신)')
+    parser.add_argument('--backbone', default='resnet18', choices=list(CLASSIFIER_BACKBONES))
+    parser.add_argument('--output', type=Path, default=None, help='기본: clf_<backbone>_distilled.pth')
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--lr', type=float, default=3e-4)
+    parser.add_argument('--weight-decay', type=float, default=1e-4)
+    parser.add_argument('--temperature', type=float, default=4.0)
+    parser.add_argument('--alpha', type=float, default=0.7, help='soft label 손실 비중 (나머지는 라벨 cross entropy)')
+    parser.add_argument('--val-ratio', type=float, default=0.1)
+    parser.add_argument('--limit', type=int, default=0, help='사용할 최대 이미지 수 (0: 전체)')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--pretrained', action='store_true', help='학생 backbone 을 ImageNet 가중치로 초기화')
+    args = parser.parse_args()
+    if (args.data is None) == (args.cache is None):
+        parser.error('--data 와 --cache 중 하나를 지정하세요')
+    if args.output is None:
+        args.output = Path(f'clf_{args.backbone}_distilled.pth')
+
+    distill(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""`import app.main` 의 import 시간 예산 검사.
+
+`python -X importtime` 으로 새 프로세스에서 app.main 을 import 하고
+  - 누적 import 시간이 예산(--budget-ms)을 넘는지
+  - 지연 로딩 대상(torch, torchvision, cv2)이 import 시점에 불러와지는지
+를 확인한다. 하나라도 어기면 종료 코드 1 을 반환하므로 CI 나 배포 전 점검에 쓸 수 있다.
+
+    python importtime_check.py                      # 기본 예산 1500ms
+    python importtime_check.py --budget-ms 1000 --top 15
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_FORBIDDEN = 'torch,torchvision,cv2'
+
+
+def measure(module: str) -> List[Tuple[str, int, int]]:
+    """(모듈, self us, cumulative us) 목록을 import 순서대로 반환한다."""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BASE_DIR, capture_output=True, text=True, env=dict(os.environ),
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f'{module} import 실패:\n{completed.stderr}')
+
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def check(module: str, budget_ms: float, forbidden: List[str], repeat: int, top: int) -> Dict[str, object]:
+    # 디스크 캐시 영향을 줄이기 위해 여러 번 재고 가장 짧은 값을 쓴다
+    runs = [measure(module) for _ in range(max(1, repeat))]
+    totals = [next(cum for name, _, cum in reversed(rows) if name == module) / 1000 for rows in runs]
+    best = runs[totals.index(min(totals))]
+
+    imported = {name for name, _, _ in best}
+    loaded_forbidden = [name for name in forbidden if name in imported]
+    heaviest = sorted(best, key=lambda row: row[1], reverse=True)[:top]
+    return {
+        'module': module,
+        'total_ms': min(totals),
+        'runs_ms': totals,
+        'budget_ms': budget_ms,
+        'forbidden_loaded': loaded_forbidden,
+        'heaviest_self_ms': [{'module': name, 'self_ms': s / 1000, 'cumulative_ms': c / 1000} for name, s, c in heaviest],
+        'ok': min(totals) <= budget_ms and not loaded_forbidden,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='import 시간 예산 검사')
+    parser.add_argument('--module', default='app.main')
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('IMPORT_TIME_BUDGET_MS', '1500')))
+    parser.add_argument('--forbid', default=DEFAULT_FORBIDDEN, help='import 시점에 불러오면 안 되는 모듈 (쉼표 구분)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--json', action='store_true', help='결과를 JSON 으로 출력')
+    args = parser.parse_args()
+
+    forbidden = [name.strip() for name in args.forbid.split(',') if name.strip()]
+    report = check(args.module, args.budget_ms, forbidden, args.repeat, args.top)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0 if report['ok'] else 1
+
+    print(f"📦 import {report['module']}: {report['total_ms']:.0f}ms (예산 {report['budget_ms']:.0f}ms, "
+          f"측정값 {', '.join(f'{t:.0f}' for t in report['runs_ms'])})")
+    print('   self 시간 상위 모듈:')
+    for row in report['heaviest_self_ms']:
+        print(f"     {row['self_ms']:8.1f}ms  {row['module']}")
+    if report['forbidden_loaded']:
+        print(f"❌ 지연 로딩 대상이 import 시점에 로드됨: {', '.join(report['forbidden_loaded'])}")
+    if report['total_ms'] > report['budget_ms']:
+        print('❌ import 시간 예산 초과')
+    if report['ok']:
+        print('✅ import 시간 예산 통과')
+    return 0 if report['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
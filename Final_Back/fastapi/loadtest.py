@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""POST /api/ai/diagnose (또는 /api/ai/diagnose/raw) 부하 테스트.
+
+기본은 앱을 프로세스 안에서 띄운다 (랜덤 가중치 모델 + 인메모리 Mongo + 메모리 CAM 저장소).
+--url 을 주면 이미 떠 있는 서버로 요청을 보낸다.
+
+    # 닫힌 루프: 동시성 1, 2, 4 각각 30초
+    python loadtest.py --concurrency 1,2,4 --duration 30
+    # 열린 루프: 초당 0.5, 1, 2건 도착 (포아송)
+    python loadtest.py --rate 0.5,1,2 --duration 30 --cam-ratio 0.2
+    # 실행 중인 서버 대상
+    python loadtest.py --url http://127.0.0.1:8000 --concurrency 1,4 --output report.json
+    # multipart 대신 raw 본문 엔드포인트(/api/ai/diagnose/raw) 사용
+    python loadtest.py --raw --concurrency 1,4
+
+결과는 단계별 처리량, 지연 백분위, 오류율과 포화 지점을 JSON 과 표로 출력한다.
+httpx 가 필요하다 (pip install httpx).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Dict, List
+
+import numpy as np
+from PIL import Image
+
+DIAGNOSE_PATH = '/api/ai/diagnose'
+RAW_DIAGNOSE_PATH = '/api/ai/diagnose/raw'
+
+
+@dataclass
+class StepResult:
+    mode: str
+    load: float
+    duration: float
+    sent: int = 0
+    completed: int = 0
+    errors: Dict[str, int] = field(default_factory=dict)
+    throughput_rps: float = 0.0
+    error_rate: float = 0.0
+    latency_seconds: Dict[str, float | None] = field(default_factory=dict)
+
+
+def _percentiles(values: List[float]) -> Dict[str, float | None]:
+    if not values:
+        return {key: None for key in ('mean', 'p50', 'p90', 'p95', 'p99', 'max')}
+    arr = np.asarray(values)
+    return {
+        'mean': float(arr.mean()),
+        'p50': float(np.percentile(arr, 50)),
+        'p90': float(np.percentile(arr, 90)),
+        'p95': float(np.percentile(arr, 95)),
+        'p99': float(np.percentile(arr, 99)),
+        'max': float(arr.max()),
+    }
+
+
+def make_images(sizes: List[int], seed: int) -> Dict[int, bytes]:
+    """크기별 흉부 X-ray 비슷한 그레이스케일 PNG (노이즈 + 밝기 기울기)."""
+    rng = np.random.default_rng(seed)
+    images = {}
+    for size in sizes:
+        yy, xx = np.mgrid[0:size, 0:size]
+        base = 128 + 60 * np.sin(xx / size * np.pi) * np.cos(yy / size * np.pi)
+        noise = rng.normal(0, 20, (size, size))
+        gray = np.clip(base + noise, 0, 255).astype(np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(gray).convert('RGB').save(buffer, format='PNG')
+        images[size] = buffer.getvalue()
+    return images
+
+
+class LoadGenerator:
+    def __init__(self, client: Any, images: Dict[int, bytes], cam_ratio: float, priority: str | None, seed: int,
+                 raw: bool = False):
+        self.client = client
+        self.images = images
+        self.cam_ratio = cam_ratio
+        self.priority = priority
+        self.raw = raw
+        self.random = random.Random(seed)
+        self.sequence = itertools.count()
+
+    def _post(self, size: int, data: Dict[str, str]) -> Any:
+        if self.raw:
+            return self.client.post(RAW_DIAGNOSE_PATH, params=data, content=self.images[size],
+                                    headers={'Content-Type': 'application/octet-stream'})
+        files = {'image': (f'loadtest_{size}.png', self.images[size], 'image/png')}
+        return self.client.post(DIAGNOSE_PATH, data=data, files=files)
+
+    async def send(self, step: StepResult, latencies: List[float]) -> None:
+        size = self.random.choice(list(self.images))
+        # 요청마다 다른 환자로 보내 근접 중복 재사용(app/services/near_duplicate.py)을 피한다
+        data = {'patient_id': f'loadtest-{next(self.sequence)}', 'cam_methods': 'all' if self.random.random() < self.cam_ratio else 'none'}
+        if self.priority:
+            data['priority'] = self.priority
+
+        step.sent += 1
+        start = time.perf_counter()
+        retry_after = None
+        try:
+            response = await self._post(size, data)
+            status = str(response.status_code)
+            retry_after = response.headers.get('retry-after') if status == '503' else None
+        except Exception as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - start
+
+        if status == '200':
+            step.completed += 1
+            latencies.append(elapsed)
+        else:
+            step.errors[status] = step.errors.get(status, 0) + 1
+            if retry_after:
+                # 부하 차단(503) 응답은 실제 클라이언트처럼 Retry-After 만큼 쉬고 다시 보낸다
+                await asyncio.sleep(float(retry_after))
+
+    async def closed_loop(self, concurrency: int, duration: float) -> StepResult:
+        """동시성 N: 각 가상 사용자가 응답을 받자마자 다음 요청을 보낸다."""
+        step = StepResult(mode='closed', load=concurrency, duration=duration)
+        latencies: List[float] = []
+        stop_at = time.perf_counter() + duration
+
+        async def user() -> None:
+            while time.perf_counter() < stop_at:
+                await self.send(step, latencies)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        return self._finish(step, latencies, time.perf_counter() - started)
+
+    async def open_loop(self, rate: float, duration: float) -> StepResult:
+        """도착률 r: 응답과 무관하게 포아송 과정으로 요청을 보낸다."""
+        step = StepResult(mode='open', load=rate, duration=duration)
+        latencies: List[float] = []
+        tasks: List[asyncio.Task] = []
+
+        started = time.perf_counter()
+        next_at = started
+        while True:
+            next_at += self.random.expovariate(rate)
+            if next_at - started >= duration:
+                break
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+            tasks.append(asyncio.create_task(self.send(step, latencies)))
+        await asyncio.gather(*tasks)
+        return self._finish(step, latencies, time.perf_counter() - started)
+
+    @staticmethod
+    def _finish(step: StepResult, latencies: List[float], elapsed: float) -> StepResult:
+        step.duration = elapsed
+        step.throughput_rps = step.completed / elapsed if elapsed > 0 else 0.0
+        step.error_rate = (step.sent - step.completed) / step.sent if step.sent else 0.0
+        step.latency_seconds = _percentiles(latencies)
+        return step
+
+
+def find_saturation(steps: List[StepResult], max_error_rate: float = 0.01) -> Dict[str, Any] | None:
+    """포화 지점: 처리량이 더 늘지 않거나(10% 미만 증가) 오류/미처리가 생기기 시작한 첫 단계."""
+    previous: StepResult | None = None
+    for step in steps:
+        if step.error_rate > max_error_rate:
+            return {'load': step.load, 'reason': 'error_rate', 'throughput_rps': step.throughput_rps}
+        if step.mode == 'open' and step.throughput_rps < step.load * 0.9:
+            return {'load': step.load, 'reason': 'throughput_below_offered', 'throughput_rps': step.throughput_rps}
+        if step.mode == 'closed' and previous is not None and step.throughput_rps < previous.throughput_rps * 1.1:
+            return {'load': previous.load, 'reason': 'throughput_plateau', 'throughput_rps': previous.throughput_rps}
+        previous = step
+    return None
+
+
+def format_summary(report: Dict[str, Any]) -> str:
+    lines = [
+        f"대상: {report['target']} ({report['endpoint']})  |  이미지 크기: {report['image_sizes']}  |  CAM 비율: {report['cam_ratio']}",
+        f"{'mode':<7}{'load':>7}{'sent':>7}{'ok':>7}{'err%':>7}{'rps':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}",
+    ]
+    for step in report['steps']:
+        lat = step['latency_seconds']
+
+        def fmt(value: float | None) -> str:
+            return f'{value:8.3f}' if value is not None else f"{'-':>8}"
+
+        lines.append(
+            f"{step['mode']:<7}{step['load']:>7g}{step['sent']:>7}{step['completed']:>7}"
+            f"{step['error_rate'] * 100:>7.1f}{step['throughput_rps']:>8.2f}"
+            f"{fmt(lat['p50'])}{fmt(lat['p95'])}{fmt(lat['p99'])}{fmt(lat['max'])}"
+        )
+    saturation = report['saturation']
+    if saturation:
+        lines.append(f"포화 지점: load={saturation['load']:g} ({saturation['reason']}, {saturation['throughput_rps']:.2f} rps)")
+    else:
+        lines.append('포화 지점: 측정 범위 안에서 도달하지 않음')
+    return '\n'.join(lines)
+
+
+@asynccontextmanager
+async def in_process_client() -> AsyncIterator[Any]:
+    """랜덤 가중치 모델과 인메모리 Mongo 로 앱을 띄운다 (설정은 import 전에 환경 변수로 지정)."""
+    import httpx
+
+    os.environ.setdefault('MODEL_STANDIN', 'random')
+    os.environ.setdefault('MONGODB_URI', 'memory://')
+    os.environ.setdefault('CAM_STORE_BACKEND', 'memory')
+    os.environ.setdefault('GRADCAM_STORAGE_PATH', tempfile.mkdtemp(prefix='loadtest-'))
+
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://loadtest', timeout=None) as client:
+            yield client
+
+
+@asynccontextmanager
+async def remote_client(url: str, timeout: float) -> AsyncIterator[Any]:
+    import httpx
+
+    async with httpx.AsyncClient(base_url=url, timeout=timeout) as client:
+        yield client
+
+
+def _parse_numbers(value: str) -> List[float]:
+    return [float(v) for v in value.split(',') if v.strip()]
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    images = make_images([int(s) for s in _parse_numbers(args.image_sizes)], args.seed)
+    client_cm = remote_client(args.url, args.timeout) if args.url else in_process_client()
+
+    steps: List[StepResult] = []
+    async with client_cm as client:
+        generator = LoadGenerator(client, images, args.cam_ratio, args.priority, args.seed, raw=args.raw)
+        for _ in range(args.warmup):
+            await generator.send(StepResult(mode='warmup', load=0, duration=0), [])
+
+        if args.rate:
+            for rate in _parse_numbers(args.rate):
+                print(f'▶ 열린 루프: {rate:g} req/s, {args.duration:g}초')
+                steps.append(await generator.open_loop(rate, args.duration))
+        else:
+            for concurrency in _parse_numbers(args.concurrency):
+                print(f'▶ 닫힌 루프: 동시성 {int(concurrency)}, {args.duration:g}초')
+                steps.append(await generator.closed_loop(int(concurrency), args.duration))
+
+        server_metrics = None
+        try:
+            server_metrics = (await client.get('/api/ai/metrics')).json()
+        except Exception:
+            pass
+
+    return {
+        'target': args.url or 'in-process (MODEL_STANDIN=random, MONGODB_URI=memory://)',
+        'endpoint': RAW_DIAGNOSE_PATH if args.raw else DIAGNOSE_PATH,
+        'image_sizes': list(images),
+        'cam_ratio': args.cam_ratio,
+        'steps': [asdict(step) for step in steps],
+        'saturation': find_saturation(steps, args.max_error_rate),
+        'server_metrics': server_metrics,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='/api/ai/diagnose 부하 테스트')
+    parser.add_argument('--url', default=None, help='대상 서버 (생략 시 프로세스 내 실행)')
+    parser.add_argument('--concurrency', default='1,2,4', help='닫힌 루프 동시성 단계 (쉼표 구분)')
+    parser.add_argument('--rate', default=None, help='열린 루프 도착률 단계 req/s (지정 시 열린 루프)')
+    parser.add_argument('--duration', type=float, default=30.0, help='단계별 실행 시간 (초)')
+    parser.add_argument('--image-sizes', default='512,1024', help='업로드 이미지 한 변 크기 (무작위 선택)')
+    parser.add_argument('--cam-ratio', type=float, default=0.0, help='CAM 을 요청하는 비율 (0~1)')
+    parser.add_argument('--priority', default=None, help='요청 우선순위 (urgent/routine/bulk)')
+    parser.add_argument('--raw', action='store_true', help='multipart 대신 raw 본문 엔드포인트로 전송')
+    parser.add_argument('--warmup', type=int, default=1, help='측정 전 요청 수')
+    parser.add_argument('--timeout', type=float, default=120.0, help='원격 요청 타임아웃 (초)')
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='JSON 보고서 경로')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'📄 보고서 저장: {args.output}')
+    print()
+    print(format_summary(report))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
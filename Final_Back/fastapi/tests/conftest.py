@@ -0,0 +1,8 @@
+"""테스트 공통 환경 (설정은 get_settings() 가 처음 불릴 때 읽히므로 app 을 import 하기 전에 정한다)."""
+import os
+import tempfile
+
+# 체크포인트 없이 고정 시드 랜덤 가중치 모델, CPU
+os.environ.setdefault('MODEL_STANDIN', 'random')
+os.environ.setdefault('CUDA_VISIBLE_DEVICES', '')
+os.environ.setdefault('GRADCAM_STORAGE_PATH', tempfile.mkdtemp(prefix='gradcam-test-'))
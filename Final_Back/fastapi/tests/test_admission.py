@@ -0,0 +1,69 @@
+"""적응형 동시 처리 한도: 덧셈 증가 / 곱셈 감소 / 한도 초과 거절."""
+import pytest
+
+from app.services.admission import AdaptiveLimiter, Overloaded
+
+
+def _limiter(**kwargs):
+    options = {'initial_limit': 4, 'min_limit': 2, 'max_limit': 6, 'backoff': 0.5, 'queue_tolerance': 2.0}
+    options.update(kwargs)
+    return AdaptiveLimiter(**options)
+
+
+def test_increases_by_one_when_busy_and_fast():
+    limiter = _limiter()
+    limiter.on_sample(latency=0.1, service=0.1, in_flight=2, dropped=False)
+    assert limiter.limit == 5
+    assert limiter.increases == 1
+    # 최대 한도에서 멈춘다
+    for _ in range(5):
+        limiter.on_sample(latency=0.1, service=0.1, in_flight=6, dropped=False)
+    assert limiter.limit == 6
+
+
+def test_does_not_increase_when_mostly_idle():
+    limiter = _limiter()
+    limiter.on_sample(latency=0.1, service=0.1, in_flight=1, dropped=False)
+    assert limiter.limit == 4
+    assert limiter.increases == limiter.decreases == 0
+
+
+@pytest.mark.parametrize('sample', [
+    {'latency': 0.5, 'service': 0.1, 'in_flight': 4, 'dropped': False},  # 대기 비율 5 > 2
+    {'latency': 0.1, 'service': None, 'in_flight': 4, 'dropped': True},  # 마감/대기열 초과
+    {'latency': 3.0, 'service': 3.0, 'in_flight': 4, 'dropped': False},  # 목표 지연 초과
+])
+def test_decreases_multiplicatively_on_overload(sample):
+    limiter = _limiter(target_latency=1.0)
+    limiter.on_sample(**sample)
+    assert limiter.limit == 2
+    assert limiter.decreases == 1
+    # 최소 한도 아래로는 내려가지 않는다
+    limiter.on_sample(**sample)
+    assert limiter.limit == 2
+
+
+def test_sheds_above_limit_and_admits_after_release():
+    limiter = _limiter(initial_limit=2)
+    tickets = [limiter.acquire('routine'), limiter.acquire('urgent')]
+    with pytest.raises(Overloaded) as excinfo:
+        limiter.acquire('bulk')
+    assert excinfo.value.limit == 2
+    assert limiter.shed == {'bulk': 1}
+    assert limiter.in_flight == 2
+
+    tickets[0].release(sample=False)
+    tickets[0].release(sample=False)  # 두 번 불러도 한 번만 반영
+    assert limiter.in_flight == 1
+    limiter.acquire('bulk')
+    assert limiter.admitted == 3
+    assert limiter.stats()['shed'] == {'bulk': 1}
+
+
+def test_release_feeds_sample_with_in_flight_at_admission():
+    limiter = _limiter(initial_limit=2)
+    first = limiter.acquire('routine')
+    limiter.acquire('routine')
+    # 첫 요청은 들어올 때 처리 중 1건 (1 * 2 >= 2) → 빠르게 끝나면 한도 증가
+    first.release(service_seconds=1.0)
+    assert limiter.limit == 3
@@ -0,0 +1,32 @@
+"""학습 캐시 생성: 읽을 수 없는 마스크는 마스크 없는 샘플로 남는다."""
+import numpy as np
+from PIL import Image
+
+from app.training.cache import build_cache
+
+
+def _write_image(path, value):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.fromarray(np.full((32, 32, 3), value, dtype=np.uint8)).save(path)
+
+
+def test_corrupt_mask_is_treated_as_missing(tmp_path):
+    root = tmp_path / 'data'
+    _write_image(root / 'COVID' / 'images' / 'good.png', 100)
+    _write_image(root / 'COVID' / 'images' / 'broken.png', 150)
+    good_mask = np.zeros((32, 32), dtype=np.uint8)
+    good_mask[8:24, 8:24] = 255
+    (root / 'COVID' / 'masks').mkdir(parents=True)
+    Image.fromarray(good_mask).save(root / 'COVID' / 'masks' / 'good.png')
+    (root / 'COVID' / 'masks' / 'broken.png').write_bytes(b'not a png')
+
+    cache = build_cache(root, tmp_path / 'cache', size=(16, 16), workers=1)
+
+    by_path = {path: i for i, path in enumerate(cache.paths)}
+    broken = by_path['COVID/images/broken.png']
+    good = by_path['COVID/images/good.png']
+    assert all(cache.ok)
+    assert cache.has_mask[good] is True
+    assert cache.has_mask[broken] is False
+    assert cache.masks[broken].sum() == 0
+    assert cache.masks[good].sum() > 0
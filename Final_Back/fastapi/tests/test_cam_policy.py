@@ -0,0 +1,50 @@
+"""CAM 정책: 요청 명시 → 비활성 → 클래스 생략 → 신뢰도 범위 순으로 판단하는지."""
+import pytest
+
+from app.services.cam_policy import CAM_METHOD_NAMES, CamPolicy, parse_cam_methods
+
+
+def _policy(**kwargs):
+    options = {
+        'methods': ('gradcam', 'layercam'),
+        'skip_classes': frozenset({'Normal'}),
+        'min_confidence': 0.5,
+        'max_confidence': 0.95,
+    }
+    options.update(kwargs)
+    return CamPolicy(**options)
+
+
+def test_requested_methods_override_every_policy_rule():
+    # 비활성 + 생략 클래스 + 범위 밖 신뢰도여도 요청이 이긴다
+    policy = _policy(methods=())
+    assert policy.decide(['gradcam_plus'], 'Normal', 0.99) == (['gradcam_plus'], None)
+    assert policy.decide([], 'COVID', 0.7) == ([], 'not_requested')
+
+
+def test_disabled_is_reported_before_class_and_confidence():
+    assert _policy(methods=()).decide(None, 'Normal', 0.99) == ([], 'disabled')
+
+
+def test_skipped_class_is_reported_before_confidence():
+    assert _policy().decide(None, 'Normal', 0.99) == ([], 'class_skipped')
+
+
+@pytest.mark.parametrize('confidence', [0.49, 0.96])
+def test_confidence_out_of_range(confidence):
+    assert _policy().decide(None, 'COVID', confidence) == ([], 'confidence_out_of_range')
+
+
+@pytest.mark.parametrize('confidence', [0.5, 0.95])
+def test_confidence_bounds_are_inclusive(confidence):
+    assert _policy().decide(None, 'COVID', confidence) == (['gradcam', 'layercam'], None)
+
+
+def test_parse_cam_methods():
+    assert parse_cam_methods(None) is None
+    assert parse_cam_methods(' ') is None
+    assert parse_cam_methods('all') == list(CAM_METHOD_NAMES)
+    assert parse_cam_methods('none') == []
+    assert parse_cam_methods('layercam, gradcam,gradcam') == ['gradcam', 'layercam']
+    with pytest.raises(ValueError):
+        parse_cam_methods('gradcam,scorecam')
@@ -0,0 +1,112 @@
+"""CAM 이미지 저장소: 저장 키와 LRU/TTL 색인."""
+import os
+
+import pytest
+
+from app.services import cam_store
+from app.services.cam_store import DiskCamStore, MemoryCamStore, make_key, render_digest
+
+
+def test_key_changes_with_render_settings():
+    base = render_digest('webp', 80, False)
+    assert base == render_digest('webp', 80, False)
+    changed = {
+        render_digest('webp', 80, True),
+        render_digest('webp', 60, False),
+        render_digest('png', 80, False),
+        render_digest('webp', 80, False, alpha=0.5),
+        render_digest('webp', 80, False, colormap='turbo'),
+    }
+    assert base not in changed and len(changed) == 5
+
+    key = make_key('a' * 64, 'gradcam', 'v1/2', 'webp', base)
+    assert key == f'{"a" * 32}_gradcam_v1-2_{base}.webp'
+    assert make_key('a' * 64, 'gradcam', 'v1', 'webp', render_digest('webp', 80, True)) != make_key(
+        'a' * 64, 'gradcam', 'v1', 'webp', base)
+
+
+class _Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cam_store.time, 'time', clock)
+    return clock
+
+
+def test_evicts_least_recently_used_by_size(clock):
+    store = MemoryCamStore(max_bytes=30, max_age=3600)
+    for key in ('a', 'b', 'c'):
+        store.put(key, b'x' * 10)
+        clock.now += 1
+    assert store.get_url('a') is not None  # a 가 가장 최근 접근
+    clock.now += 1
+    store.put('d', b'x' * 10)
+
+    assert store.contains('a') and store.contains('c') and store.contains('d')
+    assert not store.contains('b')
+    assert store.stats()['bytes'] == 30
+    assert store.evictions == 1
+
+
+def test_evicts_by_entry_count(clock):
+    store = MemoryCamStore(max_bytes=1 << 20, max_age=3600, max_entries=2)
+    for key in ('a', 'b', 'c'):
+        store.put(key, b'x')
+        clock.now += 1
+
+    assert [key for key in 'abc' if store.contains(key)] == ['b', 'c']
+    assert store.stats()['entries'] == 2
+
+
+def test_idle_entries_expire(clock):
+    store = MemoryCamStore(max_bytes=1 << 20, max_age=60)
+    url = store.put('a', b'x')
+    clock.now += 30
+    assert store.get_url('a') == url  # 접근하면 TTL 이 다시 시작된다
+    clock.now += 59
+    assert store.contains('a')
+    clock.now += 2
+    assert not store.contains('a')
+    assert store.get_url('a') is None
+    assert store.read('a') is None and store.stats()['entries'] == 0
+
+
+def test_overwrite_replaces_bytes_atomically(tmp_path, monkeypatch):
+    store = DiskCamStore(tmp_path, max_bytes=1 << 20, max_age=3600)
+    store.put('a.webp', b'old')
+    store.put('a.webp', b'newer')
+    assert store.read('a.webp') == b'newer'
+    assert store.stats()['bytes'] == 5 and store.stats()['entries'] == 1
+
+    # 쓰기 도중 실패하면 이전 파일이 그대로 남고 임시 파일은 지워진다
+    def fail(*args):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(cam_store.os, 'replace', fail)
+    with pytest.raises(OSError):
+        store.put('a.webp', b'broken')
+    assert store.read('a.webp') == b'newer'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['a.webp']
+
+
+def test_rescans_existing_files_on_start(tmp_path):
+    for index, name in enumerate(('old.webp', 'mid.webp', 'new.webp')):
+        path = tmp_path / name
+        path.write_bytes(b'x' * 10)
+        os.utime(path, (1000 + index, 1000 + index))
+    (tmp_path / '.tmp-partial').write_bytes(b'x')
+
+    store = DiskCamStore(tmp_path, max_bytes=20, max_age=10 ** 12)
+    # 남은 임시 파일은 지우고, 용량을 넘는 가장 오래된 파일부터 축출한다
+    assert not (tmp_path / '.tmp-partial').exists()
+    assert not (tmp_path / 'old.webp').exists()
+    assert store.contains('mid.webp') and store.contains('new.webp')
+    assert store.stats()['bytes'] == 20
+    assert store.get_url('new.webp') == '/static/gradcam/new.webp'
@@ -0,0 +1,81 @@
+"""내보내기 인코더: 배치를 이어 붙인 결과가 온전한 CSV / Parquet 파일인지."""
+import csv
+import io
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app.services.export import EXPORT_COLUMNS, CsvEncoder, export_row, make_encoder
+
+COLUMNS = [name for name, _ in EXPORT_COLUMNS]
+
+
+def _rows(count, start=0):
+    created = datetime(2026, 1, 1)
+    return [
+        export_row({
+            '_id': ObjectId(),
+            'created_at': created + timedelta(minutes=start + i),
+            'patient_id': f'P{start + i:03d}',
+            'predicted_class': 'COVID',
+            'confidence': 0.9,
+            'probabilities': {'COVID': 0.9, 'Normal': 0.1},
+            'cam_paths': {'layercam_path': 'x.png', 'gradcam_path': 'y.png'},
+            'timings': {'total': 0.25},
+        })
+        for i in range(count)
+    ]
+
+
+def _encode(encoder, batches):
+    return b''.join([encoder.encode(batch) for batch in batches] + [encoder.close()])
+
+
+def test_csv_empty_export_is_header_only():
+    data = _encode(CsvEncoder(), [])
+    assert list(csv.reader(io.StringIO(data.decode('utf-8')))) == [COLUMNS]
+
+
+def test_csv_header_is_written_once_across_batches():
+    encoder = CsvEncoder()
+    data = _encode(encoder, [_rows(2), _rows(3, start=2)])
+    records = list(csv.reader(io.StringIO(data.decode('utf-8'))))
+    assert records[0] == COLUMNS
+    assert records.count(COLUMNS) == 1
+    assert [record[COLUMNS.index('patient_id')] for record in records[1:]] == [f'P{i:03d}' for i in range(5)]
+    assert records[1][COLUMNS.index('cam_methods')] == 'gradcam,layercam'
+    assert encoder.rows == 5
+
+
+def test_csv_close_after_rows_adds_nothing():
+    encoder = CsvEncoder()
+    encoder.encode(_rows(1))
+    assert encoder.close() == b''
+
+
+def test_parquet_one_row_group_per_batch():
+    pq = pytest.importorskip('pyarrow.parquet')
+    data = _encode(make_encoder('parquet'), [_rows(2), _rows(3, start=2)])
+    assert data[:4] == data[-4:] == b'PAR1'
+    parquet = pq.ParquetFile(io.BytesIO(data))
+    assert parquet.metadata.num_row_groups == 2
+    assert parquet.metadata.num_rows == 5
+    table = parquet.read()
+    assert table.column_names == COLUMNS
+    assert table.column('patient_id').to_pylist() == [f'P{i:03d}' for i in range(5)]
+    assert str(table.schema.field('created_at').type) == 'timestamp[us, tz=UTC]'
+
+
+def test_parquet_empty_export_has_schema_and_footer():
+    pq = pytest.importorskip('pyarrow.parquet')
+    data = _encode(make_encoder('parquet'), [])
+    assert data[:4] == data[-4:] == b'PAR1'
+    parquet = pq.ParquetFile(io.BytesIO(data))
+    assert parquet.metadata.num_rows == 0
+    assert parquet.schema_arrow.names == COLUMNS
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        make_encoder('xlsx')
@@ -0,0 +1,61 @@
+"""목록 조회 / keyset cursor / 내보내기 쿼리의 인덱스 사용 (explain). 실제 mongod 가 있을 때만 실행한다."""
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from app.core.config import get_settings
+from app.db import indexes
+from app.db.session import MongoSession
+
+NOW = datetime.now(timezone.utc)
+CASES = indexes.index_check_cases(NOW)
+
+
+def _mongo_uri() -> str:
+    uri = get_settings().mongo_uri
+    if uri.startswith('memory://'):
+        pytest.skip('explain 점검은 실제 mongod 가 필요합니다 (MONGODB_URI).')
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+
+    client = MongoClient(uri, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command('ping')
+    except PyMongoError as e:
+        pytest.skip(f'mongod 에 연결할 수 없습니다 ({uri}, {type(e).__name__}).')
+    finally:
+        client.close()
+    return uri
+
+
+@pytest.fixture(scope='module')
+def explained():
+    """케이스 이름 → explain 에 나온 인덱스 이름 (COLLSCAN 포함)."""
+    uri = _mongo_uri()
+
+    async def run():
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        client = AsyncIOMotorClient(uri)
+        try:
+            session = MongoSession(client[get_settings().mongo_db])
+            scratch = await indexes.create_index_check_collection(session, NOW)
+            try:
+                return {
+                    label: await indexes.explain_index_usage(scratch, query, **options)
+                    for label, query, options, _ in CASES
+                }
+            finally:
+                await scratch.drop()
+        finally:
+            client.close()
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize('label, expected', [(label, expected) for label, _, _, expected in CASES])
+def test_query_uses_index(explained, label, expected):
+    used = explained[label]
+    assert 'COLLSCAN' not in used
+    assert expected in used
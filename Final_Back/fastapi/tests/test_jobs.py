@@ -0,0 +1,169 @@
+"""MongoDB 작업 큐: 가져가기, lease 연장/만료, 실패 처리, 취소, 결과 쓰기 (MongoDB 대용품)."""
+import asyncio
+import time
+from datetime import timedelta
+
+import pytest
+
+from app.db.memory import InMemoryCollection
+from app.services import jobs
+from app.services.jobs import JobClient, JobWorker
+
+
+def _worker(collection, worker_id='w1', **kwargs):
+    options = {'batch_size': 4, 'lease_seconds': 60, 'max_attempts': 2, 'poll_interval': 0.01}
+    options.update(kwargs)
+    return JobWorker(collection, worker_id=worker_id, **options)
+
+
+async def _submit(collection, priority='routine', image=b'img'):
+    return await JobClient(collection).submit(image, priority)
+
+
+async def _doc(collection, job_id):
+    return await collection.find_one({'_id': job_id})
+
+
+def test_claim_takes_highest_priority_then_oldest():
+    async def run():
+        collection = InMemoryCollection('inference_jobs')
+        bulk = await _submit(collection, 'bulk')
+        routine_old = await _submit(collection, 'routine')
+        routine_new = await _submit(collection, 'routine')
+        urgent = await _submit(collection, 'urgent')
+        worker = _worker(collection, batch_size=3)
+        claimed = await worker.claim_batch()
+        return claimed, [bulk, routine_old, routine_new, urgent], await _doc(collection, bulk)
+
+    claimed, (bulk, routine_old, routine_new, urgent), remaining = asyncio.run(run())
+    assert [job['_id'] for job in claimed] == [urgent, routine_old, routine_new]
+    assert all(job['status'] == 'running' and job['worker_id'] == 'w1' and job['attempts'] == 1 for job in claimed)
+    assert remaining['status'] == 'queued'
+
+
+def test_expired_lease_is_reclaimed_until_attempts_run_out():
+    async def run():
+        collection = InMemoryCollection('inference_jobs')
+        job_id = await _submit(collection)
+        first = _worker(collection, 'w1')
+        second = _worker(collection, 'w2')
+        assert (await first.claim())['_id'] == job_id
+        # lease 가 살아 있으면 다른 워커가 가져가지 못한다
+        assert await second.claim() is None
+
+        expire = {'$set': {'lease_until': jobs._now() - timedelta(seconds=1)}}
+        await collection.update_one({'_id': job_id}, expire)
+        reclaimed = await second.claim()
+        await collection.update_one({'_id': job_id}, expire)
+        # max_attempts(2) 를 다 썼으므로 더는 가져가지 않고 reap 으로 실패 처리한다
+        exhausted = await first.claim()
+        reaped = await first.reap()
+        return reclaimed, exhausted, reaped, await _doc(collection, job_id)
+
+    reclaimed, exhausted, reaped, document = asyncio.run(run())
+    assert reclaimed['worker_id'] == 'w2' and reclaimed['attempts'] == 2
+    assert exhausted is None
+    assert reaped == 1
+    assert document['status'] == 'failed' and document['error_type'] == 'lease_expired'
+    assert 'image' not in document
+
+
+def test_reap_leaves_live_and_retryable_jobs():
+    async def run():
+        collection = InMemoryCollection('inference_jobs')
+        live, retryable = await _submit(collection), await _submit(collection)
+        worker = _worker(collection, max_attempts=3)
+        await worker.claim_batch()
+        await collection.update_one({'_id': retryable}, {'$set': {'lease_until': jobs._now() - timedelta(seconds=1)}})
+        return await worker.reap(), await _doc(collection, live), await _doc(collection, retryable)
+
+    reaped, live, retryable = asyncio.run(run())
+    assert reaped == 0
+    assert live['status'] == 'running' and retryable['status'] == 'running'
+
+
+def test_cancel_only_affects_queued_jobs():
+    async def run():
+        collection = InMemoryCollection('inference_jobs')
+        client = JobClient(collection)
+        queued, running = await client.submit(b'a', 'routine'), await client.submit(b'b', 'routine')
+        await collection.update_one({'_id': running}, {'$set': {'status': 'running'}})
+        await client.cancel(queued)
+        await client.cancel(running)
+        return client, await _doc(collection, queued), await _doc(collection, running)
+
+    client, queued, running = asyncio.run(run())
+    assert queued['status'] == 'cancelled' and 'image' not in queued
+    assert running['status'] == 'running'
+    assert client.cancelled == 1
+
+
+def test_finish_requires_current_lease_holder():
+    async def run():
+        collection = InMemoryCollection('inference_jobs')
+        job_id = await _submit(collection)
+        owner, other = _worker(collection, 'w1'), _worker(collection, 'w2')
+        job = await owner.claim()
+        rejected = await other._finish(job, {'status': 'done', 'result': {'by': 'w2'}})
+        accepted = await owner._finish(job, {'status': 'done', 'result': {'by': 'w1'}})
+        # 이미 끝난 작업에 늦게 도착한 결과도 버린다
+        late = await owner._finish(job, {'status': 'failed'})
+        return other, (rejected, accepted, late), await _doc(collection, job_id)
+
+    other, outcomes, document = asyncio.run(run())
+    assert outcomes == (False, True, False)
+    assert other.stale == 1
+    assert document['status'] == 'done' and document['result'] == {'by': 'w1'}
+    assert 'image' not in document and 'finished_at' in document
+
+
+def test_heartbeat_extends_lease():
+    async def run():
+        collection = InMemoryCollection('inference_jobs')
+        job_id = await _submit(collection)
+        worker = _worker(collection, lease_seconds=0.3)
+        await worker.claim()
+        before = (await _doc(collection, job_id))['lease_until']
+        done = asyncio.Event()
+        heartbeat = asyncio.create_task(worker._extend_leases([job_id], done))
+        await asyncio.sleep(0.25)
+        done.set()
+        held = await heartbeat
+        return held, before, (await _doc(collection, job_id))['lease_until']
+
+    held, before, after = asyncio.run(run())
+    assert held
+    assert after > before
+
+
+class _BrokenHeartbeatCollection(InMemoryCollection):
+    async def update_many(self, filter, update):
+        raise RuntimeError('connection reset')
+
+
+@pytest.fixture
+def fake_predict_batch(monkeypatch):
+    from app.services import model as model_service
+    from app.services import near_duplicate
+
+    def predict_batch(images, contexts, cam_methods, patient_ids):
+        time.sleep(0.1)
+        return [{'predicted_class': 'Normal', 'cam_urls': {}, 'perceptual_hash': 1} for _ in images]
+
+    monkeypatch.setattr(model_service, 'predict_batch', predict_batch)
+    monkeypatch.setattr(near_duplicate, 'get_near_duplicate_index', lambda: None)
+
+
+def test_heartbeat_failure_does_not_abort_finished_batch(fake_predict_batch):
+    async def run():
+        collection = _BrokenHeartbeatCollection('inference_jobs')
+        job_ids = [await _submit(collection), await _submit(collection)]
+        worker = _worker(collection, lease_seconds=0.03)
+        await worker.process(await worker.claim_batch())
+        return worker, [await _doc(collection, job_id) for job_id in job_ids]
+
+    worker, documents = asyncio.run(run())
+    assert worker.leases_lost == 2
+    # 다른 워커가 가져가지 않았으므로 결과는 그대로 반영된다
+    assert [document['status'] for document in documents] == ['done', 'done']
+    assert worker.processed == 2 and worker.stats()['leases_lost'] == 2
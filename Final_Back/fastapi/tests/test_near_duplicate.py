@@ -0,0 +1,96 @@
+"""근접 중복 색인과 이전 결과 재사용."""
+import numpy as np
+import pytest
+
+from app.services import model as model_service
+from app.services.cam_store import MemoryCamStore
+from app.services.near_duplicate import REUSED_FIELDS, NearDuplicateIndex
+from app.services.pipeline import PipelineContext
+
+PHASH = 0x0123456789ABCDEF
+
+
+def _result(cam_urls):
+    return {
+        'predicted_class': 'Normal',
+        'confidence': 0.9,
+        'probabilities': {'COVID': 0.05, 'Lung_Opacity': 0.03, 'Normal': 0.9, 'Viral Pneumonia': 0.02},
+        'findings': [],
+        'recommendations': [],
+        'ai_notes': 'note',
+        'model_version': 'v1',
+        'precision': 'fp32',
+        'embedding': np.ones(512, dtype=np.float32),
+        'timings': {'total': 1.0},
+        'cam_urls': cam_urls,
+        'cam_methods': ['gradcam'] if cam_urls else [],
+        'gradcam_path': 'data:image/webp;base64,' + 'A' * 1000,
+    }
+
+
+@pytest.fixture
+def reuse(monkeypatch):
+    """색인/CAM 저장소/모델 버전을 고정한 _reuse_near_duplicate."""
+    index = NearDuplicateIndex(threshold=4, window_seconds=3600)
+    store = MemoryCamStore(max_bytes=1 << 20, max_age=3600)
+    monkeypatch.setattr(model_service, 'get_near_duplicate_index', lambda: index)
+    monkeypatch.setattr(model_service, 'get_cam_store', lambda: store)
+    monkeypatch.setattr(model_service, 'get_model_version', lambda: 'v1')
+
+    def run(cam_methods=None):
+        return model_service._reuse_near_duplicate(PHASH ^ 1, 'p1', cam_methods, PipelineContext())
+
+    return index, store, run
+
+
+def test_index_keeps_only_reused_fields():
+    index = NearDuplicateIndex(threshold=4, window_seconds=3600)
+    index.add('rec1', PHASH, 'p1', _result({}))
+    entry, distance = index.find(PHASH, 'p1')
+    assert distance == 0
+    assert set(entry.result) <= set(REUSED_FIELDS)
+    assert 'embedding' not in entry.result and 'gradcam_path' not in entry.result
+
+
+def test_reuse_copies_result_without_embedding(reuse):
+    index, store, run = reuse
+    url = store.put('abc_gradcam_v1.webp', b'cam')
+    index.add('rec1', PHASH, 'p1', _result({'gradcam_path': url}))
+
+    result = run(['gradcam'])
+    assert result['duplicate_of'] == 'rec1'
+    assert result['duplicate_distance'] == 1
+    assert result['gradcam_path'] == url
+    assert 'embedding' not in result
+    # 존재 확인은 CAM 저장소의 hit/miss 통계를 건드리지 않는다
+    assert (store.hits, store.misses) == (0, 0)
+
+
+def test_reuse_falls_through_when_cam_was_evicted(reuse):
+    index, store, run = reuse
+    url = store.put('abc_gradcam_v1.webp', b'cam')
+    index.add('rec1', PHASH, 'p1', _result({'gradcam_path': url}))
+    with store._lock:
+        store._remove_locked('abc_gradcam_v1.webp')
+
+    assert run(['gradcam']) is None
+
+
+def test_reuse_requires_same_model_version(reuse, monkeypatch):
+    index, _, run = reuse
+    index.add('rec1', PHASH, 'p1', _result({}))
+    monkeypatch.setattr(model_service, 'get_model_version', lambda: 'v2')
+
+    assert run([]) is None
+
+
+def test_dhash_bit_order():
+    from PIL import Image
+
+    from app.services.near_duplicate import dhash, hamming
+
+    # 밝기가 왼쪽에서 오른쪽으로 줄어들면 모든 비트가 1, 늘어나면 0
+    ramp = np.tile(np.linspace(255, 0, 90, dtype=np.uint8), (80, 1))
+    assert dhash(Image.fromarray(ramp)) == (1 << 64) - 1
+    assert dhash(Image.fromarray(ramp[:, ::-1].copy())) == 0
+    assert hamming(dhash(Image.fromarray(ramp)), 0) == 64
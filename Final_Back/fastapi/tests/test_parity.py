@@ -0,0 +1,61 @@
+"""랜덤 가중치 모델로 만든 golden 에 대한 parity 비교 (CPU)."""
+import numpy as np
+import pytest
+
+from app.services import parity
+
+METHODS = ['gradcam']
+
+
+@pytest.fixture(scope='module')
+def golden(tmp_path_factory):
+    output = tmp_path_factory.mktemp('golden')
+    parity.record(parity.load_images(None, limit=0, synthetic=3), output, methods=METHODS)
+    return output
+
+
+@pytest.mark.parametrize('pipeline', ['fp32', 'predict', 'batch'])
+def test_compare_within_tolerance(golden, pipeline):
+    report = parity.compare(golden, pipeline, parity.Tolerances())
+    assert report['images'] == 3
+    assert report['violations'] == []
+    assert report['ok']
+
+
+def test_compare_detects_perturbed_output(golden, monkeypatch):
+    reference = parity._PIPELINES[parity.REFERENCE_PIPELINE]
+
+    def perturbed(data, methods, target):
+        capture = reference(data, methods, target)
+        # top-1 이 바뀌도록 확률 순서를 뒤집고, 마스크와 CAM 도 뒤집는다
+        capture['probabilities'] = capture['probabilities'][::-1].copy()
+        capture['mask'] = ~capture['mask']
+        capture['cams'] = {method: -cam for method, cam in capture['cams'].items()}
+        return capture
+
+    monkeypatch.setitem(parity._PIPELINES, 'perturbed', perturbed)
+    report = parity.compare(golden, 'perturbed', parity.Tolerances())
+    assert not report['ok']
+    assert report['min_mask_iou'] < parity.Tolerances().min_mask_iou
+    assert report['cam_correlation']['gradcam']['min'] < 0
+    assert any('마스크 IoU' in violation for violation in report['violations'])
+
+
+def test_compare_rejects_changed_model_version(golden, monkeypatch):
+    from app.services import model as model_service
+
+    monkeypatch.setattr(model_service, 'get_model_version', lambda: 'other-model')
+    report = parity.compare(golden, 'fp32', parity.Tolerances())
+    assert not report['ok']
+    assert report['violations'][0].startswith('모델 버전 불일치')
+    assert parity.compare(golden, 'fp32', parity.Tolerances(), allow_model_change=True)['ok']
+
+
+def test_mask_iou_and_cam_correlation():
+    mask = np.zeros((4, 4), dtype=bool)
+    mask[:2] = True
+    assert parity.mask_iou(mask, mask) == 1.0
+    assert parity.mask_iou(mask, ~mask) == 0.0
+    cam = np.arange(16, dtype=np.float32).reshape(4, 4)
+    assert parity.cam_correlation(cam, cam * 2) == pytest.approx(1.0)
+    assert parity.cam_correlation(cam, -cam) == pytest.approx(-1.0)
@@ -0,0 +1,132 @@
+"""추론 기록 write-behind writer (MongoDB 대용품)."""
+import asyncio
+import time
+
+from app.db.memory import InMemoryCollection
+from app.services.persistence import DiagnosisWriter
+
+
+class _FlakyCollection(InMemoryCollection):
+    """처음 failures 번의 insert_many 는 실패한다."""
+
+    def __init__(self, failures: int):
+        super().__init__('ai_diagnoses')
+        self.failures = failures
+
+    async def insert_many(self, documents, ordered=True):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError('insert failed')
+        return await super().insert_many(documents, ordered)
+
+
+class _HangingCollection(InMemoryCollection):
+    async def insert_many(self, documents, ordered=True):
+        await asyncio.sleep(60)
+
+
+def _docs(count, start=0):
+    return [{'n': start + i} for i in range(count)]
+
+
+def test_flushes_when_batch_is_full():
+    async def run():
+        collection = InMemoryCollection('ai_diagnoses')
+        writer = DiagnosisWriter(batch_size=3, flush_interval=60)
+        writer.start(collection)
+        for doc in _docs(4):
+            assert writer.enqueue(doc)
+        await asyncio.sleep(0.05)
+        # 간격(60초)을 기다리지 않고 3건이 먼저 저장된다
+        written = (writer.written, writer.batches, len(collection._docs))
+        await writer.stop()
+        return written, writer.stats()
+
+    written, stats = asyncio.run(run())
+    assert written == (3, 1, 3)
+    assert stats['written'] == 4 and stats['batches'] == 2
+
+
+def test_flushes_partial_batch_after_interval():
+    async def run():
+        collection = InMemoryCollection('ai_diagnoses')
+        writer = DiagnosisWriter(batch_size=100, flush_interval=0.1)
+        writer.start(collection)
+        for doc in _docs(2):
+            writer.enqueue(doc)
+        await asyncio.sleep(0.03)
+        before = writer.written
+        await asyncio.sleep(0.2)
+        after = writer.written
+        await writer.stop()
+        return before, after, [doc['n'] for doc in collection._docs]
+
+    before, after, stored = asyncio.run(run())
+    assert (before, after) == (0, 2)
+    assert stored == [0, 1]
+
+
+def test_stop_drains_queue():
+    async def run():
+        collection = InMemoryCollection('ai_diagnoses')
+        writer = DiagnosisWriter(batch_size=2, flush_interval=60)
+        writer.start(collection)
+        for doc in _docs(5):
+            writer.enqueue(doc)
+        await writer.stop()
+        return writer, len(collection._docs)
+
+    writer, stored = asyncio.run(run())
+    assert stored == 5
+    assert writer.stats()['queued'] == 0 and not writer.running
+    # 멈춘 뒤 들어오는 기록은 버린다
+    assert not writer.enqueue({'n': 99}) and writer.dropped == 1
+
+
+def test_stop_gives_up_after_timeout():
+    async def run():
+        writer = DiagnosisWriter(batch_size=1, flush_interval=60)
+        writer.start(_HangingCollection('ai_diagnoses'))
+        writer.enqueue({'n': 0})
+        await asyncio.sleep(0.01)
+        started = time.perf_counter()
+        await writer.stop(timeout=0.1)
+        return writer, time.perf_counter() - started
+
+    writer, elapsed = asyncio.run(run())
+    assert elapsed < 1.0
+    assert writer.written == 0 and not writer.running
+
+
+def test_failed_insert_is_counted_and_writer_keeps_running():
+    async def run():
+        collection = _FlakyCollection(failures=1)
+        writer = DiagnosisWriter(batch_size=2, flush_interval=60)
+        writer.start(collection)
+        for doc in _docs(2):
+            writer.enqueue(doc)
+        await asyncio.sleep(0.05)
+        running = writer.running
+        for doc in _docs(2, start=2):
+            writer.enqueue(doc)
+        await writer.stop()
+        return writer, running, [doc['n'] for doc in collection._docs]
+
+    writer, running, stored = asyncio.run(run())
+    assert running
+    assert writer.failed == 2 and writer.written == 2
+    assert stored == [2, 3]
+
+
+def test_enqueue_drops_when_queue_is_full():
+    async def run():
+        writer = DiagnosisWriter(batch_size=10, flush_interval=60, max_queue=2)
+        writer.start(_HangingCollection('ai_diagnoses'))
+        # writer 태스크가 아직 돌지 않았으므로 큐에 그대로 쌓인다
+        accepted = [writer.enqueue(doc) for doc in _docs(3)]
+        await writer.stop(timeout=0.05)
+        return writer, accepted
+
+    writer, accepted = asyncio.run(run())
+    assert accepted == [True, True, False]
+    assert writer.dropped == 1
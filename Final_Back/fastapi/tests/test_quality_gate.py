@@ -0,0 +1,99 @@
+"""품질 게이트: 합성 영상/마스크에 대한 거절 사유."""
+import numpy as np
+import pytest
+
+from app.services.quality_gate import REASON_MESSAGES, QualityGate
+
+SIZE = 224
+
+
+def _rgb(gray):
+    return np.repeat(gray.astype(np.uint8)[:, :, None], 3, axis=2)
+
+
+def _gradient():
+    return _rgb(np.tile(np.linspace(40, 200, SIZE), (SIZE, 1)))
+
+
+def _lungs():
+    mask = np.zeros((SIZE, SIZE), dtype=np.uint8)
+    mask[40:180, 30:100] = 1
+    mask[40:180, 124:194] = 1
+    return mask
+
+
+@pytest.fixture
+def gate():
+    return QualityGate()
+
+
+def test_normal_image_passes(gate):
+    verdict = gate.check_image(_gradient())
+    assert verdict.passed
+    assert set(verdict.stats) == {'contrast', 'brightness'}
+
+
+@pytest.mark.parametrize('value, reasons', [
+    (0, ['low_contrast', 'too_dark']),
+    (128, ['low_contrast']),
+    (255, ['low_contrast', 'too_bright']),
+])
+def test_flat_images_are_rejected(gate, value, reasons):
+    verdict = gate.check_image(_rgb(np.full((SIZE, SIZE), value)))
+    assert verdict.stage == 'image'
+    assert verdict.reasons == reasons
+    assert verdict.messages() == [REASON_MESSAGES[reason] for reason in reasons]
+
+
+def test_dark_image_with_contrast(gate):
+    gray = np.zeros((SIZE, SIZE))
+    gray[:, SIZE // 2:] = 18  # 평균 9, 표준편차 9
+    verdict = gate.check_image(_rgb(gray))
+    assert verdict.reasons == ['too_dark']
+
+
+def test_two_lungs_pass(gate):
+    verdict = gate.check_mask(_lungs())
+    assert verdict.passed
+    assert verdict.stats['components'] == 2
+    assert verdict.stats['main_fraction'] == pytest.approx(1.0)
+
+
+def test_tiny_mask_is_too_small(gate):
+    mask = np.zeros((SIZE, SIZE), dtype=np.uint8)
+    mask[100:110, 100:110] = 1
+    verdict = gate.check_mask(mask)
+    # 너무 작으면 연결 요소는 보지 않는다
+    assert verdict.reasons == ['mask_too_small']
+    assert 'components' not in verdict.stats
+
+
+def test_full_mask_is_too_large(gate):
+    mask = np.ones((SIZE, SIZE), dtype=np.uint8)
+    mask[:20] = 0
+    verdict = gate.check_mask(mask)
+    assert verdict.reasons == ['mask_too_large']
+
+
+def test_many_components_are_fragmented(gate):
+    mask = np.zeros((SIZE, SIZE), dtype=np.uint8)
+    for row in range(10, 200, 45):
+        for col in range(10, 200, 45):
+            mask[row:row + 30, col:col + 30] = 1
+    verdict = gate.check_mask(mask)
+    assert verdict.reasons == ['mask_fragmented']
+    assert verdict.stats['components'] > gate.max_components
+
+
+def test_specks_outside_lungs_are_fragmented(gate):
+    # 작은 점들은 연결 요소 수에는 들어가지 않지만 두 폐가 차지하는 비율을 낮춘다
+    mask = np.zeros((SIZE, SIZE), dtype=np.uint8)
+    mask[20:60, 30:70] = 1
+    mask[20:60, 154:194] = 1
+    for row in range(150, SIZE - 2, 4):
+        for col in range(0, SIZE - 2, 4):
+            mask[row:row + 2, col:col + 2] = 1
+    verdict = gate.check_mask(mask)
+    assert verdict.reasons == ['mask_fragmented']
+    assert verdict.stats['components'] == 2
+    assert verdict.stats['main_fraction'] < gate.min_main_fraction
@@ -0,0 +1,80 @@
+"""우선순위 스케줄러: urgent 폭주 뒤에도 routine 이 FIFO 로 처리되는지."""
+import asyncio
+import time
+
+from app.services.scheduler import InferenceJob, InferenceScheduler
+
+
+def _scheduler(**kwargs):
+    options = {
+        'weights': {'urgent': 6, 'routine': 3, 'bulk': 1},
+        # urgent 는 대기하는 순간 SLO 에 근접 (항상 우선 처리 + 강등 발생)
+        'slos': {'urgent': 0.001, 'routine': 30.0, 'bulk': 60.0},
+        'concurrency': 1,
+        'max_queue': 100,
+    }
+    options.update(kwargs)
+    return InferenceScheduler(**options)
+
+
+def _job(priority, label, enqueued_at=None):
+    job = InferenceJob(lambda: label, (), {}, priority, future=None)
+    if enqueued_at is not None:
+        job.enqueued_at = enqueued_at
+    return job
+
+
+def test_routine_still_served_after_urgent_burst():
+    order = []
+
+    def work(label):
+        time.sleep(0.002)
+        order.append(label)
+        return label
+
+    async def run():
+        scheduler = _scheduler()
+        scheduler.start()
+        try:
+            routine = [scheduler.submit('routine', work, f'r{i}') for i in range(5)]
+            urgent = [scheduler.submit('urgent', work, f'u{i}') for i in range(20)]
+            bulk = [scheduler.submit('bulk', work, f'b{i}') for i in range(10)]
+            await asyncio.gather(*routine, *urgent, *bulk)
+            return scheduler.stats()
+        finally:
+            await scheduler.stop()
+
+    stats = asyncio.run(run())
+    routine = [label for label in order if label.startswith('r')]
+    bulk = [label for label in order if label.startswith('b')]
+    assert routine == [f'r{i}' for i in range(5)]
+    assert bulk == [f'b{i}' for i in range(10)]
+    # 강등되어도 routine 이 bulk 전체 뒤로 밀리지 않는다
+    assert order.index('r0') < order.index('b9')
+    assert stats['routine']['dispatched'] == 5
+    assert stats['routine']['demoted'] >= 1
+
+
+def test_demotion_lowers_weight_without_moving_jobs():
+    scheduler = _scheduler()
+    scheduler._classes['urgent'].queue.append(_job('urgent', 'u0', enqueued_at=time.perf_counter() - 1))
+    scheduler._classes['routine'].queue.extend(_job('routine', f'r{i}') for i in range(3))
+    scheduler._classes['bulk'].queue.append(_job('bulk', 'b0'))
+
+    assert scheduler._next_job().priority == 'urgent'
+    assert len(scheduler._classes['routine'].queue) == 3
+    assert len(scheduler._classes['bulk'].queue) == 1
+    now = time.perf_counter()
+    assert scheduler._effective_weight('routine', now) == 1
+
+    # urgent SLO 가 지나면 원래 가중치로 돌아온다
+    assert scheduler._effective_weight('routine', now + 1) == 3
+
+
+def test_demoted_class_at_risk_is_served_before_bulk():
+    scheduler = _scheduler(slos={'urgent': 0.001, 'routine': 0.5, 'bulk': 60.0})
+    scheduler._classes['routine'].demoted_until = time.perf_counter() + 60
+    scheduler._classes['bulk'].queue.extend(_job('bulk', f'b{i}') for i in range(5))
+    scheduler._classes['routine'].queue.append(_job('routine', 'r0', enqueued_at=time.perf_counter() - 1))
+
+    assert scheduler._next_job().priority == 'routine'
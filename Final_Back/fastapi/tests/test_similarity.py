@@ -0,0 +1,35 @@
+"""유사 증례 색인 재구성 (MongoDB 대용품)."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from bson import ObjectId
+
+from app.db.memory import InMemoryCollection
+from app.services.similarity import SimilarityIndex, encode_embedding
+
+
+def test_rebuild_skips_near_duplicate_records():
+    now = datetime.now(timezone.utc)
+    rng = np.random.default_rng(0)
+    original, duplicate, other = ObjectId(), ObjectId(), ObjectId()
+    vector = rng.normal(size=512)
+    documents = [
+        {'_id': original, 'model_version': 'v1', 'embedding': encode_embedding(vector), 'created_at': now - timedelta(minutes=2)},
+        # 예전 기록처럼 임베딩을 가진 중복 기록도 색인에 들어가면 안 된다
+        {'_id': duplicate, 'model_version': 'v1', 'embedding': encode_embedding(vector), 'duplicate_of': str(original),
+         'created_at': now - timedelta(minutes=1)},
+        {'_id': other, 'model_version': 'v1', 'embedding': encode_embedding(rng.normal(size=512)), 'created_at': now},
+    ]
+
+    async def run():
+        collection = InMemoryCollection('ai_diagnoses')
+        await collection.insert_many(documents)
+        index = SimilarityIndex()
+        count = await index.rebuild(collection, 'v1')
+        return index, count
+
+    index, count = asyncio.run(run())
+    assert count == 2
+    matches = index.search(vector, k=3, exclude=[original])
+    assert [doc_id for doc_id, _ in matches] == [other]
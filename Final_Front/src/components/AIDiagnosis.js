@@ -5,6 +5,13 @@ import { patientAPI, diagnosisAPI } from '../utils/api';
 import MainLayout from './layout/MainLayout';
 import DiagnosisModal from './DiagnosisModal';
 
+// CAM 이미지 경로를 FastAPI 절대 URL로 변환 (data URI로 인라인된 경우 그대로 사용)
+const toCamImageUrl = (path) => {
+  if (!path) return null;
+  if (path.startsWith('data:') || path.startsWith('http')) return path;
+  return `${process.env.REACT_APP_FASTAPI_URL || 'http://localhost:8000'}${path}`;
+};
+
 const AIDiagnosis = () => {
   const [selectedFile, setSelectedFile] = useState(null);
   const [preview, setPreview] = useState(null);
@@ -428,15 +435,9 @@ const AIDiagnosis = () => {
           onClose={() => setIsModalOpen(false)}
           data={{
             originalImage: preview || null,
-            gradcam: diagnosisResult.gradcamUrl 
-              ? `${process.env.REACT_APP_FASTAPI_URL || 'http://localhost:8000'}${diagnosisResult.gradcamUrl}` 
-              : null,
-            gradcamPP: diagnosisResult.gradcamPlusUrl 
-              ? `${process.env.REACT_APP_FASTAPI_URL || 'http://localhost:8000'}${diagnosisResult.gradcamPlusUrl}` 
-              : null,
-            layercam: diagnosisResult.layerCamUrl 
-              ? `${process.env.REACT_APP_FASTAPI_URL || 'http://localhost:8000'}${diagnosisResult.layerCamUrl}` 
-              : null,
+            gradcam: toCamImageUrl(diagnosisResult.gradcamUrl),
+            gradcamPP: toCamImageUrl(diagnosisResult.gradcamPlusUrl),
+            layercam: toCamImageUrl(diagnosisResult.layerCamUrl),
             findings: diagnosisResult.findings || [],
             confidence: diagnosisResult.confidence || 0,
             recommendation: diagnosisResult.recommendations && diagnosisResult.recommendations.length > 0
@@ -237,7 +237,7 @@ const DiagnosisHistory = () => {
                               // 이미지 URL 생성 헬퍼 함수
                               const getImageUrl = (path, fallback) => {
                                 if (!path) return fallback || '';
-                                if (path.startsWith('http')) return path;
+                                if (path.startsWith('http') || path.startsWith('data:')) return path;
                                 // 상대 경로인 경우 절대 경로로 변환
                                 if (path.startsWith('/')) {
                                   // FastAPI 서버의 정적 파일 경로